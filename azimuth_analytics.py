@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+OGLM Azimuth Analytics
+Калибровка трейдера: где прогнозы систематически мимо
+
+Разрешённые прогнозы раскладываются по корзинам четырёх измерений:
+азимут, горизонт, |темная материя| и надёжность (азимут мельче — кривая
+«средний прогноз → средний факт»). В корзине — число прогнозов, точность
+и средняя ошибка со знаком (факт − азимут: плюс — рынок шёл выше
+прогноза). Корзина a..b — от a включительно до b.
+
+CalibrationStats — агрегатор хранилища: корзины обновляются за
+O(измерений) на прогноз, поэтому отчёт по ним не читает историю. Другие
+границы (аргументы команды или сменившийся "analytics" в config.json)
+пересчитываются одним проходом по истории пачками PredictionTable (по
+колонкам, с NumPy — векторно; архив не грузится в память целиком),
+результат кэшируется до следующего изменения истории.
+
+    python azimuth_analytics.py ~/.oglm
+    python azimuth_analytics.py ~/.oglm --azimuth=-99,-50,0,50,1000 --horizon 1,7,30
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+from bisect import bisect_right
+from pathlib import Path
+
+from azimuth_model import NO_INT, PredictionTable
+from azimuth_montecarlo import numpy
+from azimuth_storage import StorageError, create_store
+
+# Границы корзин по умолчанию ("analytics" в config.json заменяет любые из них)
+BUCKETS = {
+    "azimuth": (-90, -50, 0, 50),
+    "horizon": (1, 7, 30, 90),
+    "dark_matter": (5, 20, 50),
+    "reliability": (-75, -50, -25, 0, 25, 50, 75),
+}
+TITLES = {
+    "azimuth": "Азимут, %",
+    "horizon": "Горизонт, дней",
+    "dark_matter": "|Темная материя|, %",
+    "reliability": "Надёжность: прогноз → факт",
+}
+# Индекс значения измерения в _point
+VALUES = {"azimuth": 0, "horizon": 3, "dark_matter": 4, "reliability": 0}
+# Поля, из-за которых прогноз в extras идёт мимо колоночного прохода
+FIELDS = frozenset(("azimuth", "actual_movement", "resolved", "correct",
+                    "horizon_days", "dark_matter_signal"))
+
+
+def _finite(value):
+    return type(value) in (int, float) and math.isfinite(value)
+
+
+def _point(pred):
+    """(азимут, факт, точный, горизонт, |темная материя|) разрешённого прогноза или None"""
+    if not pred.get("resolved"):
+        return None
+    azimuth, actual = pred.get("azimuth"), pred.get("actual_movement")
+    if not _finite(azimuth) or not _finite(actual):
+        return None
+    horizon = pred.get("horizon_days", 7)
+    dark = pred.get("dark_matter_signal")
+    return (azimuth, actual, pred.get("correct") is True,
+            horizon if _finite(horizon) else None, abs(dark) if _finite(dark) else None)
+
+
+def parse_edges(text):
+    """'-90,-50,0,50' → границы по возрастанию; ValueError при ошибке"""
+    try:
+        edges = tuple(float(part) for part in text.split(','))
+    except ValueError:
+        raise ValueError("границы — числа через запятую, например -90,-50,0,50") from None
+    if not all(math.isfinite(e) for e in edges) or list(edges) != sorted(set(edges)):
+        raise ValueError(f"границы {text}: конечные числа по возрастанию без повторов")
+    return edges
+
+
+def parse_buckets(args):
+    """Аргументы команды analytics → {измерение: границы}; ValueError при ошибке"""
+    args = list(args)
+    buckets = {}
+    while args:
+        arg = args.pop(0)
+        key, _, value = arg.partition('=')
+        name = key[2:].replace('-', '_')
+        if not key.startswith('--') or name not in BUCKETS:
+            raise ValueError(f"{arg}: {' | '.join('--' + n.replace('_', '-') for n in BUCKETS)}")
+        if not value:
+            if not args:
+                raise ValueError(f"{arg}: нужны границы")
+            value = args.pop(0)
+        try:
+            buckets[name] = parse_edges(value)
+        except ValueError as e:
+            raise ValueError(f"--{name.replace('_', '-')}: {e}") from None
+    return buckets
+
+
+class Buckets:
+    """Корзины одного измерения: [n, точных, Σ(факт − азимут), Σазимут, Σфакт]"""
+
+    def __init__(self, edges):
+        self.edges = tuple(edges)
+        self.rows = [[0, 0, 0.0, 0.0, 0.0] for _ in range(len(self.edges) + 1)]
+
+    def add(self, value, azimuth, actual, correct):
+        row = self.rows[bisect_right(self.edges, value)]
+        row[0] += 1
+        row[1] += correct
+        row[2] += actual - azimuth
+        row[3] += azimuth
+        row[4] += actual
+
+    def labels(self):
+        edges = [format(e, 'g') for e in self.edges]
+        if not edges:
+            return ["все"]
+        return ([f"< {edges[0]}"] + [f"{a}..{b}" for a, b in zip(edges, edges[1:])]
+                + [f"≥ {edges[-1]}"])
+
+    @property
+    def count(self):
+        return sum(row[0] for row in self.rows)
+
+
+def bucket_columns(predictions, name, edges):
+    """Корзины измерения одним проходом по колонкам (с NumPy — векторно)"""
+    buckets = Buckets(edges)
+    add_columns(buckets, predictions, name)
+    return buckets
+
+
+def add_columns(buckets, predictions, name):
+    """Добавить прогнозы в корзины измерения (пачку истории)"""
+    if not isinstance(predictions, PredictionTable):
+        _add_points(buckets, name, map(_point, predictions))
+        return
+
+    table = predictions
+    # Значения не из колонок (другой тип, незнакомый ключ) — по строкам
+    odd = sorted(pos for pos, extras in table.extras.items() if FIELDS.intersection(extras))
+    if len(table) and numpy() is not None:
+        _numpy_pass(table, name, buckets, odd)
+    elif len(table):
+        _column_pass(table, name, buckets, set(odd))
+    _add_points(buckets, name, (_point(table[pos]) for pos in odd))
+
+
+def _add_points(buckets, name, points):
+    index = VALUES[name]
+    for point in points:
+        if point is not None and point[index] is not None:
+            buckets.add(point[index], *point[:3])
+
+
+def _numpy_pass(table, name, buckets, odd):
+    np = numpy()
+    n = len(table)
+    resolved = np.frombuffer(table.flags["resolved"], dtype=np.int8, count=n) == 1
+    correct = np.frombuffer(table.flags["correct"], dtype=np.int8, count=n) == 1
+    azimuth = np.frombuffer(table.floats["azimuth"], count=n)
+    actual = np.frombuffer(table.floats["actual_movement"], count=n)
+    mask = resolved & np.isfinite(azimuth) & np.isfinite(actual)
+    if name == "horizon":
+        column = table.ints["horizon_days"]
+        horizon = np.frombuffer(column, dtype=f"i{column.itemsize}", count=n)
+        values = np.where(horizon == NO_INT[column.typecode], 7, horizon).astype(float)
+    elif name == "dark_matter":
+        values = np.abs(np.frombuffer(table.floats["dark_matter_signal"], count=n))
+        mask &= np.isfinite(values)
+    else:
+        values = azimuth
+    mask[odd] = False
+
+    size = len(buckets.rows)
+    index = np.searchsorted(np.asarray(buckets.edges, dtype=float), values[mask], side='right')
+    azimuth, actual = azimuth[mask], actual[mask]
+    sums = [np.bincount(index, minlength=size),
+            np.bincount(index, weights=correct[mask], minlength=size),
+            np.bincount(index, weights=actual - azimuth, minlength=size),
+            np.bincount(index, weights=azimuth, minlength=size),
+            np.bincount(index, weights=actual, minlength=size)]
+    for i, row in enumerate(buckets.rows):
+        row[0] += int(sums[0][i])
+        row[1] += int(sums[1][i])
+        for j in (2, 3, 4):
+            row[j] += float(sums[j][i])
+
+
+def _column_pass(table, name, buckets, odd):
+    floats, flags = table.floats, table.flags
+    if name == "horizon":
+        missing = NO_INT[table.ints["horizon_days"].typecode]
+        values = (7 if h == missing else h for h in table.ints["horizon_days"])
+    elif name == "dark_matter":
+        values = map(abs, floats["dark_matter_signal"])
+    else:
+        values = floats["azimuth"]
+    isfinite, add = math.isfinite, buckets.add
+    rows = zip(values, flags["resolved"], flags["correct"],
+               floats["azimuth"], floats["actual_movement"])
+    for position, (value, resolved, correct, azimuth, actual) in enumerate(rows):
+        if (resolved != 1 or not isfinite(azimuth) or not isfinite(actual)
+                or not isfinite(value) or position in odd):
+            continue
+        add(value, azimuth, actual, correct == 1)
+
+
+class CalibrationStats:
+    """Агрегатор хранилища: корзины калибровки по всем измерениям
+
+    version растёт с каждым изменением разрешённой истории; кэш пересчётов
+    с другими границами живёт до следующего изменения.
+    """
+
+    def __init__(self, buckets=None):
+        self.buckets = dict(BUCKETS)
+        for name, edges in (buckets or {}).items():
+            if name not in BUCKETS:
+                raise ValueError(f"analytics: неизвестное измерение {name!r} ({' | '.join(BUCKETS)})")
+            self.buckets[name] = parse_edges(','.join(map(str, edges)))
+        self.version = 0
+        self._cache = {}
+        self.reset()
+
+    def reset(self):
+        self.dims = {name: Buckets(edges) for name, edges in self.buckets.items()}
+        self.stale = set()  # измерения, которые надо пересчитать по истории
+        self._touch()
+
+    def _touch(self):
+        self.version += 1
+        self._cache.clear()
+
+    def update(self, pred):
+        point = _point(pred)
+        if point is None:
+            return
+        self._touch()
+        for name, buckets in self.dims.items():
+            value = point[VALUES[name]]
+            if value is not None and name not in self.stale:
+                buckets.add(value, *point[:3])
+
+    def state(self):
+        return {name: {"edges": list(buckets.edges), "rows": buckets.rows,
+                       "stale": name in self.stale}
+                for name, buckets in self.dims.items()}
+
+    def restore(self, state):
+        self.reset()
+        for name, buckets in self.dims.items():
+            saved = state.get(name)
+            if saved is None or saved.get("stale") or tuple(saved["edges"]) != buckets.edges:
+                # Границы сменились — пересчёт по колонкам при первом отчёте,
+                # а не полная перестройка хранилища на старте
+                self.stale.add(name)
+            else:
+                buckets.rows = [list(row) for row in saved["rows"]]
+
+    def table(self, name, chunks, edges=None):
+        """Корзины измерения; chunks() — история пачками, если агрегатов для edges нет"""
+        return self.tables({name: edges}, chunks)[name]
+
+    def tables(self, wanted, chunks):
+        """{измерение: Buckets} для {измерение: границы или None — свои}
+
+        Все недостающие измерения считаются за один проход chunks().
+        """
+        result, missing = {}, {}
+        for name, edges in wanted.items():
+            own = self.dims[name]
+            edges = own.edges if edges is None else tuple(edges)
+            if edges == own.edges and name not in self.stale:
+                result[name] = own
+            elif (self.version, name, edges) in self._cache:
+                result[name] = self._cache[(self.version, name, edges)]
+            else:
+                missing[name] = Buckets(edges)
+        if missing:
+            # chunks() может дочитать чужие записи и сменить version
+            for chunk in chunks():
+                if not isinstance(chunk, PredictionTable):
+                    chunk = PredictionTable(chunk)
+                for name, buckets in missing.items():
+                    add_columns(buckets, chunk, name)
+            for name, buckets in missing.items():
+                self._cache[(self.version, name, buckets.edges)] = buckets
+                result[name] = buckets
+        for name, buckets in result.items():
+            if buckets.edges == self.dims[name].edges and name in self.stale:
+                # Пересчитанное измерение дальше обновляется инкрементально
+                self.dims[name] = buckets
+                self.stale.discard(name)
+        return {name: result[name] for name in wanted}
+
+
+def report_lines(tables):
+    """Таблицы измерений {измерение: Buckets} для терминала и CLI"""
+    lines = []
+    for name, buckets in tables.items():
+        lines.append("")
+        if name == "reliability":
+            lines.append(f"{TITLES[name]:<28} {'n':>8} {'прогноз':>9} {'факт':>9} {'точность':>9}")
+        else:
+            lines.append(f"{TITLES[name]:<28} {'n':>8} {'точность':>9} {'ошибка±':>9}")
+        for label, (n, correct, signed, azimuth, actual) in zip(buckets.labels(), buckets.rows):
+            if not n:
+                lines.append(f"  {label:<26} {0:>8} {'—':>9}")
+                continue
+            accuracy = f"{correct / n * 100:.1f}%"
+            if name == "reliability":
+                lines.append(f"  {label:<26} {n:>8,} {azimuth / n:>+8.1f}% {actual / n:>+8.1f}% "
+                             f"{accuracy:>9}")
+            else:
+                lines.append(f"  {label:<26} {n:>8,} {accuracy:>9} {signed / n:>+8.1f}%")
+    return lines
+
+
+def calibration_report(calibration, chunks, buckets=None):
+    """{измерение: Buckets} всех измерений; buckets — другие границы"""
+    buckets = buckets or {}
+    return calibration.tables({name: buckets.get(name) for name in BUCKETS}, chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OGLM Azimuth analytics: калибровка по корзинам")
+    parser.add_argument("data_dir", nargs="?", default=str(Path.home() / ".oglm"),
+                        help="директория терминала (default: ~/.oglm)")
+    for name in BUCKETS:
+        parser.add_argument(f"--{name.replace('_', '-')}", metavar="EDGES",
+                            help=f"границы корзин через запятую, отрицательные — через '=' "
+                                 f"(default: {','.join(map(str, BUCKETS[name]))})")
+    args = parser.parse_args()
+
+    buckets = {}
+    for name in BUCKETS:
+        value = getattr(args, name)
+        if value is not None:
+            try:
+                buckets[name] = parse_edges(value)
+            except ValueError as e:
+                parser.error(f"--{name.replace('_', '-')}: {e}")
+
+    store = create_store(args.data_dir)
+    try:
+        config = {}
+        try:
+            with open(Path(args.data_dir) / "config.json", encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            pass
+        calibration = store.register("calibration", CalibrationStats(config.get("analytics")))
+        started = time.perf_counter()
+        store.open(lambda: {"predictions": [], "stats": {}})
+        tables = calibration_report(calibration, store.iter_chunks, buckets)
+    except (OSError, StorageError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        store.close()
+    elapsed = time.perf_counter() - started
+
+    count = tables["azimuth"].count
+    print(f"Калибровка: {count:,} разрешённых прогнозов ({elapsed:.3f}s)")
+    print("\n".join(report_lines(tables)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+OGLM Azimuth Archive
+Холодный ярус истории: неизменяемые сжатые сегменты
+
+Снапшот JournalStore держит только горячий хвост истории. При свёртке
+старые прогнозы по segment_size штук уходят в сегмент архива:
+
+    azimuth_predictions.archive/
+        manifest-G.json      сегменты поколения G: позиции, min/max, сжатие
+        G-000000.jsonl.z     прогнозы по строке (JSONL), zlib или lzma (.xz)
+        G-000000.idx.z       записи индекса истории этих прогнозов, zlib
+
+Сегмент пишется один раз и больше не меняется, поэтому свёртка переписывает
+только горячий снапшот. В сегмент уходят только разрешённые прогнозы:
+неразрешённый ещё изменится. min/max сегмента (id, время, азимут,
+горизонт, статусы) позволяют поиску не распаковывать сегменты, которые
+под фильтры не попадают, а history читает только записи своей страницы.
+
+Порядок записи: сегменты, манифест, снапшот. В шапке снапшота —
+поколение и число прогнозов в архиве, и архив читается ровно до этого
+числа: сегменты упавшей свёртки в него не входят (их прогнозы ещё в
+старом снапшоте) и перезаписываются следующей. replay --write и repack
+пишут новое поколение, старое удаляется после нового снапшота: другие
+процессы видят смену по снапшоту и читают уже новый манифест.
+
+Сегменты пишутся zlib — свёртка держит блокировку, lzma для неё
+слишком медленный. repack пережимает архив lzma (плотнее примерно на
+четверть):
+
+    python azimuth_archive.py ~/.oglm              # ярусы и размеры
+    python azimuth_archive.py ~/.oglm --repack xz  # пережать архив lzma
+"""
+
+import argparse
+import json
+import lzma
+import os
+import re
+import sys
+import time
+import zlib
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from pathlib import Path
+
+from azimuth_history import ARCHIVE, ENTRY, HistoryIndex, make_entry
+from azimuth_storage import JournalStore, StorageError, atomic_write_json
+
+CACHE_SIZE = 4   # распакованных файлов архива в памяти (страницы history)
+CHUNK = 4096     # строк сегмента на один json.loads
+OFFSET_BITS = 32  # смещение в записи индекса: сегмент << 32 | байт в сегменте
+
+CODECS = {
+    "zlib": (".z", lambda raw: zlib.compress(raw, 6), zlib.decompress),
+    "xz": (".xz", lambda raw: lzma.compress(raw, preset=6), lzma.decompress),
+}
+CODEC_ERRORS = (zlib.error, lzma.LZMAError)
+
+
+class ArchiveError(StorageError):
+    """Манифест или сегмент архива повреждён или потерян"""
+
+
+def _write_atomic(path, raw):
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(raw)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(str(tmp), str(path))
+
+
+def _bisect(raw, key, value, count):
+    """Первая позиция в упакованных записях, где entry[key] >= value"""
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if ENTRY.unpack_from(raw, mid * ENTRY.size)[key] < value:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def zone_match(segment, search):
+    """Может ли сегмент содержать прогнозы под фильтры parse_search (по его min/max)"""
+    status, horizon = search.get("status"), search.get("horizon")
+    if status is not None and not segment["status"][status]:
+        return False
+    if horizon is not None and not segment["horizon"][0] <= horizon <= segment["horizon"][1]:
+        return False
+    if search.get("first") is not None:
+        if segment["id"][1] < search["first"] or segment["id"][0] > search["last"]:
+            return False
+    if search.get("azimuth") is not None:
+        low, high = search["azimuth"]
+        if segment["azimuth"] is None or segment["azimuth"][1] < low or segment["azimuth"][0] > high:
+            return False
+    # Нераспознанное время — 0: оно входит и в min/max, и в фильтр поиска
+    since, until = search.get("since"), search.get("until")
+    if since is not None and segment["time"][1] < since:
+        return False
+    if until is not None and segment["time"][0] >= until + 86400:
+        return False
+    return True
+
+
+class Archive:
+    """Сегменты одного поколения и их манифест"""
+
+    def __init__(self, path, codec="zlib"):
+        self.path = Path(path)
+        self.codec = codec
+        self.generation = 0
+        self.segments = []
+        self.count = 0
+        self._manifest = []  # сегменты манифеста поколения, включая не попавшие в снапшот
+        self._cache = OrderedDict()  # (поколение, файл) → распакованные байты
+
+    def state(self):
+        """Для шапки снапшота и сводки: поколение и число прогнозов в архиве"""
+        return {"generation": self.generation if self.count else 0, "count": self.count}
+
+    def open(self, state):
+        """Открыть архив по state() из шапки снапшота или сводки
+
+        Сегменты, записанные после этого state (свёртка упала до нового
+        снапшота), в архив не входят — их прогнозы ещё в снапшоте.
+        """
+        generation, count = (state or {}).get("generation", 0), (state or {}).get("count", 0)
+        if not generation:
+            self.generation, self.segments, self.count = 0, [], 0
+            return
+        path = self.path / f"manifest-{generation}.json"
+        if generation != self.generation or sum(s["count"] for s in self._manifest) < count:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._manifest = json.load(f)["segments"]
+            except (OSError, ValueError, KeyError) as e:
+                raise ArchiveError(f"{path}: {e}")
+            self.generation = generation
+        segments, total = [], 0
+        for segment in self._manifest:
+            if total >= count:
+                break
+            segments.append(segment)
+            total += segment["count"]
+        if total != count:
+            raise ArchiveError(f"{path}: в архиве {total:,} прогнозов, по снапшоту {count:,}")
+        self.segments, self.count = segments, count
+
+    def reset(self):
+        """Начать новое поколение (replay --write): старое живо до нового снапшота"""
+        existing = [int(m.group(1)) for m in
+                    (re.match(r'manifest-(\d+)\.json$', p.name) for p in self._files()) if m]
+        self.generation = max(existing + [self.generation]) + 1
+        self.segments, self._manifest = [], []
+        self.count = 0
+
+    # --- запись ---
+
+    def append(self, preds):
+        """Записать сегмент из прогнозов (в манифест он попадёт с commit)
+
+        preds читаются один раз — можно генератор (records таблицы).
+        """
+        if not self.generation:
+            self.reset()
+        self.path.mkdir(exist_ok=True)
+        number = len(self.segments)
+        stem = f"{self.generation}-{number:06d}"
+        suffix, compress, _ = CODECS[self.codec]
+
+        lines, entries, azimuths = [], [], []
+        offset = 0
+        for i, pred in enumerate(preds):
+            line = json.dumps(pred, ensure_ascii=False).encode('utf-8')
+            entries.append(make_entry(pred, self.count + i, (number << OFFSET_BITS) | offset,
+                                      len(line), ARCHIVE))
+            lines.append(line)
+            offset += len(line) + 1
+            if type(pred.get("azimuth")) in (int, float):
+                azimuths.append(pred["azimuth"])
+        raw = b'\n'.join(lines) + b'\n'
+        packed = compress(raw)
+        _write_atomic(self.path / (stem + ".jsonl" + suffix), packed)
+        _write_atomic(self.path / (stem + ".idx.z"),
+                      zlib.compress(b''.join(ENTRY.pack(*e) for e in entries), 6))
+
+        self.segments.append({
+            "file": stem + ".jsonl" + suffix,
+            "index": stem + ".idx.z",
+            "codec": self.codec,
+            "start": self.count,
+            "count": len(entries),
+            "bytes": len(packed),
+            "raw": len(raw),
+            "id": [min(e[0] for e in entries), max(e[0] for e in entries)],
+            "time": [min(e[1] for e in entries), max(e[1] for e in entries)],
+            "azimuth": [min(azimuths), max(azimuths)] if azimuths else None,
+            "horizon": [min(e[4] for e in entries), max(e[4] for e in entries)],
+            "status": [sum(1 for e in entries if e[5] == status) for status in range(3)],
+        })
+        self._manifest = list(self.segments)
+        self.count += len(entries)
+
+    def commit(self):
+        """Атомарно записать манифест: сегменты до него уже на диске"""
+        atomic_write_json(self.path / f"manifest-{self.generation}.json",
+                          {"format": "oglm-archive", "version": 1, "generation": self.generation,
+                           "count": self.count, "segments": self.segments}, indent=None)
+
+    def cleanup(self):
+        """Удалить файлы других поколений и сегменты, не попавшие в манифест"""
+        keep = {f"manifest-{self.generation}.json"} if self.count else set()
+        for segment in self.segments:
+            keep.update((segment["file"], segment["index"]))
+        for path in self._files():
+            if path.name not in keep:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+        self._cache.clear()
+
+    def repack(self, codec):
+        """Переписать архив новым поколением в кодеке codec → сколько сегментов пережато
+
+        Смещения те же. Старое поколение не трогается: на него ссылается
+        снапшот, пока его не заменит JournalStore.repack (затем cleanup).
+        """
+        if all(segment["codec"] == codec for segment in self.segments):
+            return 0
+        saved = (self.generation, self.segments, self._manifest, self.count)
+        suffix, compress, _ = CODECS[codec]
+        repacked = 0
+        try:
+            self.reset()
+            for number, segment in enumerate(saved[1]):
+                stem = f"{self.generation}-{number:06d}"
+                if segment["codec"] == codec:
+                    packed = self._read_file(segment["file"])
+                else:
+                    packed = compress(self._raw(segment))
+                    repacked += 1
+                _write_atomic(self.path / (stem + ".jsonl" + suffix), packed)
+                _write_atomic(self.path / (stem + ".idx.z"), self._read_file(segment["index"]))
+                self.segments.append(dict(segment, file=stem + ".jsonl" + suffix,
+                                          index=stem + ".idx.z", codec=codec, bytes=len(packed)))
+                self.count += segment["count"]
+            self._manifest = list(self.segments)
+            self.commit()
+        except BaseException:
+            # Файлы нового поколения без снапшота уберёт следующий cleanup
+            self.generation, self.segments, self._manifest, self.count = saved
+            raise
+        return repacked
+
+    def select(self, search):
+        """Сегменты, которые могут содержать прогнозы под фильтры parse_search"""
+        return [segment for segment in self.segments if zone_match(segment, search)]
+
+    def _files(self):
+        try:
+            return [p for p in self.path.iterdir() if p.is_file()]
+        except FileNotFoundError:
+            return []
+
+    # --- чтение ---
+
+    def _read_file(self, name):
+        path = self.path / name
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError as e:
+            raise ArchiveError(f"{path}: {e}")
+
+    def _raw(self, segment):
+        """Распакованные строки сегмента"""
+        path = self.path / segment["file"]
+        try:
+            with open(path, 'rb') as f:
+                raw = CODECS[segment["codec"]][2](f.read())
+        except (OSError, *CODEC_ERRORS) as e:
+            raise ArchiveError(f"{path}: {e}")
+        if len(raw) != segment["raw"]:
+            raise ArchiveError(f"{path}: {len(raw):,} байт вместо {segment['raw']:,}")
+        return raw
+
+    def _cached(self, name, load):
+        key = (self.generation, name)
+        value = self._cache.get(key)
+        if value is None:
+            value = self._cache[key] = load()
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return value
+
+    def entries(self, number):
+        """Записи индекса сегмента — упакованные ENTRY подряд"""
+        segment = self.segments[number]
+
+        def load():
+            path = self.path / segment["index"]
+            try:
+                with open(path, 'rb') as f:
+                    raw = zlib.decompress(f.read())
+            except (OSError, zlib.error) as e:
+                raise ArchiveError(f"{path}: {e}")
+            if len(raw) != segment["count"] * ENTRY.size:
+                raise ArchiveError(f"{path}: записей не {segment['count']:,}")
+            return raw
+        return self._cached(segment["index"], load)
+
+    def read(self, offset, length):
+        """Прогноз по смещению и длине из записи индекса"""
+        segment = self.segments[offset >> OFFSET_BITS]
+        raw = self._cached(segment["file"], lambda: self._raw(segment))
+        start = offset & ((1 << OFFSET_BITS) - 1)
+        try:
+            return json.loads(raw[start:start + length].decode('utf-8'))
+        except ValueError as e:
+            raise ArchiveError(f"{segment['file']}: {e}")
+
+    def chunks(self, start=0, segments=None):
+        """Прогнозы архива с позиции start пачками; segments — только эти сегменты"""
+        for segment in self.segments if segments is None else segments:
+            skip = start - segment["start"]
+            if skip >= segment["count"]:
+                continue
+            # Поток идёт мимо кэша — не вытесняет страницы history
+            lines = self._raw(segment).split(b'\n')[max(skip, 0):-1]
+            try:
+                for i in range(0, len(lines), CHUNK):
+                    yield json.loads(b'[' + b','.join(lines[i:i + CHUNK]) + b']')
+            except ValueError as e:
+                raise ArchiveError(f"{segment['file']}: {e}")
+
+
+class TieredIndex(HistoryIndex):
+    """Индекс истории поверх архива: записи сегментов, затем файл индекса
+
+    Позиции сквозные. Файл индекса (HistoryIndex) покрывает только
+    горячий ярус — позиции с archive.count; записи архивных прогнозов
+    читаются из .idx.z их сегментов, а find пропускает сегменты, в
+    которых по min/max нет подходящих.
+    """
+
+    def __init__(self, path, archive):
+        super().__init__(path)
+        self.archive = archive
+
+    def valid(self, count, fingerprint):
+        return super().valid(count - self.archive.count, fingerprint)
+
+    def update(self, updates):
+        # Архивные прогнозы уже разрешены и не меняются
+        base = self.archive.count
+        super().update([(position - base, entry) for position, entry in updates if position >= base])
+
+    def __len__(self):
+        return self.archive.count + self._count()
+
+    def entries(self, start, stop):
+        base = self.archive.count
+        segments = self.archive.segments
+        result = []
+        if start < min(stop, base):
+            number = bisect_right([s["start"] for s in segments], start) - 1
+            while number < len(segments) and segments[number]["start"] < stop:
+                segment = segments[number]
+                lo = max(start - segment["start"], 0)
+                hi = min(stop - segment["start"], segment["count"])
+                raw = self.archive.entries(number)
+                result.extend(ENTRY.iter_unpack(raw[lo * ENTRY.size:hi * ENTRY.size]))
+                number += 1
+        if stop > base:
+            result.extend(super().entries(max(start - base, 0), stop - base))
+        return result
+
+    def position_of(self, key, value):
+        zone = ("id", "time")[key]
+        for number, segment in enumerate(self.archive.segments):
+            if segment[zone][1] >= value:
+                raw = self.archive.entries(number)
+                return segment["start"] + _bisect(raw, key, value, segment["count"])
+        return self.archive.count + super().position_of(key, value)
+
+    def lookup(self, ids):
+        segments = self.archive.segments
+        highs = [segment["id"][1] for segment in segments]
+        found, hot = {}, []
+        for pred_id in set(ids):
+            number = bisect_left(highs, pred_id)
+            if number == len(segments):
+                hot.append(pred_id)
+                continue
+            segment = segments[number]
+            raw = self.archive.entries(number)
+            position = _bisect(raw, 0, pred_id, segment["count"])
+            if position < segment["count"]:
+                entry = ENTRY.unpack_from(raw, position * ENTRY.size)
+                if entry[0] == pred_id:
+                    found[pred_id] = (segment["start"] + position, entry)
+        base = self.archive.count
+        for pred_id, (position, entry) in super().lookup(hot).items():
+            found[pred_id] = (base + position, entry)
+        return found
+
+    def find(self, start, stop, limit, reverse=False, status=None, horizon=None):
+        search = {"status": status, "horizon": horizon}
+        blocks = [(s["start"], s["start"] + s["count"], s) for s in self.archive.segments]
+        blocks.append((self.archive.count, stop, None))
+        if reverse:
+            blocks.reverse()
+        found = []
+        for lo, hi, segment in blocks:
+            lo, hi = max(lo, start), min(hi, stop)
+            if lo >= hi or (segment is not None and not zone_match(segment, search)):
+                continue
+            part = super().find(lo, hi, limit - len(found), reverse, status, horizon)
+            found = part + found if reverse else found + part
+            if len(found) >= limit:
+                break
+        return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OGLM Azimuth archive: холодный ярус истории")
+    parser.add_argument("data_dir", nargs="?", default=str(Path.home() / ".oglm"),
+                        help="директория терминала (default: ~/.oglm)")
+    parser.add_argument("--repack", choices=sorted(CODECS), help="пережать сегменты кодеком")
+    args = parser.parse_args()
+
+    store = JournalStore(Path(args.data_dir) / "azimuth_predictions.json")
+    try:
+        store.open(lambda: {"predictions": [], "stats": {}})
+        archive = store.archive
+        if args.repack:
+            started = time.perf_counter()
+            count = store.repack(args.repack)
+            print(f"✅ Пережато сегментов: {count} ({time.perf_counter() - started:.1f}s)")
+        hot = store.summary["count"] - archive.count
+        snapshot = store.data_file.stat().st_size if store.data_file.exists() else 0
+    except (OSError, StorageError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        store.close()
+
+    packed = sum(s["bytes"] for s in archive.segments)
+    raw = sum(s["raw"] for s in archive.segments)
+    print(f"Горячий ярус: {hot:,} прогнозов, снапшот {snapshot / 1e6:.1f} МБ")
+    print(f"Архив: {archive.count:,} прогнозов в {len(archive.segments)} сегментах, "
+          f"{packed / 1e6:.1f} МБ (без сжатия {raw / 1e6:.1f} МБ"
+          + (f", ×{raw / packed:.1f}" if packed else "") + ")")
+    for segment in archive.segments[-5:]:
+        first, last = segment["id"]
+        print(f"  #{first}–#{last}  {segment['codec']:<4} {segment['bytes'] / 1e6:7.2f} МБ  "
+              f"{segment['file']}")
+
+
+if __name__ == "__main__":
+    main()
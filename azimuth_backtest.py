@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+OGLM Azimuth Backtest
+Перебор параметров модели рынка на записанном потоке азимутов
+
+Параметры calculate_outcome и оценки (допуск ±20%, коэффициент сложности
+0.4, наклон временного множителя, шум, темная материя, границы движения)
+перебираются по сетке. Каждая конфигурация прогоняется на одном и том же
+потоке (история ~/.oglm, CSV/JSONL как у --batch или синтетика) и даёт
+точность, P&L и максимальную просадку кумулятивного P&L — от пика, в
+процентных пунктах (P&L — сумма процентов по прогнозам).
+
+Случайность воспроизводима: повтор r берёт поток SeedSequence(seed).spawn
+[r], одинаковый для всех конфигураций (общие случайные числа — разница
+между конфигурациями не тонет в шуме) и не зависящий от числа процессов.
+Конфигурации делятся на куски и считаются в пуле процессов; с NumPy одна
+конфигурация на 100k прогнозов — пара миллисекунд на ядро.
+
+    python azimuth_backtest.py --synthetic 100000 \\
+        --grid tolerance=10:30:5 --grid difficulty=0.2:0.6:0.1 --replicates 3
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from azimuth_montecarlo import (
+    DARK_MATTER_SIGMA, DIFFICULTY_FACTOR, MARKET_NOISE, MAX_MOVEMENT,
+    MIN_MOVEMENT, TIME_FACTOR_SLOPE, TOLERANCE, numpy,
+)
+
+np = numpy()
+
+# Параметры модели и их значения в терминале
+PARAMS = {
+    "tolerance": TOLERANCE,
+    "difficulty": DIFFICULTY_FACTOR,
+    "time_slope": TIME_FACTOR_SLOPE,
+    "noise": MARKET_NOISE,
+    "dark_sigma": DARK_MATTER_SIGMA,
+    "min_move": MIN_MOVEMENT,
+    "max_move": MAX_MOVEMENT,
+}
+METRICS = ("accuracy", "pnl", "drawdown", "mean_error")
+
+
+def parse_grid(specs):
+    """['tolerance=10:30:5', 'difficulty=0.2,0.4'] → список конфигураций
+
+    Значения — через запятую или диапазон start:stop:step (stop включён).
+    Не указанные параметры — как в терминале. ValueError на ошибку.
+    """
+    axes = {}
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        name = name.strip()
+        if name not in PARAMS:
+            raise ValueError(f"неизвестный параметр {name!r}, есть: {', '.join(PARAMS)}")
+        if not values:
+            raise ValueError(f"нет значений: {spec!r}")
+        if ':' in values:
+            start, stop, step = (float(v) for v in values.split(':'))
+            if step <= 0:
+                raise ValueError(f"шаг должен быть > 0: {spec!r}")
+            count = int(math.floor((stop - start) / step + 1e-9)) + 1
+            axes[name] = [round(start + i * step, 10) for i in range(count)]
+        else:
+            axes[name] = [float(v) for v in values.split(',')]
+
+    names = list(axes)
+    configs = []
+    for combo in itertools.product(*(axes[name] for name in names)):
+        config = dict(PARAMS)
+        config.update(zip(names, combo))
+        configs.append(config)
+    return configs
+
+
+# --- поток азимутов ---
+
+def load_history(data_dir):
+    """(азимуты, горизонты) всех прогнозов истории"""
+    from azimuth_storage import create_store
+
+    store = create_store(data_dir)
+    try:
+        store.open(lambda: {"predictions": [], "stats": {}})
+        preds = store.load()["predictions"]
+    finally:
+        store.close()
+    return ([float(p["azimuth"]) for p in preds],
+            [int(p.get("horizon_days", 7) or 0) for p in preds])
+
+
+def load_stream(path):
+    """(азимуты, горизонты) из CSV/JSONL в формате --batch"""
+    from azimuth_terminal import parse_batch_line
+
+    azimuths, horizons = [], []
+    with open(path, 'r', encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            try:
+                azimuth, horizon, _ = parse_batch_line(line)
+            except (ValueError, KeyError, IndexError, StopIteration):
+                if lineno == 1 and line.lower().startswith("azimuth"):
+                    continue  # заголовок CSV
+                raise ValueError(f"{path}:{lineno}: не разобрать строку")
+            azimuths.append(azimuth)
+            horizons.append(horizon)
+    return azimuths, horizons
+
+
+def synthetic_stream(size, seed=0):
+    """Поток как у живого трейдера: азимуты gauss(0, 25), горизонты 1/7/30"""
+    rng = random.Random(f"stream:{seed}")
+    return ([round(rng.gauss(0, 25), 1) for _ in range(size)],
+            [rng.choice((1, 7, 30)) for _ in range(size)])
+
+
+# --- оценка конфигурации ---
+
+class Stream:
+    """Поток и случайные величины повторов (в каждом процессе пула)"""
+
+    def __init__(self, azimuths, horizons, replicates, seed):
+        self.size = len(azimuths)
+        self.replicates = replicates
+        self._buffers = None
+        if np is not None:
+            self.azimuth = np.asarray(azimuths, dtype=np.float64)
+            self.difficulty = np.minimum(np.abs(self.azimuth) / 100, 1.0)
+            self.months = np.asarray(horizons, dtype=np.float64) / 30
+            # Шум uniform(-1, 1) и темная материя N(0, 1); масштаб — из конфигурации
+            self.draws = []
+            for child in np.random.SeedSequence(seed).spawn(replicates):
+                rng = np.random.default_rng(child)
+                self.draws.append((rng.uniform(-1.0, 1.0, self.size),
+                                   rng.standard_normal(self.size)))
+        else:
+            self.azimuth = list(azimuths)
+            self.difficulty = [min(abs(a) / 100, 1.0) for a in azimuths]
+            self.months = [h / 30 for h in horizons]
+            self.draws = []
+            for r in range(replicates):
+                rng = random.Random(f"{seed}:{r}")
+                self.draws.append(([rng.uniform(-1.0, 1.0) for _ in range(self.size)],
+                                   [rng.gauss(0.0, 1.0) for _ in range(self.size)]))
+
+    def evaluate(self, config):
+        """Метрики конфигурации, усреднённые по повторам"""
+        run = self._run_numpy if np is not None else self._run_stdlib
+        totals = dict.fromkeys(METRICS, 0.0)
+        for noise, dark in self.draws:
+            for key, value in run(config, noise, dark).items():
+                totals[key] += value
+        result = dict(config)
+        result.update({key: value / self.replicates for key, value in totals.items()})
+        return result
+
+    def _run_numpy(self, c, noise, dark):
+        if self._buffers is None:
+            # Свои буферы на процесс: без аллокаций на каждую конфигурацию
+            self._buffers = [np.empty(self.size) for _ in range(3)]
+        actual, tmp, equity = self._buffers
+        azimuth = self.azimuth
+
+        np.multiply(noise, c["noise"], out=actual)
+        np.multiply(dark, c["dark_sigma"], out=tmp)
+        actual += tmp
+        np.multiply(self.difficulty, -c["difficulty"], out=tmp)
+        tmp += 1.0
+        tmp *= azimuth
+        actual += tmp
+        np.multiply(self.months, c["time_slope"], out=tmp)
+        tmp += 1.0
+        actual *= tmp
+        np.clip(actual, c["min_move"], c["max_move"], out=actual)
+
+        error = np.subtract(actual, azimuth, out=tmp)
+        np.abs(error, out=error)
+        accuracy = np.count_nonzero(error <= c["tolerance"]) / self.size * 100
+        mean_error = float(error.mean())
+
+        # P&L = движение цены, кривая — накопленный P&L в процентных пунктах
+        np.cumsum(actual, out=equity)
+        peak = np.maximum(equity, 0.0, out=tmp)
+        np.maximum.accumulate(peak, out=peak)
+        peak -= equity
+        return {
+            "accuracy": accuracy,
+            "pnl": float(equity[-1]),
+            "drawdown": float(peak.max()),
+            "mean_error": mean_error,
+        }
+
+    def _run_stdlib(self, c, noise, dark):
+        scale, sigma, difficulty, slope = c["noise"], c["dark_sigma"], c["difficulty"], c["time_slope"]
+        low, high, tolerance = c["min_move"], c["max_move"], c["tolerance"]
+        correct = 0
+        error_sum = equity = peak = drawdown = 0.0
+        for a, d, m, u, g in zip(self.azimuth, self.difficulty, self.months, noise, dark):
+            actual = (a * (1.0 - d * difficulty) + u * scale + g * sigma) * (1.0 + m * slope)
+            actual = max(min(actual, high), low)
+            error = abs(actual - a)
+            correct += error <= tolerance
+            error_sum += error
+            equity += actual
+            peak = max(peak, equity)
+            drawdown = max(drawdown, peak - equity)
+        return {
+            "accuracy": correct / self.size * 100,
+            "pnl": equity,
+            "drawdown": drawdown,
+            "mean_error": error_sum / self.size,
+        }
+
+
+_stream = None  # поток процесса пула
+
+
+def _init_worker(azimuths, horizons, replicates, seed):
+    global _stream
+    _stream = Stream(azimuths, horizons, replicates, seed)
+
+
+def _evaluate_chunk(configs):
+    return [_stream.evaluate(config) for config in configs]
+
+
+def backtest(azimuths, horizons, configs, replicates=1, seed=0, workers=None, progress=None):
+    """Оценить все конфигурации → список словарей (параметры + метрики)"""
+    if not azimuths:
+        raise ValueError("пустой поток прогнозов")
+    workers = workers or os.cpu_count() or 1
+    initargs = (azimuths, horizons, replicates, seed)
+
+    if workers == 1 or len(configs) == 1:
+        _init_worker(*initargs)
+        results = []
+        for config in configs:
+            results.append(_stream.evaluate(config))
+            if progress:
+                progress(len(results), len(configs))
+        return results
+
+    # Кусков в несколько раз больше процессов — чтобы хвост не ждал одного
+    chunk = max(1, min(256, len(configs) // (workers * 4)))
+    chunks = [configs[i:i + chunk] for i in range(0, len(configs), chunk)]
+    results = []
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs) as pool:
+        for part in pool.map(_evaluate_chunk, chunks):
+            results.extend(part)
+            if progress:
+                progress(len(results), len(configs))
+    return results
+
+
+# --- отчёт ---
+
+def varying(configs):
+    """Параметры, которые меняются в сетке"""
+    return [name for name in PARAMS if len({c[name] for c in configs}) > 1]
+
+
+def sort_results(results, key):
+    # Просадку и ошибку — по возрастанию, остальное — по убыванию
+    reverse = key not in ("drawdown", "mean_error")
+    return sorted(results, key=lambda r: r[key], reverse=reverse)
+
+
+def write_results(results, path):
+    """JSON (по расширению) или CSV"""
+    if str(path).endswith(".json"):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        return
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(PARAMS) + list(METRICS))
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def print_table(results, names, top, out=sys.stdout):
+    header = "".join(f"{name:>12}" for name in names)
+    print(f"{header}{'точность':>10}{'P&L':>12}{'просадка':>14}{'ошибка':>9}", file=out)
+    for r in results[:top]:
+        row = "".join(f"{r[name]:>12g}" for name in names)
+        print(f"{row}{r['accuracy']:>9.2f}%{r['pnl']:>+11.1f}%{r['drawdown']:>9.1f} п.п."
+              f"{r['mean_error']:>8.2f}%", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OGLM Azimuth parameter-sweep backtest")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--data", metavar="DIR", help="история терминала (default: ~/.oglm)")
+    source.add_argument("--stream", metavar="FILE", help="азимуты из CSV/JSONL (формат --batch)")
+    source.add_argument("--synthetic", metavar="N", type=int, help="синтетический поток из N прогнозов")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=VALUES",
+                        help=f"сетка параметра: {', '.join(PARAMS)}; "
+                             "значения 10,20,30 или 10:30:5 (повторяемый флаг)")
+    parser.add_argument("--replicates", type=int, default=1, help="повторов на конфигурацию")
+    parser.add_argument("--seed", type=int, default=0, help="seed случайных потоков")
+    parser.add_argument("--workers", type=int, help="процессов (default: все ядра)")
+    parser.add_argument("--sort", choices=METRICS, default="accuracy", help="ключ сортировки")
+    parser.add_argument("--top", type=int, default=20, help="строк в таблице")
+    parser.add_argument("--out", help="все результаты в CSV или JSON")
+    args = parser.parse_args()
+
+    try:
+        configs = parse_grid(args.grid)
+        if args.stream:
+            azimuths, horizons = load_stream(args.stream)
+        elif args.synthetic:
+            azimuths, horizons = synthetic_stream(args.synthetic, args.seed)
+        else:
+            azimuths, horizons = load_history(args.data or Path.home() / ".oglm")
+        if not azimuths:
+            raise ValueError("в потоке нет прогнозов")
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    workers = args.workers or os.cpu_count() or 1
+    print(f"Backtest: {len(configs):,} конфигураций × {len(azimuths):,} прогнозов × "
+          f"{args.replicates} повторов, {workers} процессов"
+          f"{'' if np is not None else ' (без NumPy — медленно)'}", file=sys.stderr)
+
+    def progress(done, total):
+        if sys.stderr.isatty():
+            print(f"\r  {done:,}/{total:,}", end="", file=sys.stderr, flush=True)
+
+    started = time.perf_counter()
+    results = backtest(azimuths, horizons, configs, args.replicates, args.seed, workers, progress)
+    elapsed = time.perf_counter() - started
+    if sys.stderr.isatty():
+        print(file=sys.stderr)
+    print(f"  {elapsed:.2f}s ({len(configs) / elapsed:,.1f} конфигураций/s)", file=sys.stderr)
+
+    results = sort_results(results, args.sort)
+    print_table(results, varying(configs) or ["tolerance"], args.top)
+    if args.out:
+        write_results(results, args.out)
+        print(f"\nРезультаты: {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+OGLM Azimuth Bench
+Бенчмарки хранилища, симуляции и рендера на больших историях
+
+Для каждого размера (по умолчанию 1e3, 1e4, 1e5; до 1e6 через --sizes)
+генерируется синтетическая история в реальной схеме, затем каждая
+операция замеряется в отдельном процессе — так пиковый RSS относится
+к одной операции. Вывод экрана идёт в пустой приёмник, чтобы скорость
+терминала не влияла на цифры. Результаты — JSON (--out), сравнение с
+прошлым прогоном — --compare.
+
+    python azimuth_bench.py --sizes 1000,100000 --out bench.json
+    python azimuth_bench.py --out new.json --compare bench.json
+"""
+
+import argparse
+import builtins
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from azimuth_montecarlo import numpy, simulate
+from azimuth_storage import JournalStore
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+PENDING_SHARE = 0.01  # доля неразрешённых прогнозов в истории
+REGRESSION = 1.2      # во сколько раз медленнее — уже регрессия
+
+# Операции над историей (порядок важен: изменяющие данные — в конце)
+HISTORY_OPS = (
+    "cold_start_rebuild",  # main() на истории без сводки (первый запуск)
+    "cold_start",          # main() со сводкой
+    "open",
+    "load_data",
+    "print_stats",
+    "render_frame",
+    "draw_price_chart_cold",
+    "draw_price_chart",
+    "show_full_history",
+    "save_data",
+    "record_prediction",
+)
+# Операции, не зависящие от длины истории
+MODEL_OPS = ("calculate_outcome", "simulate")
+
+
+class NullSink:
+    """Приёмник вывода без затрат на терминал"""
+
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+# --- синтетическая история ---
+
+def generate(data_dir, size, seed=1):
+    """История из size прогнозов в схеме azimuth_predictions.json (без сводки)"""
+    rng = random.Random(seed)
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    start = datetime.now() - timedelta(hours=size)
+    log_price = 0.0
+    stats = {"total": 0, "correct": 0, "accuracy": 0.0,
+             "best_prediction": None, "worst_prediction": None, "total_pnl": 0.0}
+    high = low = 1.0
+    preds = []
+    pending_from = size - int(size * PENDING_SHARE)
+
+    for i in range(size):
+        entry = math.exp(log_price)
+        azimuth = round(rng.gauss(0, 25), 1)
+        horizon = rng.choice((1, 7, 30))
+        pred = {
+            "id": i + 1,
+            "timestamp": (start + timedelta(hours=i)).strftime("%Y-%m-%d %H:%M:%S"),
+            "azimuth": azimuth,
+            "note": rng.choice(("", "", "фрактальный разворот", "темная материя давит")),
+            "horizon_days": horizon,
+            "entry_price": entry,
+            "target_price": entry * (1 + azimuth / 100),
+            "resolved": False,
+            "correct": None,
+        }
+        if i < pending_from:
+            # Цена — возвратное блуждание, чтобы не уйти в inf/0 на 1e6 шагов
+            log_price += rng.gauss(0, 0.1) - 0.01 * log_price
+            exit_price = math.exp(log_price)
+            actual = (exit_price / entry - 1) * 100
+            error = abs(actual - azimuth)
+            pred.update({
+                "actual_movement": actual,
+                "dark_matter_signal": actual - azimuth,
+                "exit_price": exit_price,
+                "resolved": True,
+                "correct": error <= 20,
+                "error": error,
+                "pnl": actual,
+            })
+            stats["total"] += 1
+            stats["correct"] += pred["correct"]
+            stats["total_pnl"] += actual
+            if stats["best_prediction"] is None or error < stats["best_prediction"]["error"]:
+                stats["best_prediction"] = {"id": i + 1, "error": error}
+            if stats["worst_prediction"] is None or error > stats["worst_prediction"]["error"]:
+                stats["worst_prediction"] = {"id": i + 1, "error": error}
+            high = max(high, exit_price)
+            low = min(low, exit_price)
+        preds.append(pred)
+
+    if stats["total"]:
+        stats["accuracy"] = stats["correct"] / stats["total"] * 100
+    data = {
+        "predictions": preds,
+        "stats": stats,
+        "market": {"all_time_high": high, "all_time_low": low,
+                   "last_updated": datetime.now().isoformat()},
+    }
+    store = JournalStore(data_dir / "azimuth_predictions.json")
+    store.write_snapshot(data)
+    store.close()
+    with open(data_dir / "config.json", 'w', encoding='utf-8') as f:
+        json.dump({"current_price": math.exp(log_price)}, f)
+
+
+# --- операции (выполняются в дочернем процессе) ---
+
+def _terminal(data_dir):
+    from azimuth_terminal import OGLMAzimuthTerminal
+    return OGLMAzimuthTerminal(data_dir)
+
+
+def _timed(func, repeat=1):
+    """Лучшее время из repeat прогонов"""
+    best = math.inf
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run_op(op, data_dir):
+    """Замерить одну операцию → {"seconds": на вызов, "calls": вызовов}"""
+    sink = NullSink()
+
+    if op == "calculate_outcome":
+        terminal = _terminal(data_dir)
+        calls = 100_000
+        seconds = _timed(lambda: [terminal.calculate_outcome(50.0, 7) for _ in range(calls)], repeat=3)
+        return {"seconds": seconds / calls, "calls": calls}
+    if op == "simulate":
+        calls = 5
+        seconds = _timed(lambda: [simulate(50.0, 7) for _ in range(calls)])
+        return {"seconds": seconds / calls, "calls": calls}
+
+    if op == "open":
+        seconds = _timed(lambda: _terminal(data_dir).store.close())
+        return {"seconds": seconds, "calls": 1}
+
+    terminal = _terminal(data_dir)
+    terminal.screen.out = sink
+
+    if op == "load_data":
+        return {"seconds": _timed(terminal.load_data), "calls": 1}
+    if op == "save_data":
+        terminal.load_data()
+        return {"seconds": _timed(terminal.save_data), "calls": 1}
+    if op == "print_stats":
+        calls = 100
+        with redirect_stdout(sink):
+            seconds = _timed(lambda: [terminal.print_stats() for _ in range(calls)], repeat=5)
+        return {"seconds": seconds / calls, "calls": calls}
+    if op == "render_frame":
+        calls = 100
+        terminal.render_frame()  # первый кадр — полный
+
+        def frames():
+            for i in range(calls):
+                terminal.current_price *= 1.001  # меняется регион цены
+                terminal.render_frame()
+        return {"seconds": _timed(frames, repeat=5) / calls, "calls": calls}
+    if op in ("draw_price_chart_cold", "draw_price_chart"):
+        with redirect_stdout(sink):
+            if op == "draw_price_chart_cold":
+                return {"seconds": _timed(lambda: terminal.draw_price_chart(width=100)), "calls": 1}
+            terminal.draw_price_chart(width=100)
+            calls = 20
+            seconds = _timed(lambda: [terminal.draw_price_chart(width=100) for _ in range(calls)], repeat=5)
+        return {"seconds": seconds / calls, "calls": calls}
+    if op == "show_full_history":
+        # Первая страница и 10 страниц назад, ввод подставляется
+        answers = iter(['p'] * 10 + [''])
+        original = builtins.input
+        builtins.input = lambda prompt="": next(answers, '')
+        try:
+            with redirect_stdout(sink):
+                seconds = _timed(terminal.show_full_history)
+        finally:
+            builtins.input = original
+        return {"seconds": seconds, "calls": 1}
+    if op == "record_prediction":
+        calls = 1000
+        seconds = _timed(lambda: [terminal.record_prediction(rnd, "", 7)
+                                  for rnd in (random.gauss(0, 25) for _ in range(calls))])
+        terminal.store.close()
+        return {"seconds": seconds / calls, "calls": calls}
+    raise ValueError(f"неизвестная операция: {op}")
+
+
+# --- запуск в отдельном процессе ---
+
+def _child(args, stdin=b""):
+    """Запустить процесс → (секунды, пиковый RSS в КБ или None, stdout)"""
+    with tempfile.TemporaryFile() as err:
+        started = time.perf_counter()
+        proc = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                stderr=err, cwd=str(HERE))
+        proc.stdin.write(stdin)
+        proc.stdin.close()
+        out = proc.stdout.read()
+        proc.stdout.close()
+        rss = None
+        if hasattr(os, "wait4"):
+            # rusage именно этого процесса, а не максимум по всем детям
+            _, status, rusage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            rss = rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+        else:
+            proc.wait()
+        elapsed = time.perf_counter() - started
+        if proc.returncode != 0:
+            err.seek(0)
+            message = err.read().decode('utf-8', 'replace').strip().splitlines()
+            raise RuntimeError(f"{' '.join(args[1:3])}: {message[-1] if message else proc.returncode}")
+    return elapsed, rss, out
+
+
+def measure(op, data_dir):
+    if op in ("cold_start", "cold_start_rebuild"):
+        # Холодный старт main(): процесс целиком, Enter и exit на stdin
+        if op == "cold_start_rebuild":
+            summary = Path(data_dir) / "azimuth_predictions.summary.json"
+            if summary.exists():
+                summary.unlink()
+        seconds, rss, _ = _child([sys.executable, str(HERE / "azimuth_terminal.py"), str(data_dir)],
+                                 stdin=b"\nexit\n")
+        return {"seconds": seconds, "calls": 1, "peak_rss_kb": rss}
+
+    _, rss, out = _child([sys.executable, str(Path(__file__).resolve()), "_worker", op, str(data_dir)])
+    result = json.loads(out.decode('utf-8').strip().splitlines()[-1])
+    result["peak_rss_kb"] = rss
+    return result
+
+
+def meta():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(HERE),
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": numpy() is not None,
+    }
+
+
+def fmt_seconds(seconds):
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.1f}µs"
+
+
+def compare(results, baseline_path, threshold=REGRESSION):
+    """Сравнить с прошлым прогоном; возвращает число регрессий"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r["op"], r["size"]): r for r in json.load(f)["results"]}
+    regressions = 0
+    print(f"\nСравнение с {baseline_path}:")
+    for r in results:
+        old = baseline.get((r["op"], r["size"]))
+        if r["op"] == "generate" or old is None or not old["seconds"]:
+            continue
+        ratio = r["seconds"] / old["seconds"]
+        mark = ""
+        if ratio > threshold:
+            mark = "  ← регрессия"
+            regressions += 1
+        print(f"  {r['op']:<24}{r['size']:>9,}  {fmt_seconds(old['seconds']):>10} → "
+              f"{fmt_seconds(r['seconds']):>10}  ×{ratio:.2f}{mark}")
+    return regressions
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "_worker":
+        print(json.dumps(run_op(sys.argv[2], sys.argv[3])))
+        return
+
+    parser = argparse.ArgumentParser(description="OGLM Azimuth benchmarks")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="размеры истории через запятую (default: 1000,10000,100000)")
+    parser.add_argument("--ops", help="только эти операции, через запятую")
+    parser.add_argument("--out", help="записать результаты в JSON")
+    parser.add_argument("--compare", metavar="BASE", help="сравнить с прошлым JSON")
+    parser.add_argument("--threshold", type=float, default=REGRESSION,
+                        help=f"во сколько раз медленнее считать регрессией (default: {REGRESSION})")
+    parser.add_argument("--keep", metavar="DIR", help="оставить сгенерированные истории в DIR")
+    args = parser.parse_args()
+
+    sizes = [int(float(s)) for s in args.sizes.split(",") if s]
+    ops = set(args.ops.split(",")) if args.ops else None
+    root = Path(args.keep) if args.keep else Path(tempfile.mkdtemp(prefix="oglm-bench-"))
+    results = []
+
+    def record(op, size, result):
+        entry = {"op": op, "size": size, **result}
+        results.append(entry)
+        rss = entry.get("peak_rss_kb")
+        rss = f"{rss / 1024:.0f} MB" if rss else "—"
+        print(f"  {op:<24}{size:>9,}  {fmt_seconds(entry['seconds']):>10}  RSS {rss}", flush=True)
+
+    try:
+        print(f"OGLM bench → {root}")
+        for op in MODEL_OPS:
+            if ops is None or op in ops:
+                model_dir = root / "model"
+                model_dir.mkdir(parents=True, exist_ok=True)
+                record(op, 0, measure(op, model_dir))
+
+        for size in sizes:
+            data_dir = root / f"h{size}"
+            started = time.perf_counter()
+            generate(data_dir, size)
+            record("generate", size, {"seconds": time.perf_counter() - started, "calls": 1})
+            for op in HISTORY_OPS:
+                if ops is None or op in ops:
+                    record(op, size, measure(op, data_dir))
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({"meta": meta(), "results": results}, f, indent=2, ensure_ascii=False)
+        print(f"\nРезультаты: {args.out}")
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,560 @@
+"""
+OGLM Azimuth Chart
+Кэшированная траектория цены и даунсэмплинг для графика
+
+PriceIndex — агрегатор JournalStore: цена после каждого разрешённого
+прогноза дописывается в azimuth_predictions.prices (array('d') на диске)
+один раз. Поверх массива держится пирамида min/max по блокам BLOCK^k,
+поэтому min/max любого диапазона считается за O(BLOCK · уровни), а
+график любой длины истории рисуется за O(ширина × высота).
+
+CandleIndex — агрегатор свечей OHLC по времени прогнозов: уровни 1h, 1d
+и 1w пополняются по мере разрешения (цены входа и выхода — тики в момент
+timestamp) и лежат в azimuth_predictions.candles.1h / .1d / .1w. Свечи
+года — сотни готовых баров, история для них не читается.
+"""
+
+import math
+import os
+from array import array
+
+from azimuth_model import TimestampCodec
+
+BLOCK = 16  # размер блока пирамиды
+
+# Уровни свечей: имя, длина бара в секундах, сдвиг начала бара
+WEEK = 7 * 86400
+RESOLUTIONS = (("1h", 3600, 0), ("1d", 86400, 0), ("1w", WEEK, 4 * 86400))  # 1970-01-01 — четверг
+FIELDS = 8  # start, first, last, open, high, low, close, ticks — double на поле
+CANDLES_VERSION = 1.0
+
+
+class PriceIndex:
+    """Траектория цены: начальная цена + exit_price каждого прогноза"""
+
+    def __init__(self, path):
+        self.path = path
+        self.length = 0
+        self.prices = None  # array('d'), загружается при первом графике
+        self.levels = None  # [(mins, maxs), ...] для блоков BLOCK^1, BLOCK^2, ...
+        self._file = None
+
+    # --- протокол агрегатора JournalStore ---
+
+    def reset(self):
+        self._close()
+        with open(self.path, 'wb'):
+            pass
+        self.length = 0
+        self.prices = array('d')
+        self.levels = []
+
+    def update(self, pred):
+        if not pred.get("resolved"):
+            return
+        if self.length == 0:
+            self._append(pred.get("entry_price", 1.0))
+        price = pred.get("exit_price")
+        if price is None:
+            # Старые записи без exit_price: компаундим движение
+            price = self._last_price() * (1 + pred.get("actual_movement", 0) / 100)
+        self._append(price)
+
+    def _last_price(self):
+        if self.prices is not None:
+            return self.prices[-1]
+        if self._file is not None:
+            self._file.flush()
+        last = array('d')
+        with open(self.path, 'rb') as f:
+            f.seek((self.length - 1) * 8)
+            last.fromfile(f, 1)
+        return last[0]
+
+    def state(self):
+        if self._file is not None:
+            self._file.flush()
+        return {"length": self.length}
+
+    def restore(self, state):
+        """False, если файл короче сохранённого состояния (нужна пересборка)"""
+        self._close()
+        length = state["length"]
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        if size < length * 8:
+            return False
+        if size > length * 8:
+            # Хвост, записанный после состояния, будет дописан из журнала
+            with open(self.path, 'r+b') as f:
+                f.truncate(length * 8)
+        self.length = length
+        self.prices = None
+        self.levels = None
+        return True
+
+    # --- траектория ---
+
+    def _append(self, price):
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        array('d', (price,)).tofile(self._file)
+        if self.prices is not None:
+            self.prices.append(price)
+            self._extend_levels(self.length, price)
+        self.length += 1
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def load(self):
+        """Прочитать массив цен и построить пирамиду (один раз)"""
+        if self.prices is None:
+            if self._file is not None:
+                self._file.flush()
+            prices = array('d')
+            if self.length:
+                with open(self.path, 'rb') as f:
+                    prices.fromfile(f, self.length)
+            self.prices = prices
+            self.levels = []
+            for i, price in enumerate(prices):
+                self._extend_levels(i, price)
+        return self.prices
+
+    def _extend_levels(self, i, price):
+        """Учесть цену с индексом i во всех уровнях пирамиды"""
+        size = BLOCK
+        k = 0
+        while size <= i + 1 or k < len(self.levels):
+            if k == len(self.levels):
+                # Новый уровень: собираем из предыдущего
+                self.levels.append(self._build_level(k))
+                return
+            mins, maxs = self.levels[k]
+            idx = i // size
+            if idx == len(mins):
+                mins.append(price)
+                maxs.append(price)
+            else:
+                if price < mins[idx]:
+                    mins[idx] = price
+                if price > maxs[idx]:
+                    maxs[idx] = price
+            size *= BLOCK
+            k += 1
+
+    def _build_level(self, k):
+        if k == 0:
+            lower_mins = lower_maxs = self.prices
+        else:
+            lower_mins, lower_maxs = self.levels[k - 1]
+        mins, maxs = array('d'), array('d')
+        for start in range(0, len(lower_mins), BLOCK):
+            mins.append(min(lower_mins[start:start + BLOCK]))
+            maxs.append(max(lower_maxs[start:start + BLOCK]))
+        return mins, maxs
+
+    def minmax(self, start, stop):
+        """(min, max) цены на [start, stop)"""
+        self.load()
+        return self._range(start, stop, len(self.levels))
+
+    def _range(self, start, stop, k):
+        if k == 0:
+            chunk = self.prices[start:stop]
+            return min(chunk), max(chunk)
+
+        size = BLOCK ** k
+        first = -(-start // size)
+        last = stop // size
+        if first >= last:
+            return self._range(start, stop, k - 1)
+
+        mins, maxs = self.levels[k - 1]
+        lo = min(mins[first:last])
+        hi = max(maxs[first:last])
+        for a, b in ((start, first * size), (last * size, stop)):
+            if a < b:
+                part_lo, part_hi = self._range(a, b, k - 1)
+                lo = min(lo, part_lo)
+                hi = max(hi, part_hi)
+        return lo, hi
+
+    def downsample(self, width, start=0, stop=None):
+        """min/max-бакеты: не больше width колонок на диапазон [start, stop)"""
+        self.load()
+        stop = self.length if stop is None else min(stop, self.length)
+        start = max(0, min(start, stop))
+        count = stop - start
+        if count <= 0:
+            return []
+        columns = min(width, count)
+        buckets = []
+        for col in range(columns):
+            a = start + count * col // columns
+            b = start + count * (col + 1) // columns
+            buckets.append(self.minmax(a, b))
+        return buckets
+
+
+class CandleLevel:
+    """Свечи одного разрешения по времени: FIELDS double на свечу
+
+    Файл — запись-заголовок (версия, длина бара, тиков всего) и свечи
+    по возрастанию начала. Обновлённые свечи переписываются на месте с
+    первой изменённой (почти всегда — последней).
+    """
+
+    def __init__(self, path, name, seconds, offset):
+        self.path = path
+        self.name = name
+        self.seconds = seconds
+        self.offset = offset
+        self.length = 0
+        self.data = None  # array('d'), загружается при первом обращении
+        self.dirty = None  # первая свеча, не записанная в файл
+        self.flushed = None  # тиков в заголовке файла
+
+    def bucket(self, epoch):
+        return (epoch - self.offset) // self.seconds * self.seconds + self.offset
+
+    def clear(self):
+        self.data = array('d')
+        self.length = 0
+        self.dirty = 0
+        self.flushed = None
+
+    def load(self):
+        if self.data is None:
+            data = array('d')
+            with open(self.path, 'rb') as f:
+                data.fromfile(f, (self.length + 1) * FIELDS)
+            self.data = data[FIELDS:]
+        return self.data
+
+    def header(self):
+        """(версия, длина бара, тиков) из файла или None"""
+        head = array('d')
+        try:
+            with open(self.path, 'rb') as f:
+                head.fromfile(f, FIELDS)
+        except (OSError, EOFError):
+            return None
+        return head[0], head[1], head[2]
+
+    def find(self, start):
+        """Позиция первой свечи с началом ≥ start"""
+        data, lo, hi = self.load(), 0, self.length
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if data[mid * FIELDS] < start:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def add(self, epoch, price):
+        data = self.load()
+        start = self.bucket(epoch)
+        last = (self.length - 1) * FIELDS
+        if self.length and data[last] == start:
+            pos = self.length - 1
+        elif not self.length or data[last] < start:
+            pos = self.length
+        else:
+            # Прогноз, разрешённый позже соседей (фид): свеча в прошлом
+            pos = self.find(start)
+        i = pos * FIELDS
+        if pos == self.length or data[i] != start:
+            data[i:i] = array('d', (start, epoch, epoch, price, price, price, price, 0))
+            self.length += 1
+        else:
+            if epoch < data[i + 1]:
+                data[i + 1] = epoch
+                data[i + 3] = price
+            if epoch >= data[i + 2]:
+                data[i + 2] = epoch
+                data[i + 6] = price
+            if price > data[i + 4]:
+                data[i + 4] = price
+            if price < data[i + 5]:
+                data[i + 5] = price
+        data[i + 7] += 1
+        self.dirty = pos if self.dirty is None else min(self.dirty, pos)
+
+    def flush(self, ticks):
+        """Дописать изменённые свечи и заголовок с числом тиков"""
+        if self.data is None or (self.dirty is None and self.flushed == ticks):
+            return
+        mode = 'r+b' if os.path.exists(self.path) else 'wb'
+        with open(self.path, mode) as f:
+            if self.dirty is not None:
+                f.seek((self.dirty + 1) * FIELDS * 8)
+                self.data[self.dirty * FIELDS:].tofile(f)
+                f.truncate()
+                self.dirty = None
+            f.seek(0)
+            array('d', (CANDLES_VERSION, self.seconds, ticks) + (0.0,) * (FIELDS - 3)).tofile(f)
+        self.flushed = ticks
+
+    def candles(self, since=None, until=None, limit=None):
+        """[(начало, open, high, low, close, тиков)] с началом в [since, until)
+
+        limit — только последние limit свечей диапазона.
+        """
+        data = self.load()
+        first = 0 if since is None else self.find(self.bucket(since))
+        last = self.length if until is None else self.find(until)
+        if limit is not None:
+            first = max(first, last - limit)
+        return [(int(data[i]), data[i + 3], data[i + 4], data[i + 5], data[i + 6], int(data[i + 7]))
+                for i in range(first * FIELDS, last * FIELDS, FIELDS)]
+
+    def count(self, since=None, until=None):
+        first = 0 if since is None else self.find(self.bucket(since))
+        last = self.length if until is None else self.find(until)
+        return max(last - first, 0)
+
+
+class CandleIndex:
+    """Пирамида свечей OHLC 1h / 1d / 1w — агрегатор хранилища
+
+    Тики разрешённого прогноза — цена входа в момент timestamp и цена
+    выхода через horizon_days (локальное время терминала, без часового
+    пояса). Каждый тик обновляет по свече на уровень; выход долгого
+    прогноза и разрешённый позже прогноз (фид) обновляют свечу не в конце.
+
+    Файлы свечей могут быть впереди состояния из сводки или снапшота
+    (свечи сброшены, сводка — нет): тогда первые skip тиков из журнала
+    уже в файлах и пропускаются. Журнал кончился раньше (потерян хвост) —
+    пирамида помечается stale и пересчитывается по истории при первом
+    select, а не на старте.
+    """
+
+    def __init__(self, path):
+        self.levels = {name: CandleLevel(f"{path}.{name}", name, seconds, offset)
+                       for name, seconds, offset in RESOLUTIONS}
+        self.ticks = 0
+        self.skip = 0  # тиков журнала, которые уже в файлах
+        self.stale = False
+        self._codec = TimestampCodec()
+
+    # --- протокол агрегатора JournalStore ---
+
+    def reset(self):
+        for level in self.levels.values():
+            level.clear()
+            level.flush(0)
+        self.ticks = 0
+        self.skip = 0
+        self.stale = False
+
+    def update(self, pred):
+        if self.stale or not pred.get("resolved"):
+            return
+        epoch = self._epoch(pred.get("timestamp"))
+        if epoch is None:
+            return
+        horizon = pred.get("horizon_days", 7)
+        if type(horizon) not in (int, float) or not math.isfinite(horizon):
+            horizon = 7
+        # Выход — через горизонт после входа: исход за horizon дней
+        for key, at in (("entry_price", epoch), ("exit_price", epoch + round(horizon * 86400))):
+            price = pred.get(key)
+            if type(price) not in (int, float) or not math.isfinite(price):
+                continue
+            if self.skip:
+                self.skip -= 1
+            else:
+                for level in self.levels.values():
+                    level.add(at, price)
+            self.ticks += 1
+
+    def _epoch(self, timestamp):
+        if type(timestamp) is not str:
+            return None
+        if len(timestamp) == 10:
+            timestamp += " 00:00:00"
+        return self._codec.encode(timestamp[:19].replace('T', ' '))
+
+    def state(self):
+        if self.skip:
+            # В файлах тики, которых журнал не повторил: свечи неверны
+            self.reset()
+            self.stale = True
+        if self.stale:
+            return {"ticks": 0, "stale": True}
+        for level in self.levels.values():
+            level.flush(self.ticks)
+        return {"ticks": self.ticks,
+                "lengths": {name: level.length for name, level in self.levels.items()}}
+
+    def restore(self, state):
+        """False, если файлы свечей позади состояния или чужие (нужна пересборка)
+
+        Файлы впереди состояния принимаются как есть: лишние тики придут
+        из журнала повторно и будут пропущены.
+        """
+        if state.get("stale"):
+            self.reset()
+            self.stale = True
+            return True
+        ticks = state["ticks"]
+        headers = [level.header() for level in self.levels.values()]
+        if any(header is None or header[:2] != (CANDLES_VERSION, level.seconds)
+               for header, level in zip(headers, self.levels.values())):
+            return False
+        ahead = {header[2] for header in headers}
+        if len(ahead) != 1 or ahead.pop() < ticks:
+            return False
+        flushed = headers[0][2]
+        lengths = {}
+        for name, level in self.levels.items():
+            size = os.path.getsize(level.path)
+            if size % (FIELDS * 8):
+                return False
+            lengths[name] = size // (FIELDS * 8) - 1
+            if flushed == ticks and lengths[name] != state.get("lengths", {}).get(name):
+                return False
+        for name, level in self.levels.items():
+            level.length = lengths[name]
+            level.data = None
+            level.dirty = None
+            level.flushed = flushed
+        self.ticks = ticks
+        self.skip = int(flushed - ticks)
+        self.stale = False
+        return True
+
+    def rebuild(self, chunks):
+        """Пересчитать stale-пирамиду по истории (chunks() — пачки прогнозов)"""
+        self.reset()
+        for chunk in chunks():
+            for pred in chunk:
+                self.update(pred)
+        for level in self.levels.values():
+            level.flush(self.ticks)
+
+    # --- выборка ---
+
+    def label(self, level, start):
+        """Подпись свечи: часовой — с временем, дневной и недельной — датой"""
+        return self._codec.decode(start)[:16 if level.seconds < 86400 else 10]
+
+    def select(self, resolution=None, since=None, until=None, width=80, chunks=None):
+        """(уровень, свечи) диапазона: без resolution — самый детальный, где баров ≤ width
+
+        Если и недельных больше width — последние width недель. chunks() —
+        история пачками для пересчёта stale-пирамиды.
+        """
+        if self.stale and chunks is not None:
+            self.rebuild(chunks)
+        if resolution is not None:
+            level = self.levels[resolution]
+        else:
+            for level in self.levels.values():
+                if level.count(since, until) <= width:
+                    break
+        return level, level.candles(since, until, width)
+
+
+def parse_candles(args):
+    """candles [1h|1d|1w] [--since ДАТА] [--until ДАТА] → (разрешение, since, until)
+
+    Даты — 'YYYY-MM-DD' локального времени терминала; until включительно.
+    ValueError — не разобрать.
+    """
+    codec = TimestampCodec()
+    resolution = since = until = None
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if arg in ("--since", "--until"):
+            if not args:
+                raise ValueError(f"{arg}: нужна дата YYYY-MM-DD")
+            value = args.pop(0)
+            epoch = codec.encode(value + " 00:00:00") if len(value) == 10 else None
+            if epoch is None:
+                raise ValueError(f"{arg}: дата YYYY-MM-DD, не {value!r}")
+            if arg == "--since":
+                since = epoch
+            else:
+                until = epoch + 86400
+        elif arg in {name for name, _, _ in RESOLUTIONS}:
+            resolution = arg
+        else:
+            raise ValueError(f"неизвестный аргумент {arg!r} (1h | 1d | 1w, --since, --until)")
+    return resolution, since, until
+
+
+def axis_labels(min_price, price_range, height):
+    """Уровни строк сверху вниз и их подписи одной ширины (не уже 8 символов)
+
+    '-1.234e+05' шире '0.5' — без общей ширины ось графика поедет.
+    """
+    levels = [min_price + (price_range * i / height) for i in range(height, -1, -1)]
+    labels = [f"{level:.4g}" for level in levels]
+    width = max(8, max(map(len, labels)))
+    return levels, [label.rjust(width) for label in labels]
+
+
+def render_candles(candles, height=10):
+    """ASCII-свечи: тело █ — рост, ▒ — падение, тень │"""
+    if not candles:
+        return []
+    min_price = min(c[3] for c in candles)
+    max_price = max(c[2] for c in candles)
+    price_range = max_price - min_price
+    if price_range == 0:
+        price_range = 1
+
+    lines = []
+    step = price_range / height
+    levels, labels = axis_labels(min_price, price_range, height)
+    for level, label in zip(levels, labels):
+        lo, hi = level - step / 2, level + step / 2
+        line = f"{label} │"
+        for _, open_, high, low, close, _ in candles:
+            if min(open_, close) <= hi and max(open_, close) >= lo:
+                line += "█" if close >= open_ else "▒"
+            elif low <= hi and high >= lo:
+                line += "│"
+            else:
+                line += " "
+        lines.append(line)
+
+    lines.append(" " * (len(labels[0]) + 1) + "└" + "─" * len(candles))
+    return lines
+
+
+def render_chart(buckets, height=10):
+    """ASCII-строки графика по min/max-бакетам"""
+    finite = [v for bucket in buckets for v in bucket if math.isfinite(v)]
+    if not finite:
+        return []
+    min_price = min(finite)
+    max_price = max(finite)
+    price_range = max_price - min_price
+    if price_range == 0:
+        price_range = 1
+
+    lines = []
+    step = price_range / height
+    levels, labels = axis_labels(min_price, price_range, height)
+    for level, label in zip(levels, labels):
+        line = f"{label} │"
+        for lo, hi in buckets:
+            # Бакет задевает полосу строки — ставим точку
+            if lo - step / 2 <= level <= hi + step / 2:
+                line += "●"
+            else:
+                line += " "
+        lines.append(line)
+
+    lines.append(" " * (len(labels[0]) + 1) + "└" + "─" * len(buckets))
+    return lines
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+OGLM Azimuth Export
+Потоковая выгрузка истории в CSV, JSONL и колоночный формат
+
+История читается пачками (iter_chunks хранилища) и сразу пишется, поэтому
+память не зависит от длины истории. Файл пишется во временный рядом и
+переименовывается: оборванная выгрузка не оставляет половину файла.
+
+--incremental выгружает только прогнозы после прошлой выгрузки того же
+формата (состояние — azimuth_predictions.export.json в директории
+данных). Неразрешённый прогноз выгружается снова, пока не разрешится:
+строка с тем же id заменяет прежнюю. Если история с тех пор переписана
+(replay --write), выгрузка идёт целиком.
+
+Колоночный формат .oglc — для NumPy/pandas без копирования (mmap):
+
+    8 байт   b"OGLMCOL1"
+    8 байт   длина шапки, uint64 little-endian
+    шапка    JSON: rows, start, columns [{name, dtype, offset, count}]
+    колонки  с offset (кратно 64) — массивы dtype NumPy, little-endian
+
+    timestamp            <M8[s]  локальное время терминала, NaT — нет значения
+    id, seed             <i8     -2**63 — нет значения
+    horizon_days         <i4     -2**31 — нет значения
+    цены, движения, P&L  <f8     NaN — нет значения
+    resolved, correct    |i1     0/1, 2 — null, -1 — нет значения
+    note, model, extras  NAME.offsets <i8, NAME.lengths <i4 (-1 — нет
+                         значения), NAME.data |u1 — строки UTF-8 подряд
+
+extras — JSON значений, не легших в колонки (нестандартная дата,
+незнакомый ключ), как extras у PredictionTable.
+
+    python azimuth_export.py ~/.oglm --out history.csv
+    python azimuth_export.py ~/.oglm --out history.oglc
+    python azimuth_export.py ~/.oglm --format jsonl --out - --incremental
+"""
+
+import argparse
+import csv
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import time
+from array import array
+from itertools import chain
+from pathlib import Path
+
+from azimuth_model import FLOATS, FLAGS, KEYS, STRINGS, PredictionTable
+from azimuth_storage import StorageError, atomic_write_json, create_store, fsync_dir
+
+MAGIC = b"OGLMCOL1"
+ALIGN = 64  # выравнивание колонок: SIMD и страницы mmap
+STATE_FILE = "azimuth_predictions.export.json"
+FORMATS = ("csv", "jsonl", "oglc")
+
+
+class CSVWriter:
+    """Колонки — ключи прогноза терминала; незнакомые ключи не пишутся"""
+
+    def __init__(self, f):
+        self.writer = csv.DictWriter(f, fieldnames=KEYS, extrasaction='ignore')
+        self.writer.writeheader()
+
+    def write(self, chunk):
+        self.writer.writerows(chunk)
+
+    def finish(self, start):
+        pass
+
+
+class JSONLWriter:
+    """Прогноз на строку — ровно как в журнале"""
+
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, chunk):
+        if chunk:
+            self.f.write('\n'.join(json.dumps(p, ensure_ascii=False) for p in chunk) + '\n')
+
+    def finish(self, start):
+        pass
+
+
+class ColumnarWriter:
+    """Формат .oglc: колонки пачек PredictionTable подряд
+
+    Число строк заранее неизвестно, поэтому каждая колонка копится во
+    временном файле, а в finish шапка и колонки собираются в один файл.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.parts = {}  # имя → [dtype, временный файл, число элементов]
+        self.rows = 0
+        self.swap = sys.byteorder != 'little'
+
+    def _put(self, name, dtype, values):
+        part = self.parts.get(name)
+        if part is None:
+            part = self.parts[name] = [dtype, tempfile.TemporaryFile(), 0]
+        if self.swap:
+            values = array(values.typecode, values)
+            values.byteswap()
+        values.tofile(part[1])
+        part[2] += len(values)
+
+    def _strings(self, name, values):
+        """Строковая колонка: смещения, длины (-1 — нет значения), UTF-8 подряд"""
+        data = [v.encode('utf-8') if v is not None else b'' for v in values]
+        offsets, lengths = array('q'), array('i')
+        base = self.parts[name + ".data"][2] if name + ".data" in self.parts else 0
+        for value, raw in zip(values, data):
+            offsets.append(base)
+            lengths.append(-1 if value is None else len(raw))
+            base += len(raw)
+        self._put(name + ".offsets", "<i8", offsets)
+        self._put(name + ".lengths", "<i4", lengths)
+        self._put(name + ".data", "|u1", array('B', b''.join(data)))
+
+    def write(self, chunk):
+        table = PredictionTable()
+        table.extend(chunk)
+        for key in KEYS:
+            if key == "timestamp":
+                self._put(key, "<M8[s]", table.times)
+            elif key in table.ints:
+                column = table.ints[key]
+                self._put(key, f"<i{column.itemsize}", column)
+            elif key in FLOATS:
+                self._put(key, "<f8", table.floats[key])
+            elif key in FLAGS:
+                self._put(key, "|i1", table.flags[key])
+            elif key in STRINGS:
+                strings = table.strings
+                self._strings(key, [strings[ref] if ref >= 0 else None for ref in table.refs[key]])
+        self._strings("extras", [json.dumps(table.extras[i], ensure_ascii=False)
+                                 if i in table.extras else None for i in range(len(table))])
+        self.rows += len(table)
+
+    def finish(self, start):
+        if not self.rows:
+            self.write([])
+        # Смещения колонок зависят от длины шапки, а она — от смещений
+        offset = 0
+        while True:
+            columns, position = [], _align(16 + offset)
+            for name, (dtype, f, count) in self.parts.items():
+                columns.append({"name": name, "dtype": dtype, "offset": position, "count": count})
+                position = _align(position + f.tell())
+            header = json.dumps({"format": "oglm-columnar", "version": 1, "rows": self.rows,
+                                 "start": start, "columns": columns}).encode('utf-8')
+            if len(header) <= offset:
+                break
+            offset = len(header)
+
+        out = self.f
+        out.write(MAGIC + offset.to_bytes(8, 'little') + header.ljust(offset))
+        written = 16 + offset
+        for column, (dtype, f, count) in zip(columns, self.parts.values()):
+            out.write(b'\0' * (column["offset"] - written))
+            f.seek(0)
+            shutil.copyfileobj(f, out)
+            written = column["offset"] + f.tell()
+            f.close()
+
+
+WRITERS = {"csv": CSVWriter, "jsonl": JSONLWriter, "oglc": ColumnarWriter}
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def open_columns(path):
+    """(шапка, {колонка: массив}) файла .oglc без копирования
+
+    С NumPy — массивы нужного dtype поверх mmap, без него — memoryview
+    (timestamp тогда — целые секунды).
+    """
+    with open(path, 'rb') as f:
+        if f.read(8) != MAGIC:
+            raise ValueError(f"{path}: не колоночная выгрузка OGLM")
+        length = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(length))
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    codes = {"<M8[s]": 'q', "<i8": 'q', "<i4": 'i', "<f8": 'd', "|i1": 'b', "|u1": 'B'}
+    columns = {}
+    for column in header["columns"]:
+        dtype, offset, count = column["dtype"], column["offset"], column["count"]
+        if np is not None:
+            columns[column["name"]] = np.frombuffer(buffer, dtype=np.dtype(dtype),
+                                                    count=count, offset=offset)
+        else:
+            size = array(codes[dtype]).itemsize
+            columns[column["name"]] = memoryview(buffer)[offset:offset + count * size].cast(codes[dtype])
+    return header, columns
+
+
+def read_state(data_dir):
+    try:
+        with open(Path(data_dir) / STATE_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def export(store, writer, start=0, after_id=None):
+    """Выгрузить историю с позиции start → (start, выгружено, позиция, id перед ней)
+
+    Возвращённая позиция — откуда продолжить следующую выгрузку: первый
+    неразрешённый прогноз или конец истории. after_id — id прогноза перед
+    start на прошлой выгрузке; не совпал — история переписана, и выгрузка
+    идёт с начала (возвращённый start тогда 0).
+    """
+    first = []
+    chunks = store.iter_chunks(max(start - 1, 0))
+    if start:
+        first = next(chunks, [])
+        if first and first[0].get("id", start) == after_id:
+            first = first[1:]
+        else:
+            chunks.close()
+            start, after_id, first = 0, None, []
+            chunks = store.iter_chunks(0)
+
+    position, last_id = start, after_id
+    resume = resume_id = None
+    for chunk in chain([first], chunks):
+        writer.write(chunk)
+        for pred in chunk:
+            if resume is None and not pred.get("resolved"):
+                resume, resume_id = position, last_id
+            position += 1
+            last_id = pred.get("id", position)  # без id (v0.1) id — позиция + 1
+    writer.finish(start)
+    if resume is None:
+        resume, resume_id = position, last_id
+    return start, position - start, resume, resume_id
+
+
+def export_history(store, data_dir, fmt, out, incremental=False):
+    """Выгрузка в файл out ('-' — stdout) → (с позиции, выгружено, с начала ли заново)
+
+    С incremental — с места прошлой выгрузки этого формата; состояние
+    пишется только после того, как файл на месте. Третье значение — True,
+    если история с прошлой выгрузки переписана и выгружена целиком.
+    """
+    state = read_state(data_dir) if incremental else {}
+    last = state.get(fmt, {})
+    requested, after_id = last.get("position", 0), last.get("id")
+    start = requested
+
+    binary = fmt == "oglc"
+    if out == "-":
+        stream = sys.stdout.buffer if binary else sys.stdout
+        start, count, resume, resume_id = export(store, WRITERS[fmt](stream), start, after_id)
+        stream.flush()
+    else:
+        out = Path(out)
+        tmp = out.with_name(out.name + '.tmp')
+        try:
+            with open(tmp, 'wb') if binary else open(tmp, 'w', encoding='utf-8', newline='') as f:
+                start, count, resume, resume_id = export(store, WRITERS[fmt](f), start, after_id)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(str(tmp), str(out))
+        except BaseException:
+            try:
+                tmp.unlink()
+            except FileNotFoundError:
+                pass
+            raise
+        fsync_dir(out.parent)
+
+    if incremental:
+        state[fmt] = {"position": resume, "id": resume_id,
+                      "exported_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+        atomic_write_json(Path(data_dir) / STATE_FILE, state)
+    return start, count, start < requested
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OGLM Azimuth export: история в CSV, JSONL, .oglc")
+    parser.add_argument("data_dir", nargs="?", default=str(Path.home() / ".oglm"),
+                        help="директория терминала (default: ~/.oglm)")
+    parser.add_argument("--out", required=True, help="файл выгрузки ('-' — stdout)")
+    parser.add_argument("--format", choices=FORMATS,
+                        help="формат (по умолчанию — по расширению --out)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="только прогнозы после прошлой выгрузки этого формата")
+    args = parser.parse_args()
+
+    fmt = args.format or Path(args.out).suffix.lstrip('.').lower()
+    if fmt not in FORMATS:
+        parser.error(f"формат по расширению не определить — укажите --format {'|'.join(FORMATS)}")
+    # Отчёт не должен смешиваться с выгрузкой в stdout
+    report = sys.stderr if args.out == "-" else sys.stdout
+
+    store = create_store(args.data_dir)
+    try:
+        started = time.perf_counter()
+        store.open(lambda: {"predictions": [], "stats": {}})
+        start, count, restarted = export_history(store, args.data_dir, fmt, args.out,
+                                                  args.incremental)
+    except (OSError, StorageError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        store.close()
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed > 0 else 0.0
+    since = f" с #{start + 1:,}" if start else ""
+    if restarted:
+        since = " (история переписана после прошлой выгрузки — целиком)"
+    print(f"✅ Выгружено {count:,} прогнозов{since} → {args.out} "
+          f"({elapsed:.2f}s, {rate:,.0f}/s)", file=report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+OGLM Azimuth Feed
+Живой поток цены OGLM
+
+Тики читает asyncio-цикл в фоновом потоке из локального источника:
+- file:PATH       — дописываемый файл (как tail -f)
+- unix:PATH       — UNIX-сокет
+- tcp:HOST:PORT   — TCP (заглушка биржи: python azimuth_feed.py serve tcp:...)
+
+Строка тика: "цена", "epoch цена" или JSON {"price": ..., "ts": ...}.
+Тики копятся и отдаются колбэку пачкой раз в FLUSH_INTERVAL, поэтому
+тысячи тиков в секунду не мешают промпту терминала.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+FLUSH_INTERVAL = 0.1    # как часто отдавать пачку тиков, сек
+POLL_INTERVAL = 0.05    # опрос файла, когда новых строк нет
+RECONNECT_DELAY = 1.0   # пауза перед переподключением к сокету
+
+
+def parse_tick(line):
+    """Строка тика → (epoch, цена); ValueError, если не разобрать"""
+    if isinstance(line, bytes):
+        line = line.decode('utf-8', 'replace')
+    line = line.strip()
+    try:
+        if line.startswith('{'):
+            record = json.loads(line)
+            ts = float(record.get("ts", time.time()))
+            price = float(record["price"])
+        else:
+            parts = line.split()
+            if len(parts) == 1:
+                ts, price = time.time(), float(parts[0])
+            elif len(parts) == 2:
+                ts, price = float(parts[0]), float(parts[1])
+            else:
+                raise ValueError(f"ожидается 'цена' или 'epoch цена': {line!r}")
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"нет цены в тике: {line!r}") from e
+    if not price > 0:
+        raise ValueError(f"цена должна быть > 0: {line!r}")
+    return ts, price
+
+
+class FileTickSource:
+    """Хвост файла: читаются только строки, дописанные после старта
+
+    Файл могут удалить, обрезать или подменить новым (ротация логов) —
+    тогда ждём его появления и читаем новый файл с начала.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    async def lines(self):
+        start = os.SEEK_END
+        while True:
+            try:
+                f = open(self.path, 'rb')
+            except OSError:
+                await asyncio.sleep(POLL_INTERVAL)
+                continue
+            with f:
+                f.seek(0, start)
+                inode = os.fstat(f.fileno()).st_ino
+                partial = b''
+                while True:
+                    chunk = f.read(65536)
+                    if chunk:
+                        *complete, partial = (partial + chunk).split(b'\n')
+                        for line in complete:
+                            yield line
+                        continue
+                    try:
+                        current = os.stat(self.path)
+                    except OSError:
+                        current = None  # удалён: дочитываем старый, ждём новый
+                    if current is not None and current.st_ino != inode:
+                        break
+                    if current is not None and current.st_size < f.tell():
+                        # Файл обрезали — читаем сначала
+                        f.seek(0)
+                        partial = b''
+                    await asyncio.sleep(POLL_INTERVAL)
+            # Ротация: новый файл целиком новый
+            start = os.SEEK_SET
+
+
+class StreamTickSource:
+    """Построчное чтение сокета с переподключением"""
+
+    async def connect(self):
+        raise NotImplementedError
+
+    async def lines(self):
+        while True:
+            try:
+                reader, writer = await self.connect()
+            except OSError:
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    yield line
+            except OSError:
+                pass
+            finally:
+                writer.close()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+
+class UnixTickSource(StreamTickSource):
+    def __init__(self, path):
+        self.path = path
+
+    def connect(self):
+        return asyncio.open_unix_connection(self.path)
+
+
+class TcpTickSource(StreamTickSource):
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    def connect(self):
+        return asyncio.open_connection(self.host, self.port)
+
+
+def parse_source(spec):
+    """'file:PATH' | 'unix:PATH' | 'tcp:HOST:PORT' → источник; ValueError"""
+    kind, _, target = spec.partition(':')
+    if not target:
+        raise ValueError(f"источник в формате file:PATH, unix:PATH или tcp:HOST:PORT: {spec!r}")
+    if kind == 'file':
+        return FileTickSource(target)
+    if kind == 'unix':
+        return UnixTickSource(target)
+    if kind == 'tcp':
+        host, _, port = target.rpartition(':')
+        return TcpTickSource(host or '127.0.0.1', int(port))
+    raise ValueError(f"неизвестный источник: {kind}")
+
+
+class PriceFeed:
+    """Фоновый asyncio-цикл: тики из источника → callback(пачка [(epoch, цена)])"""
+
+    def __init__(self, source, callback, flush_interval=FLUSH_INTERVAL):
+        self.source = source
+        self.callback = callback
+        self.flush_interval = flush_interval
+        self.ticks = 0      # принято тиков
+        self.rejected = 0   # строк, которые не разобрать
+        self.last_tick = None
+        self.error = None   # последняя ошибка колбэка или источника
+        self._buffer = []
+        self._loop = None
+        self._thread = None
+        self._main_task = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="oglm-feed", daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout=2.0):
+        """Остановить цикл и отдать накопленные тики"""
+        loop = self._loop
+        if loop is not None and self._main_task is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self._main_task.cancel)
+            except RuntimeError:
+                pass  # цикл закрылся между проверкой и вызовом
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._flush()
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        try:
+            self._main_task = loop.create_task(self._main())
+            loop.run_until_complete(self._main_task)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # Источник упал — фид стоит, причина видна в строке статуса
+            self.error = e
+        finally:
+            loop.close()
+
+    async def _main(self):
+        reader = asyncio.ensure_future(self._read())
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                self._flush()
+                if reader.done():
+                    reader.result()  # пробросить ошибку источника
+                    return
+        finally:
+            reader.cancel()
+
+    async def _read(self):
+        buffer = self._buffer
+        async for line in self.source.lines():
+            if not line.strip():
+                continue
+            try:
+                buffer.append(parse_tick(line))
+            except ValueError:
+                self.rejected += 1
+
+    def _flush(self):
+        """Отдать пачку колбэку (сам колбэк — в потоке фида)"""
+        if not self._buffer:
+            return
+        ticks, self._buffer[:] = self._buffer[:], []
+        self.ticks += len(ticks)
+        self.last_tick = ticks[-1]
+        try:
+            self.callback(ticks)
+        except Exception as e:
+            # Ошибка обработки не должна останавливать фид
+            self.error = e
+
+
+# --- заглушка биржи: случайное блуждание цены ---
+
+async def serve_ticks(spec, rate=1000.0, price=1.0, volatility=0.001):
+    """Раздавать тики подключившимся клиентам (unix:PATH или tcp:HOST:PORT)"""
+    clients = set()
+
+    async def handle(reader, writer):
+        clients.add(writer)
+        try:
+            await reader.read()  # ждём отключения клиента
+        finally:
+            clients.discard(writer)
+
+    kind, _, target = spec.partition(':')
+    if kind == 'unix':
+        server = await asyncio.start_unix_server(handle, target)
+    elif kind == 'tcp':
+        host, _, port = target.rpartition(':')
+        server = await asyncio.start_server(handle, host or '127.0.0.1', int(port))
+    else:
+        raise ValueError(f"serve: нужен unix:PATH или tcp:HOST:PORT, не {spec!r}")
+
+    interval = 0.01
+    per_step = max(1, int(rate * interval))
+    async with server:
+        while True:
+            lines = []
+            for _ in range(per_step):
+                price *= 1 + random.gauss(0, volatility)
+                lines.append(f"{time.time():.3f} {price:.6f}\n")
+            data = ''.join(lines).encode('utf-8')
+            for writer in list(clients):
+                writer.write(data)
+            await asyncio.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OGLM price feed stand-in")
+    sub = parser.add_subparsers(dest="command")
+    serve = sub.add_parser("serve", help="раздавать случайное блуждание цены")
+    serve.add_argument("spec", help="unix:PATH или tcp:HOST:PORT")
+    serve.add_argument("--rate", type=float, default=1000.0, help="тиков в секунду")
+    serve.add_argument("--price", type=float, default=1.0, help="начальная цена")
+    args = parser.parse_args()
+
+    if args.command != "serve":
+        parser.print_help()
+        sys.exit(1)
+    try:
+        asyncio.run(serve_ticks(args.spec, args.rate, args.price))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
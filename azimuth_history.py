@@ -0,0 +1,420 @@
+"""
+OGLM Azimuth History Index
+Индекс смещений для постраничного просмотра истории и фильтры query
+
+azimuth_predictions.idx — заголовок + записи фиксированного размера:
+id, время (epoch), смещение и длина записи в снапшоте или журнале,
+горизонт и статус. Поиск по id и времени — бинарный, фильтры по
+статусу и горизонту читают только индекс, а страница — только свои
+записи из хранилища. Записи архивных прогнозов лежат рядом с
+сегментами архива (azimuth_archive.TieredIndex).
+"""
+
+import os
+import struct
+from datetime import datetime
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Статус прогноза в индексе
+PENDING, CORRECT, INCORRECT = 0, 1, 2
+
+# Откуда читать запись (ARCHIVE — сегмент azimuth_archive)
+SNAPSHOT, JOURNAL, ARCHIVE = 0, 1, 2
+
+HEADER = struct.Struct('<8sqq')  # magic, размер и mtime_ns снапшота
+ENTRY = struct.Struct('<qqqiibb')  # id, epoch, offset, length, horizon, status, source
+MAGIC = b'OGLMIDX1'
+CHUNK = 4096  # записей индекса за одно чтение
+
+# Сортировки команды query: имя → поле прогноза (None — порядок записи)
+SORTS = {"time": None, "azimuth": "azimuth", "error": "error", "pnl": "pnl"}
+SEARCH_LIMIT = 20
+
+
+def parse_timestamp(timestamp):
+    """'YYYY-MM-DD HH:MM:SS' (или префикс) → epoch, 0 если не разобрать"""
+    for fmt, size in ((TIMESTAMP_FORMAT, 19), ("%Y-%m-%d", 10)):
+        try:
+            return int(datetime.strptime(timestamp[:size], fmt).timestamp())
+        except (TypeError, ValueError):
+            continue
+    return 0
+
+
+def prediction_status(pred):
+    if not pred.get("resolved"):
+        return PENDING
+    return CORRECT if pred.get("correct") else INCORRECT
+
+
+def make_entry(pred, position, offset, length, source):
+    """Запись индекса для прогноза; без id (AzimuthTrader) — порядковый номер"""
+    return (
+        pred.get("id", position + 1),
+        parse_timestamp(pred.get("timestamp", "")),
+        offset,
+        length,
+        int(pred.get("horizon_days", 0) or 0),
+        prediction_status(pred),
+        source,
+    )
+
+
+class HistoryIndex:
+    """Файл индекса: append при записи, перестроение при свёртке"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def _snapshot_header(self, fingerprint):
+        size, mtime = fingerprint or (0, 0)
+        return HEADER.pack(MAGIC, size, mtime)
+
+    def valid(self, count, fingerprint):
+        """Индекс соответствует текущему снапшоту и числу прогнозов"""
+        self.flush()
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.read(HEADER.size)
+                size = f.seek(0, os.SEEK_END)
+        except OSError:
+            return False
+        return (header == self._snapshot_header(fingerprint)
+                and size == HEADER.size + count * ENTRY.size)
+
+    def rewrite(self, entries, fingerprint):
+        """Атомарно записать индекс заново (после свёртки)"""
+        self.close()
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(self._snapshot_header(fingerprint))
+            for entry in entries:
+                f.write(ENTRY.pack(*entry))
+        os.replace(str(tmp), str(self.path))
+
+    def append(self, entry):
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        self._file.write(ENTRY.pack(*entry))
+
+    def update(self, updates):
+        """Переписать записи на месте: [(позиция, запись)] (прогнозы разрешены позже)"""
+        self.flush()
+        with open(self.path, 'r+b') as f:
+            for position, entry in sorted(updates):
+                f.seek(HEADER.size + position * ENTRY.size)
+                f.write(ENTRY.pack(*entry))
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # --- чтение ---
+
+    def __len__(self):
+        return self._count()
+
+    def _count(self):
+        """Записей в файле индекса"""
+        self.flush()
+        try:
+            return (os.path.getsize(self.path) - HEADER.size) // ENTRY.size
+        except OSError:
+            return 0
+
+    def entries(self, start, stop):
+        """Записи индекса [start, stop)"""
+        self.flush()
+        if stop <= start:
+            return []
+        with open(self.path, 'rb') as f:
+            f.seek(HEADER.size + start * ENTRY.size)
+            data = f.read((stop - start) * ENTRY.size)
+        return list(ENTRY.iter_unpack(data))
+
+    def _bisect(self, key, value, f, count):
+        """Первая позиция, где entry[key] >= value (ключ монотонен)"""
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            f.seek(HEADER.size + mid * ENTRY.size)
+            if ENTRY.unpack(f.read(ENTRY.size))[key] < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def position_of(self, key, value):
+        """Позиция по id (key=0) или времени (key=1) бинарным поиском"""
+        count = self._count()
+        with open(self.path, 'rb') as f:
+            return self._bisect(key, value, f, count)
+
+    def lookup(self, ids):
+        """{id: (позиция, запись)} для набора id за одно открытие файла
+
+        id обычно совпадает с позицией + 1 — сначала проверяется она,
+        бинарный поиск только при расхождении.
+        """
+        count = self._count()
+        found = {}
+        with open(self.path, 'rb') as f:
+            for pred_id in sorted(set(ids)):
+                position = pred_id - 1
+                entry = None
+                if 0 <= position < count:
+                    f.seek(HEADER.size + position * ENTRY.size)
+                    entry = ENTRY.unpack(f.read(ENTRY.size))
+                if entry is None or entry[0] != pred_id:
+                    position = self._bisect(0, pred_id, f, count)
+                    if position == count:
+                        continue
+                    f.seek(HEADER.size + position * ENTRY.size)
+                    entry = ENTRY.unpack(f.read(ENTRY.size))
+                    if entry[0] != pred_id:
+                        continue
+                found[pred_id] = (position, entry)
+        return found
+
+    def find(self, start, stop, limit, reverse=False, status=None, horizon=None):
+        """До limit позиций из [start, stop), подходящих под фильтры"""
+        found = []
+        if reverse:
+            hi = stop
+            while hi > start and len(found) < limit:
+                lo = max(start, hi - CHUNK)
+                chunk = self.entries(lo, hi)
+                for i in range(len(chunk) - 1, -1, -1):
+                    if self._match(chunk[i], status, horizon):
+                        found.append(lo + i)
+                        if len(found) == limit:
+                            break
+                hi = lo
+            found.reverse()
+        else:
+            lo = start
+            while lo < stop and len(found) < limit:
+                hi = min(stop, lo + CHUNK)
+                for i, entry in enumerate(self.entries(lo, hi)):
+                    if self._match(entry, status, horizon):
+                        found.append(lo + i)
+                        if len(found) == limit:
+                            break
+                lo = hi
+        return found
+
+    @staticmethod
+    def _match(entry, status, horizon):
+        if status is not None and entry[5] != status:
+            return False
+        if horizon is not None and entry[4] != horizon:
+            return False
+        return True
+
+
+def parse_query(args):
+    """Аргументы команды history → фильтры; ValueError при ошибке
+
+    history 500-550 | --since 2026-10-01 | --until ДАТА |
+    --correct | --incorrect | --pending | --horizon 30
+    """
+    query = {"first": None, "last": None, "since": None, "until": None,
+             "status": None, "horizon": None}
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if arg in ("--since", "--until", "--horizon"):
+            if not args:
+                raise ValueError(f"{arg}: нужно значение")
+            value = args.pop(0)
+            if arg == "--horizon":
+                query["horizon"] = int(value)
+            else:
+                epoch = parse_timestamp(value)
+                if not epoch:
+                    raise ValueError(f"{arg}: дата в формате YYYY-MM-DD")
+                query[arg[2:]] = epoch
+        elif arg == "--correct":
+            query["status"] = CORRECT
+        elif arg == "--incorrect":
+            query["status"] = INCORRECT
+        elif arg == "--pending":
+            query["status"] = PENDING
+        elif '-' in arg and not arg.startswith('-'):
+            first, last = arg.split('-', 1)
+            query["first"], query["last"] = int(first), int(last)
+        else:
+            raise ValueError(f"неизвестный аргумент: {arg}")
+    return query
+
+
+def parse_search(args):
+    """Аргументы команды query → фильтры и сортировка; ValueError при ошибке
+
+    Фильтры history плюс --azimuth -99 | --azimuth -100:-90,
+    --sort [-]time|azimuth|error|pnl (минус — по убыванию), --limit N (0 — все).
+    """
+    args = list(args)
+    rest = []
+    search = {"azimuth": None, "sort": None, "descending": False, "limit": SEARCH_LIMIT}
+    while args:
+        arg = args.pop(0)
+        if arg not in ("--azimuth", "--sort", "--limit"):
+            rest.append(arg)
+            continue
+        if not args:
+            raise ValueError(f"{arg}: нужно значение")
+        value = args.pop(0)
+        if arg == "--azimuth":
+            low, _, high = value.partition(':')
+            try:
+                search["azimuth"] = (float(low), float(high or low))
+            except ValueError:
+                raise ValueError("--azimuth: число или диапазон, например -100:-90") from None
+        elif arg == "--limit":
+            if not value.isdigit():
+                raise ValueError("--limit: целое число ≥ 0")
+            search["limit"] = int(value)
+        else:
+            name = value.lstrip('-')
+            if name not in SORTS:
+                raise ValueError(f"--sort: {' | '.join(SORTS)}")
+            search["sort"] = SORTS[name]
+            search["descending"] = value.startswith('-')
+    search.update(parse_query(rest))
+    return search
+
+
+def search_predictions(predictions, search):
+    """(найдено, прогнозы) под фильтры parse_search — скан без индексов
+
+    Тот же порядок, что у SQL: NULL первым по возрастанию, равные — по
+    порядку записи.
+    """
+    match = search_filter(search)
+    return search_result([pred for position, pred in enumerate(predictions)
+                          if match(position, pred)], search)
+
+
+def search_filter(search):
+    """match(позиция, прогноз) для фильтров parse_search (позиция — для прогнозов без id)"""
+    status, horizon = search["status"], search["horizon"]
+    since, until = search["since"], search["until"]
+    first, last = search["first"], search["last"]
+    low, high = search["azimuth"] or (None, None)
+
+    def match(position, pred):
+        if status is not None and prediction_status(pred) != status:
+            return False
+        if horizon is not None and int(pred.get("horizon_days", 0) or 0) != horizon:
+            return False
+        if first is not None and not first <= pred.get("id", position + 1) <= last:
+            return False
+        if low is not None:
+            azimuth = pred.get("azimuth")
+            if azimuth is None or not low <= azimuth <= high:
+                return False
+        if since is not None or until is not None:
+            epoch = parse_timestamp(pred.get("timestamp", ""))
+            if (since is not None and epoch < since) or (until is not None and epoch >= until + 86400):
+                return False
+        return True
+    return match
+
+
+def search_result(found, search):
+    """(найдено, прогнозы) — отобранные в порядке записи, отсортированные и урезанные"""
+    field = search["sort"]
+    if field is not None:
+        found.sort(key=lambda p: (p.get(field) is not None, p.get(field) or 0),
+                   reverse=search["descending"])
+    elif search["descending"]:
+        found.reverse()
+    limit = search["limit"]
+    return len(found), found[:limit] if limit else found
+
+
+def search_lines(total, predictions):
+    """Таблица результатов query"""
+    lines = [f"{'#':>8} {'время':<19} {'азимут':>8} {'дн':>4} {'факт':>9} "
+             f"{'ошибка':>8} {'P&L':>9}  статус"]
+    for pred in predictions:
+        status = ("✅" if pred.get("correct") else "❌") if pred.get("resolved") else "⏳"
+
+        def number(key, fmt):
+            value = pred.get(key)
+            return format(value, fmt) if isinstance(value, (int, float)) else "—"
+
+        lines.append(f"{pred.get('id', '—'):>8} {pred.get('timestamp', ''):<19} "
+                     f"{number('azimuth', '+.1f'):>8} {pred.get('horizon_days', '—'):>4} "
+                     f"{number('actual_movement', '+.1f'):>9} {number('error', '.1f'):>8} "
+                     f"{number('pnl', '+.2f'):>9}  {status}")
+    lines.append(f"Найдено: {total:,}" + (f", показано {len(predictions):,}"
+                                          if len(predictions) < total else ""))
+    return lines
+
+
+class HistoryPager:
+    """Постраничный обход истории по индексу"""
+
+    def __init__(self, store, query, page_size=20):
+        self.store = store
+        self.index = store.ensure_index()
+        self.query = query
+        self.page_size = page_size
+        self.page = []
+
+        count = len(self.index)
+        self.start, self.stop = 0, count
+        if query["first"] is not None:
+            self.start = max(self.start, self.index.position_of(0, query["first"]))
+            self.stop = min(self.stop, self.index.position_of(0, query["last"] + 1))
+        if query["since"] is not None:
+            self.start = max(self.start, self.index.position_of(1, query["since"]))
+        if query["until"] is not None:
+            # --until включительно: до конца указанного дня
+            self.stop = min(self.stop, self.index.position_of(1, query["until"] + 86400))
+
+    def _find(self, start, stop, reverse):
+        return self.index.find(start, stop, self.page_size, reverse,
+                               self.query["status"], self.query["horizon"])
+
+    def first(self):
+        """Первая страница: с начала диапазона или последняя, если он не задан"""
+        if self.query["first"] is None and self.query["since"] is None:
+            self.page = self._find(self.start, self.stop, reverse=True)
+        else:
+            self.page = self._find(self.start, self.stop, reverse=False)
+        return self.records()
+
+    def older(self):
+        if self.page:
+            page = self._find(self.start, self.page[0], reverse=True)
+            if page:
+                self.page = page
+        return self.records()
+
+    def newer(self):
+        if self.page:
+            page = self._find(self.page[-1] + 1, self.stop, reverse=False)
+            if page:
+                self.page = page
+        return self.records()
+
+    def records(self):
+        """Прогнозы текущей страницы (читаются только они)"""
+        entries = [self.index.entries(pos, pos + 1)[0] for pos in self.page]
+        return self.store.read_predictions(entries)
+
+    def position(self):
+        """'позиции a-b из n' для подписи страницы"""
+        if not self.page:
+            return f"0 из {self.stop - self.start}"
+        return f"#{self.page[0] + 1}–#{self.page[-1] + 1} из {len(self.index)}"
@@ -0,0 +1,116 @@
+"""
+OGLM Azimuth Lock
+Блокировки и групповой fsync для общей директории данных
+
+Несколько терминалов (и потоки сервера) пишут в один ~/.oglm:
+- FileLock — advisory-блокировка файла (flock) + потоковая, реентерабельная;
+- GroupCommit — один fsync журнала на всех, кто ждёт подтверждения:
+  первый пришедший синхронизирует всё записанное к этому моменту, а
+  остальные видят в .commit, что их смещение уже на диске.
+
+Без fcntl (Windows) блокировка действует только между потоками
+одного процесса.
+"""
+
+import os
+import struct
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+COMMIT = struct.Struct('<qqq')  # поколение снапшота (размер, mtime_ns), синхронизировано до
+
+
+class FileLock:
+    """Эксклюзивная блокировка файла; вложенные acquire одного потока — без ожидания"""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._depth = 0
+        self._thread_lock = threading.RLock()
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        try:
+            if self._depth == 0:
+                if self._fd is None:
+                    self._fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_EX)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        self._depth += 1
+        return self
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def read(self, size):
+        """Прочитать начало файла блокировки (под блокировкой)"""
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        return os.read(self._fd, size)
+
+    def write(self, data):
+        """Переписать начало файла блокировки (под блокировкой)"""
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, data)
+
+    def close(self):
+        with self._thread_lock:
+            if self._fd is not None and self._depth == 0:
+                os.close(self._fd)
+                self._fd = None
+
+
+class GroupCommit:
+    """fsync журнала, общий для потоков и процессов"""
+
+    def __init__(self, journal_path, commit_path):
+        self.journal_path = journal_path
+        self.lock = FileLock(commit_path)
+        self.syncs = 0  # сколько fsync реально выполнено этим процессом
+        self.waits = 0  # сколько подтверждений запрошено
+        self._fd = None
+
+    def sync(self, generation, offset):
+        """Дождаться, пока журнал до offset окажется на диске
+
+        generation — (размер, mtime_ns) снапшота: после свёртки смещения
+        журнала начинаются заново. True, если fsync сделал этот вызов.
+        """
+        with self.lock:
+            self.waits += 1
+            state = self.lock.read(COMMIT.size)
+            if len(state) == COMMIT.size:
+                size, mtime, done = COMMIT.unpack(state)
+                if (size, mtime) == tuple(generation) and done >= offset:
+                    return False  # чужой fsync уже покрыл нашу запись
+
+            if self._fd is None:
+                self._fd = os.open(str(self.journal_path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            # Всё, что записано в журнал к этому моменту любым процессом
+            done = os.fstat(self._fd).st_size
+            os.fsync(self._fd)
+            self.lock.write(COMMIT.pack(generation[0], generation[1], done))
+            self.syncs += 1
+            return True
+
+    def close(self):
+        with self.lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+        self.lock.close()
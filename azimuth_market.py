@@ -0,0 +1,672 @@
+#!/usr/bin/env python3
+"""
+OGLM Azimuth Market
+Агентная симуляция рынка OGLM
+
+Популяции агентов со своими стратегиями каждый тик отправляют заявки.
+Заявки тика сводятся по текущей цене (встречные покупки и продажи гасят
+друг друга), остаток исполняется о пул x·y=k (AMM) и двигает цену.
+Сценарий по умолчанию — стресс-тест 30 ноября (кит, ФРС, Федя01/ALADDIN,
+community, Протон-А; simulation_market_stress_test_nov30.md).
+
+Стоимость тика не зависит от числа агентов. У пороговых стратегий
+(паника, покупка на дне, FOMO) пороги отсортированы, и сработавших
+находит бинарный поиск по префиксным суммам. У случайных (шум, тренд,
+стоимость, community) активные агенты тика выбираются геометрическими пропусками —
+работа пропорциональна числу активных. 100k агентов × 10k тиков —
+секунды. С NumPy выборки векторные, без него — тот же алгоритм на
+random (медленнее; траектория при том же seed другая).
+
+Объёмы в сценарии заданы на популяцию и на день, поэтому --agents и
+--ticks меняют детализацию, а не масштаб рынка.
+
+Терминал с --market SCENARIO оценивает прогнозы по этой траектории:
+прогноз на h дней получает цену рынка через h дней. Часы терминала
+грубые (CLOCK_TICKS_PER_DAY тиков в день), каждый прогноз сдвигает их
+на тик, а пройденная траектория отбрасывается.
+
+    python azimuth_market.py                         # стресс-тест, отчёт по дням
+    python azimuth_market.py --agents 100000 --ticks 10000 --seed 42
+    python azimuth_market.py --scenario calm --days 90 --out path.csv
+"""
+
+import argparse
+import copy
+import csv
+import json
+import math
+import random
+import sys
+import time
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+from azimuth_chart import render_chart
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Стресс-тест 30 ноября: обвал в зловещую долину, дно, Федя01, контратака
+STRESS_TEST = {
+    "name": "stress",
+    "days": 15,
+    "ticks": 10_000,
+    "price": 1.0,
+    "liquidity": 1_000_000,  # quote в пуле при старте
+    "populations": [
+        {"name": "Шум", "strategy": "noise", "agents": 40_000,
+         "volume": 400_000, "activity": 0.005},
+        {"name": "Тренд", "strategy": "momentum", "agents": 8_000,
+         "volume": 100_000, "activity": 0.01, "lookback": [0.25, 1, 3]},
+        {"name": "Стоимость", "strategy": "value", "agents": 5_000,
+         "volume": 250_000, "activity": 0.01},
+        {"name": "Ранние адоптеры", "strategy": "schedule", "agents": 1_047,
+         "side": "sell", "amount": 400_000, "days": [0, 3]},
+        {"name": "Слабые руки", "strategy": "panic", "agents": 30_000,
+         "holdings": 1_000_000, "drawdown": [0.7, 0.99]},
+        {"name": "ФРС", "strategy": "schedule", "agents": 12,
+         "side": "sell", "amount": 8_000_000, "days": [3, 8]},
+        {"name": "@fractal_whale", "strategy": "schedule", "agents": 1,
+         "side": "sell", "amount": 2_000_000, "days": [3, 7]},
+        {"name": "Community", "strategy": "holder", "agents": 19_000,
+         "volume": 10_000, "activity": 0.002},
+        {"name": "Федя01/ALADDIN", "strategy": "dip", "agents": 555,
+         "budget": 300_000, "drawdown": [0.97, 0.995], "days": [8, 15]},
+        {"name": "Протон-А", "strategy": "defender", "agents": 1,
+         "liquidity": 3.0, "floor": 0.02, "budget": 500_000, "days": [9, 15]},
+        {"name": "FOMO", "strategy": "fomo", "agents": 1_384,
+         "budget": 2_000_000, "rise": [5, 100], "days": [9, 15]},
+    ],
+}
+
+# Спокойный рынок без событий — для долгих сессий терминала
+CALM = {
+    "name": "calm",
+    "days": 365,
+    "ticks": 36_500,
+    "price": 1.0,
+    "liquidity": 1_000_000,
+    "populations": [
+        {"name": "Шум", "strategy": "noise", "agents": 60_000,
+         "volume": 300_000, "activity": 0.005},
+        {"name": "Тренд", "strategy": "momentum", "agents": 10_000,
+         "volume": 40_000, "activity": 0.01, "lookback": [1, 7, 30]},
+        {"name": "Стоимость", "strategy": "value", "agents": 10_000,
+         "volume": 120_000, "activity": 0.01},
+        {"name": "Community", "strategy": "holder", "agents": 30_000,
+         "volume": 20_000, "activity": 0.002},
+    ],
+}
+
+SCENARIOS = {"stress": STRESS_TEST, "calm": CALM}
+
+# Детализация часов терминала: прогноз на 90 дней — 360 тиков, а не 60k
+CLOCK_TICKS_PER_DAY = 4
+
+
+class Draws:
+    """Случайные числа симуляции: NumPy Generator, без него — random.Random"""
+
+    def __init__(self, seed=None):
+        self.gen = np.random.default_rng(seed) if np is not None else None
+        self.rng = random.Random(seed)
+
+    def weights(self, total, n, spread=1.0):
+        """Доли агентов в total: логнормальные, в сумме total"""
+        if self.gen is not None:
+            values = self.gen.lognormal(0.0, spread, n)
+            return values * (total / values.sum())
+        values = [self.rng.lognormvariate(0.0, spread) for _ in range(n)]
+        scale = total / sum(values)
+        return array('d', (v * scale for v in values))
+
+    def uniform(self, low, high, n):
+        if self.gen is not None:
+            return self.gen.uniform(low, high, n)
+        return array('d', (self.rng.uniform(low, high) for _ in range(n)))
+
+    def active(self, n, p):
+        """Индексы агентов, активных в этом тике (каждый — с вероятностью p)
+
+        Пропуски между активными геометрические, поэтому выборка стоит
+        O(активных), а не O(n).
+        """
+        if p <= 0 or n == 0:
+            return []
+        if p >= 1:
+            return range(n)
+        if self.gen is not None:
+            expected = n * p
+            gaps = self.gen.geometric(p, int(expected + 4 * math.sqrt(expected)) + 16)
+            positions = np.cumsum(gaps) - 1
+            while positions[-1] < n:  # редко: выборка оказалась короче n
+                more = np.cumsum(self.gen.geometric(p, len(gaps))) + positions[-1]
+                positions = np.concatenate((positions, more))
+            return positions[:np.searchsorted(positions, n)]
+        log_q = math.log1p(-p)
+        found = []
+        i = int(math.log(1.0 - self.rng.random()) / log_q)
+        while i < n:
+            found.append(i)
+            i += 1 + int(math.log(1.0 - self.rng.random()) / log_q)
+        return found
+
+    def total(self, values, indexes):
+        if self.gen is not None:
+            return float(values[indexes].sum())
+        return sum(map(values.__getitem__, indexes))
+
+    def split(self, values, indexes, p_buy):
+        """(покупки, продажи): каждый активный покупает с вероятностью p_buy"""
+        if self.gen is not None:
+            chosen = values[indexes]
+            bought = float(chosen[self.gen.random(len(chosen)) < p_buy].sum())
+            return bought, float(chosen.sum()) - bought
+        bought = sold = 0.0
+        rand = self.rng.random
+        for i in indexes:
+            if rand() < p_buy:
+                bought += values[i]
+            else:
+                sold += values[i]
+        return bought, sold
+
+
+class Population:
+    """Агенты одной стратегии
+
+    orders(market) → (покупки в quote, продажи в base) за тик; holding() —
+    сколько агентов сейчас держат OGLM.
+    """
+
+    def __init__(self, spec, market, draws):
+        self.name = spec.get("name", spec["strategy"])
+        self.agents = max(1, int(spec.get("agents", 1)))
+        first, last = spec.get("days", (0, math.inf))
+        self.first = round(first * market.ticks_per_day)
+        self.last = math.inf if last == math.inf else round(last * market.ticks_per_day)
+        self.draws = draws
+
+    def live(self, tick):
+        return self.first <= tick < self.last
+
+    def holding(self):
+        return 0
+
+
+class NoiseTraders(Population):
+    """Шум: активный агент покупает или продаёт свою долю volume"""
+
+    def __init__(self, spec, market, draws):
+        super().__init__(spec, market, draws)
+        self.activity = spec.get("activity", 0.01)
+        # volume — ожидаемый оборот популяции за день в OGLM
+        per_tick = spec["volume"] / market.ticks_per_day
+        self.sizes = draws.weights(per_tick / self.activity, self.agents, spec.get("spread", 1.0))
+        self.p_buy = 0.5 + spec.get("bias", 0.0) / 2
+
+    def orders(self, market):
+        bought, sold = self.draws.split(self.sizes, self.draws.active(self.agents, self.activity),
+                                        self.p_buy)
+        return bought * market.price, sold
+
+
+class Momentum(Population):
+    """Тренд: покупка, если цена выше, чем lookback дней назад, иначе продажа (volume в OGLM)"""
+
+    def __init__(self, spec, market, draws):
+        super().__init__(spec, market, draws)
+        self.activity = spec.get("activity", 0.01)
+        per_tick = spec["volume"] / market.ticks_per_day
+        sizes = draws.weights(per_tick / self.activity, self.agents, spec.get("spread", 1.0))
+        lookbacks = spec.get("lookback", [1])
+        # Агенты поровну между окнами; у каждого окна — свой срез размеров
+        self.groups = []
+        for i, days in enumerate(lookbacks):
+            part = sizes[i::len(lookbacks)]
+            self.groups.append((max(1, round(days * market.ticks_per_day)), part))
+
+    def orders(self, market):
+        bought = sold = 0.0
+        price, prices, tick = market.price, market.prices, market.tick
+        for lag, sizes in self.groups:
+            past = prices[max(tick - lag, 0) - market.offset]
+            if price == past:
+                continue
+            volume = self.draws.total(sizes, self.draws.active(len(sizes), self.activity))
+            if price > past:
+                bought += volume * past
+            else:
+                sold += volume
+        return bought, sold
+
+
+class ValueTraders(Population):
+    """Стоимость: покупают ниже value, продают выше — тем больше, чем дальше цена
+
+    volume — оборот за день при отклонении в e раз; без них тренд
+    подпитывает сам себя.
+    """
+
+    def __init__(self, spec, market, draws):
+        super().__init__(spec, market, draws)
+        self.activity = spec.get("activity", 0.01)
+        self.value = spec.get("value", market.prices[0])
+        per_tick = spec["volume"] / market.ticks_per_day
+        self.sizes = draws.weights(per_tick / self.activity, self.agents, spec.get("spread", 1.0))
+
+    def orders(self, market):
+        price = market.price
+        deviation = min(abs(math.log(self.value / price)), 1.0)
+        volume = self.draws.total(self.sizes, self.draws.active(self.agents, self.activity)) * deviation
+        return (volume * price, 0.0) if price < self.value else (0.0, volume)
+
+
+class Holders(Population):
+    """Community: не продают никогда, докупают на просадке — чем глубже, тем чаще"""
+
+    def __init__(self, spec, market, draws):
+        super().__init__(spec, market, draws)
+        self.activity = spec.get("activity", 0.002)
+        per_tick = spec["volume"] / market.ticks_per_day
+        self.sizes = draws.weights(per_tick / self.activity, self.agents, spec.get("spread", 1.0))
+
+    def orders(self, market):
+        active = self.draws.active(self.agents, self.activity * market.drawdown)
+        return self.draws.total(self.sizes, active), 0.0
+
+    def holding(self):
+        return self.agents
+
+
+class ThresholdAgents(Population):
+    """Агенты с порогом: каждый срабатывает один раз, когда сигнал дошёл до порога
+
+    Пороги отсортированы, поэтому сработавшие — префикс: его конец находит
+    bisect, а объём — разность префиксных сумм.
+    """
+
+    signal_range = "drawdown"
+
+    def __init__(self, spec, market, draws, total):
+        super().__init__(spec, market, draws)
+        low, high = spec[self.signal_range]
+        thresholds = draws.uniform(low, high, self.agents)
+        amounts = draws.weights(total, self.agents, spec.get("spread", 1.0))
+        if np is not None:
+            order = np.argsort(thresholds, kind='stable')
+            self.thresholds = thresholds[order].tolist()
+            self.prefix = [0.0] + np.cumsum(amounts[order]).tolist()
+        else:
+            pairs = sorted(zip(thresholds, amounts))
+            self.thresholds = [t for t, _ in pairs]
+            self.prefix = [0.0] + list(accumulate(a for _, a in pairs))
+        self.fired = 0
+
+    def fire(self, signal):
+        """Объём агентов, чей порог сигнал достиг впервые"""
+        k = bisect_right(self.thresholds, signal)
+        if k <= self.fired:
+            return 0.0
+        amount = self.prefix[k] - self.prefix[self.fired]
+        self.fired = k
+        return amount
+
+
+class PanicSellers(ThresholdAgents):
+    """Слабые руки: продают всё, когда просадка от пика дошла до их порога"""
+
+    def __init__(self, spec, market, draws):
+        super().__init__(spec, market, draws, spec["holdings"])
+
+    def orders(self, market):
+        return 0.0, self.fire(market.drawdown)
+
+    def holding(self):
+        return self.agents - self.fired
+
+
+class DipBuyers(ThresholdAgents):
+    """Покупка на дне: бюджет агента — в рынок, когда просадка дошла до порога"""
+
+    def __init__(self, spec, market, draws):
+        super().__init__(spec, market, draws, spec["budget"])
+
+    def orders(self, market):
+        return self.fire(market.drawdown), 0.0
+
+    def holding(self):
+        return self.fired
+
+
+class FomoBuyers(ThresholdAgents):
+    """FOMO: бюджет агента — в рынок, когда цена выросла от дна на порог (rise, раз)"""
+
+    signal_range = "rise"
+
+    def __init__(self, spec, market, draws):
+        super().__init__(spec, market, draws, spec["budget"])
+
+    def orders(self, market):
+        return self.fire(market.price / market.trough - 1), 0.0
+
+    def holding(self):
+        return self.fired
+
+
+class Scheduled(Population):
+    """Крупный игрок по расписанию: amount равными долями по тикам окна days
+
+    side "sell" — amount в OGLM, "buy" — в quote.
+    """
+
+    def __init__(self, spec, market, draws):
+        super().__init__(spec, market, draws)
+        ticks = max(1, self.last - self.first) if self.last != math.inf else market.ticks
+        self.per_tick = spec["amount"] / ticks
+        self.sell = spec.get("side", "sell") == "sell"
+
+    def orders(self, market):
+        return (0.0, self.per_tick) if self.sell else (self.per_tick, 0.0)
+
+    def holding(self):
+        return 0 if self.sell else self.agents
+
+
+class Defender(Population):
+    """Протон-А: на входе углубляет пул в liquidity раз, затем держит цену floor
+
+    Покупка ровно на столько, чтобы поднять цену пула до floor, но не
+    больше rate за тик (по умолчанию — бюджет за сутки) и budget всего.
+    """
+
+    def __init__(self, spec, market, draws):
+        super().__init__(spec, market, draws)
+        self.liquidity = spec.get("liquidity", 1.0)
+        self.floor = spec.get("floor", 0.0)
+        self.budget = spec.get("budget", 0.0)
+        self.rate = spec.get("rate", self.budget / market.ticks_per_day)
+        self.deepened = False
+
+    def orders(self, market):
+        if not self.deepened:
+            market.deepen(self.liquidity)
+            self.deepened = True
+        if market.price >= self.floor or self.budget <= 0:
+            return 0.0, 0.0
+        # x·y=k: цена floor — когда в пуле sqrt(k·floor) quote
+        needed = math.sqrt(market.k * self.floor) - market.quote
+        spend = min(needed, self.rate, self.budget)
+        self.budget -= spend
+        return spend, 0.0
+
+    def holding(self):
+        return self.agents if self.deepened else 0
+
+
+STRATEGIES = {
+    "noise": NoiseTraders,
+    "momentum": Momentum,
+    "value": ValueTraders,
+    "holder": Holders,
+    "panic": PanicSellers,
+    "dip": DipBuyers,
+    "fomo": FomoBuyers,
+    "schedule": Scheduled,
+    "defender": Defender,
+}
+
+
+def load_scenario(name):
+    """Встроенный сценарий по имени или JSON-файл; ValueError при ошибке"""
+    if name in SCENARIOS:
+        return copy.deepcopy(SCENARIOS[name])
+    try:
+        with open(name, encoding='utf-8') as f:
+            scenario = json.load(f)
+    except FileNotFoundError:
+        raise ValueError(f"нет сценария {name!r}: {' | '.join(SCENARIOS)} или путь к JSON") from None
+    except ValueError as e:
+        raise ValueError(f"{name}: {e}") from None
+    for spec in scenario.get("populations", []):
+        if spec.get("strategy") not in STRATEGIES:
+            raise ValueError(f"{name}: неизвестная стратегия {spec.get('strategy')!r} "
+                             f"({' | '.join(STRATEGIES)})")
+    return scenario
+
+
+class MarketSimulator:
+    """Рынок OGLM: пул x·y=k и популяции агентов, тик за тиком
+
+    prices[t - offset] — цена после t тиков (prices[0] — стартовая),
+    траектория растёт по мере запроса: price_at(t) досчитывает до t.
+    forget(t) отбрасывает цены раньше t (кроме окна тренда), offset —
+    сколько отброшено.
+    """
+
+    def __init__(self, scenario, agents=None, ticks=None, days=None, seed=None):
+        self.name = scenario.get("name", "custom")
+        self.days = days or scenario["days"]
+        # --days меняет длительность при той же детализации
+        per_day = scenario["ticks"] / scenario["days"]
+        self.ticks = ticks or round(per_day * self.days)
+        self.ticks_per_day = self.ticks / self.days
+        self.quote = float(scenario.get("liquidity", 1_000_000))
+        self.base = self.quote / scenario.get("price", 1.0)
+        self.k = self.quote * self.base
+        self.peak = self.trough = self.price
+        self.tick = 0
+        self.offset = 0
+        self.prices = array('d', [self.price])
+        self.volumes = array('d', [0.0])
+
+        specs = scenario["populations"]
+        scale = 1.0
+        if agents:
+            scale = agents / sum(spec.get("agents", 1) for spec in specs)
+        self.draws = Draws(seed)
+        self.populations = []
+        for spec in specs:
+            spec = dict(spec, agents=max(1, round(spec.get("agents", 1) * scale)))
+            self.populations.append(STRATEGIES[spec["strategy"]](spec, self, self.draws))
+        # Самое длинное окно тренда: столько цен forget() оставляет
+        self.lookback = max((lag for pop in self.populations
+                             for lag, _ in getattr(pop, "groups", ())), default=0)
+
+    @property
+    def price(self):
+        return self.quote / self.base
+
+    @property
+    def drawdown(self):
+        """Просадка от пика, 0..1"""
+        return 1.0 - self.price / self.peak
+
+    @property
+    def agents(self):
+        return sum(pop.agents for pop in self.populations)
+
+    def deepen(self, factor):
+        """Добавить ликвидность в пул (цена не меняется)"""
+        self.quote *= factor
+        self.base *= factor
+        self.k = self.quote * self.base
+
+    def step(self):
+        """Один тик: заявки популяций → свод по цене тика → остаток о пул"""
+        tick = self.tick
+        price = self.price
+        bought = sold = 0.0
+        for pop in self.populations:
+            if pop.first <= tick < pop.last:
+                buy, sell = pop.orders(self)
+                bought += buy
+                sold += sell
+        # Встречные заявки гасятся по цене тика, в пул идёт только перевес
+        net = bought - sold * price
+        if net > 0:
+            self.quote += net
+            self.base = self.k / self.quote
+        elif net < 0:
+            self.base -= net / price
+            self.quote = self.k / self.base
+        price = self.price
+        if price > self.peak:
+            self.peak = price
+        if price < self.trough:
+            self.trough = price
+        self.tick += 1
+        self.prices.append(price)
+        self.volumes.append(bought + sold * price)
+
+    def run(self, ticks=None):
+        """Досчитать ticks тиков (по умолчанию — до конца сценария)"""
+        stop = self.tick + ticks if ticks is not None else self.ticks
+        step = self.step
+        while self.tick < stop:
+            step()
+        return self
+
+    def price_at(self, tick):
+        if tick > self.tick:
+            self.run(tick - self.tick)
+        return self.prices[tick - self.offset]
+
+    def forget(self, tick):
+        """Отбросить цены и объёмы раньше tick (окно тренда остаётся)"""
+        cut = min(tick, self.tick) - self.lookback - self.offset
+        # Сдвиг массива — O(n), поэтому режем, когда отброшенного не меньше оставшегося
+        if cut > 0 and cut * 2 >= len(self.prices):
+            del self.prices[:cut]
+            del self.volumes[:cut]
+            self.offset += cut
+
+    def holders(self):
+        return sum(pop.holding() for pop in self.populations)
+
+    def day_rows(self):
+        """(день, открытие, минимум, максимум, закрытие, объём) по дням"""
+        rows = []
+        per_day = self.ticks_per_day
+        for day in range(math.ceil(self.tick / per_day)):
+            first, last = round(day * per_day), min(round((day + 1) * per_day), self.tick)
+            prices = self.prices[first:last + 1]
+            rows.append((day + 1, prices[0], min(prices), max(prices), prices[-1],
+                         sum(self.volumes[first + 1:last + 1])))
+        return rows
+
+    def chart_lines(self, width=60, height=10):
+        """ASCII-график траектории (min/max-бакеты)"""
+        prices = self.prices
+        width = min(width, len(prices))
+        buckets = []
+        for i in range(width):
+            part = prices[i * len(prices) // width:(i + 1) * len(prices) // width]
+            buckets.append((min(part), max(part)))
+        return render_chart(buckets, height)
+
+
+class MarketClock:
+    """Прогнозы терминала по траектории рынка
+
+    Каждый прогноз сдвигает часы на тик; исход — цена через horizon дней
+    от текущего тика, часы при этом не уходят вперёд. Траектория
+    досчитывается только до самого дальнего горизонта.
+    """
+
+    errors = ()  # исход есть всегда
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.tick = 0
+
+    @classmethod
+    def for_scenario(cls, scenario, seed=None):
+        """Часы терминала: сценарий с CLOCK_TICKS_PER_DAY тиками в день"""
+        ticks = max(1, round(scenario["days"] * CLOCK_TICKS_PER_DAY))
+        return cls(MarketSimulator(scenario, ticks=ticks, seed=seed))
+
+    @property
+    def price(self):
+        return self.simulator.price_at(self.tick)
+
+    def outcome(self, azimuth, horizon):
+        """(движение %, темная материя) за horizon дней рынка"""
+        simulator = self.simulator
+        entry = self.price
+        later = simulator.price_at(self.tick + max(1, round(horizon * simulator.ticks_per_day)))
+        self.tick += 1
+        simulator.forget(self.tick)
+        actual = (later / entry - 1) * 100
+        # Как у живого фида: темная материя — всё, что азимут не объяснил
+        return actual, actual - azimuth
+
+    def status(self, c):
+        """Строка шапки терминала (c — палитра Colors)"""
+        simulator = self.simulator
+        return (f"  🧪 Рынок {simulator.name}: день {c.CYAN}{self.tick / simulator.ticks_per_day:.1f}{c.ENDC} · "
+                f"агентов: {c.CYAN}{simulator.agents:,}{c.ENDC}")
+
+    def close(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OGLM Azimuth market: агентная симуляция рынка")
+    parser.add_argument("--scenario", default="stress",
+                        help=f"{' | '.join(SCENARIOS)} или JSON-файл (default: stress)")
+    parser.add_argument("--agents", type=int, help="агентов всего (популяции — в пропорции сценария)")
+    parser.add_argument("--ticks", type=int, help="тиков за сценарий (детализация)")
+    parser.add_argument("--days", type=float, help="длительность, дней")
+    parser.add_argument("--seed", type=int, help="seed траектории")
+    parser.add_argument("--out", help="CSV траектории: tick, day, price, volume")
+    args = parser.parse_args()
+
+    try:
+        scenario = load_scenario(args.scenario)
+        simulator = MarketSimulator(scenario, args.agents, args.ticks, args.days, args.seed)
+    except (KeyError, ValueError) as e:
+        print(f"❌ Сценарий: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    started = time.perf_counter()
+    simulator.run()
+    elapsed = time.perf_counter() - started
+    rate = simulator.agents * simulator.tick / elapsed if elapsed > 0 else 0.0
+    print(f"Рынок {simulator.name!r}: {simulator.agents:,} агентов × {simulator.tick:,} тиков "
+          f"за {elapsed:.2f}s ({rate:,.0f} агенто-тиков/s"
+          f"{'' if np is not None else ', без NumPy'})\n")
+
+    print(f"{'день':>5} {'открытие':>10} {'минимум':>10} {'максимум':>10} {'закрытие':>10} "
+          f"{'объём':>14}")
+    for day, first, low, high, close, volume in simulator.day_rows():
+        print(f"{day:5d} {first:10.4f} {low:10.4f} {high:10.4f} {close:10.4f} {volume:14,.0f}")
+
+    start, end = simulator.prices[0], simulator.prices[-1]
+    print(f"\nЦена: {start:.4f} → {end:.4f} ({(end / start - 1) * 100:+.1f}%) · "
+          f"дно {simulator.trough:.4f} · пик {simulator.peak:.4f}")
+    print("Держат OGLM: " + " · ".join(f"{pop.name} {pop.holding():,}/{pop.agents:,}"
+                                        for pop in simulator.populations if pop.holding()))
+    print()
+    print("\n".join(simulator.chart_lines()))
+
+    if args.out:
+        try:
+            with open(args.out, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(["tick", "day", "price", "volume"])
+                per_day = simulator.ticks_per_day
+                for tick, (price, volume) in enumerate(zip(simulator.prices, simulator.volumes)):
+                    writer.writerow([tick, f"{tick / per_day:.4f}", repr(price), repr(volume)])
+        except OSError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"\n💾 Траектория → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
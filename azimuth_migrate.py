@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+OGLM Azimuth Migrate
+Потоковая миграция старых azimuth_predictions.json в хранилище терминала
+
+Старые файлы — один JSON-документ: azimuth_trader v0.1 (без id,
+exit_price, pnl и market) или терминал до журнала (indent=2). Хранилище
+читает такой файл только целиком через json.load — на многогигабайтной
+истории это вся память телефона. Миграция разбирает массив predictions
+по одному прогнозу (в памяти — блок файла и текущая пачка):
+
+- недостающие поля дописываются так, как их посчитал бы терминал
+  (id — позиция + 1, исход — score_outcome), записанные не меняются —
+  azimuth_replay сходится бит в бит;
+- stats и market пересчитываются по потоку;
+- прогнозы пишутся прямо в хранилище директории (json или sqlite по
+  config.json) через rewrite_stream: полные сегменты сразу уходят в
+  архив.
+
+Если файл — снапшот этой же директории, он сначала переименовывается в
+azimuth_predictions.json.legacy (это и бэкап); при ошибке миграции
+возвращается на место. Пишется только в пустое хранилище.
+
+    python azimuth_migrate.py ~/.oglm                        # файл директории на месте
+    python azimuth_migrate.py old/azimuth_predictions.json ~/.oglm
+"""
+
+import argparse
+import codecs
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from azimuth_montecarlo import score_outcome
+from azimuth_storage import PARSE_CHUNK, JournalStore, StorageError, fsync_dir
+
+BLOCK = 1 << 20  # байт файла за одно чтение
+MAX_RECORD = 16 << 20  # прогноз длиннее — файл повреждён, а не «прогноз не дочитан»
+LEGACY_SUFFIX = ".legacy"
+SERVICE_KEYS = ("aggregates", "archive", "journal_seq")  # хранилище пишет их само
+_SPACE = re.compile(r'[ \t\n\r]*')
+
+
+class LegacyReader:
+    """Потоковый разбор {..., "predictions": [...], ...}
+
+    Значения верхнего уровня (stats, market, ...) разбираются целиком —
+    они маленькие, predictions — по элементу (raw_decode). header
+    заполняется по ходу чтения: ключи после predictions известны только
+    в конце.
+    """
+
+    def __init__(self, f, name="JSON"):
+        self.f = f
+        self.name = name
+        self.header = {}
+        self.count = 0  # прогнозов разобрано
+        self.bytes_read = 0
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """Дочитать блок; False — файл кончился"""
+        if self._eof:
+            return False
+        raw = self.f.read(BLOCK)
+        self.bytes_read += len(raw)
+        self._eof = not raw
+        self._buf = self._buf[self._pos:] + self._decoder.decode(raw, final=self._eof)
+        self._pos = 0
+        return not self._eof
+
+    def _peek(self):
+        """Следующий значимый символ ('' — конец файла)"""
+        while True:
+            self._pos = _SPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, char, where):
+        found = self._peek()
+        if found != char:
+            raise StorageError(f"{self.name}: {where}: ожидалось {char!r}, "
+                               f"найдено {found or 'конец файла'!r}")
+        self._pos += 1
+
+    def _value(self, where):
+        """Одно значение JSON с текущей позиции"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buf, self._pos)
+                # Число на краю блока могло не дочитаться: за значением всегда есть , ] или }
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except ValueError as e:
+                if self._eof or len(self._buf) - self._pos > MAX_RECORD:
+                    # Строка/столбец e — по буферу, а не по файлу: только суть
+                    raise StorageError(f"{self.name}: {where}: {getattr(e, 'msg', e)}") from None
+            self._fill()
+
+    def chunks(self, size=PARSE_CHUNK):
+        """Прогнозы пачками по size; StorageError, если файл не разобрать"""
+        self._expect('{', "начало файла")
+        found = False
+        if self._peek() == '}':
+            self._pos += 1
+        else:
+            while True:
+                key = self._value("ключ верхнего уровня")
+                if not isinstance(key, str):
+                    raise StorageError(f"{self.name}: ключ верхнего уровня не строка: {key!r}")
+                self._expect(':', f"после {key!r}")
+                if key == "predictions":
+                    found = True
+                    yield from self._predictions(size)
+                else:
+                    self.header[key] = self._value(key)
+                if self._peek() == ',':
+                    self._pos += 1
+                    continue
+                self._expect('}', "конец объекта")
+                break
+        if self._peek():
+            raise StorageError(f"{self.name}: данные после конца JSON")
+        if not found:
+            raise StorageError(f"{self.name}: нет массива predictions")
+
+    def _predictions(self, size):
+        self._expect('[', "predictions")
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        chunk = []
+        while True:
+            chunk.append(self._value(f"прогноз #{self.count + 1}"))
+            self.count += 1
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+            self._expect(']', "конец predictions")
+            break
+        if chunk:
+            yield chunk
+
+
+def upgrade(pred, next_id, entry, filled):
+    """Довести прогноз старой схемы до схемы терминала → цена после него
+
+    Записанные поля не меняются, недостающие считаются как в терминале:
+    next_id — id для прогноза без id, entry — цена после предыдущего.
+    filled — Counter дописанных полей. ValueError — прогноз не
+    восстановить (нет азимута).
+    """
+    if not isinstance(pred, dict):
+        raise ValueError(f"не объект: {type(pred).__name__}")
+    azimuth = pred.get("azimuth")
+    if type(azimuth) not in (int, float):
+        raise ValueError(f"нет азимута: {azimuth!r}")
+
+    def fill(key, value):
+        if key not in pred:
+            pred[key] = value
+            filled[key] += 1
+
+    fill("id", next_id)
+    fill("note", "")
+    fill("horizon_days", 7)
+    fill("entry_price", entry)
+    entry = pred["entry_price"]
+    fill("target_price", entry * (1 + azimuth / 100))
+
+    actual = pred.get("actual_movement")
+    if type(actual) not in (int, float):
+        fill("resolved", False)
+        fill("correct", None)
+        return entry  # цена до горизонта не меняется
+    # Как _terminal_fields azimuth_replay: исход записан — пересчитывается оценка
+    dark_matter = pred.get("dark_matter_signal", actual - azimuth)
+    exit_price = pred.get("exit_price", entry * (1 + actual / 100))
+    for key, value in score_outcome({"azimuth": azimuth}, exit_price, actual, dark_matter).items():
+        if key != "azimuth":
+            fill(key, value)
+    return pred["exit_price"]
+
+
+class HistoryTotals:
+    """stats и market по потоку прогнозов — как update_stats/update_market терминала"""
+
+    def __init__(self):
+        self.total = self.correct = 0
+        self.pnl = 0.0
+        self.best = self.worst = None
+        self.high = self.low = 1.0
+
+    def add(self, pred):
+        if not pred.get("resolved"):
+            return
+        self.total += 1
+        self.correct += bool(pred.get("correct"))
+        self.pnl += pred.get("pnl", 0)
+        error = pred.get("error")
+        if error is not None:
+            if self.best is None or error < self.best["error"]:
+                self.best = {"id": pred.get("id"), "error": error}
+            if self.worst is None or error > self.worst["error"]:
+                self.worst = {"id": pred.get("id"), "error": error}
+        price = pred.get("exit_price")
+        if price is not None:
+            self.high = max(self.high, price)
+            self.low = min(self.low, price)
+
+    def stats(self, recorded):
+        return dict(recorded if isinstance(recorded, dict) else {},
+                    total=self.total, correct=self.correct,
+                    accuracy=self.correct / self.total * 100 if self.total else 0.0,
+                    total_pnl=self.pnl, best_prediction=self.best, worst_prediction=self.worst)
+
+    def market(self, recorded):
+        recorded = recorded if isinstance(recorded, dict) else {}
+        return dict(recorded, all_time_high=self.high, all_time_low=self.low,
+                    last_updated=recorded.get("last_updated", datetime.now().isoformat()))
+
+
+class Migration:
+    """Перенос одного старого файла в хранилище директории"""
+
+    def __init__(self, source, data_dir, progress=None):
+        self.source = Path(source)
+        self.origin = self.source  # для сообщений: source может стать .legacy
+        self.data_dir = Path(data_dir)
+        self.progress = progress  # progress(прогнозов, байт прочитано, байт всего)
+        self.count = 0
+        self.skipped = []  # (позиция в файле, причина)
+        self.filled = Counter()
+        self.backup = None
+        self.last_price = None
+
+    def run(self):
+        """Перенести; StorageError/OSError — хранилище не тронуто (файл на месте)"""
+        target = self.data_dir / "azimuth_predictions.json"
+        if not self.source.exists():
+            raise StorageError(f"{self.source}: нет файла")
+        if target.exists() and self.source.resolve() == target.resolve():
+            self._take_over(target)
+        try:
+            self._migrate()
+        except BaseException:
+            if self.backup is not None and not target.exists():
+                os.replace(str(self.backup), str(target))
+                self.backup = None
+            raise
+
+    def _take_over(self, target):
+        """Файл директории: переименовать в .legacy, чтобы хранилище открылось пустым"""
+        journal = target.with_suffix('.journal')
+        if journal.exists() and journal.stat().st_size:
+            raise StorageError(f"{journal} не пуст — файл уже ведёт терминал, "
+                               f"мигрируйте копию снапшота")
+        with open(target, 'rb') as f:
+            try:
+                header = next(JournalStore._snapshot_parts(f))
+            except (ValueError, StopIteration):
+                header = {}
+        if "journal_seq" in header:
+            raise StorageError(f"{target}: уже построчный снапшот хранилища — "
+                               f"терминал читает его потоком")
+        backup = target.with_name(target.name + LEGACY_SUFFIX)
+        if backup.exists():
+            raise StorageError(f"{backup} уже есть — уберите его или мигрируйте его самого")
+        os.replace(str(target), str(backup))
+        fsync_dir(target.parent)
+        self.backup = self.source = backup
+
+    def _migrate(self):
+        # Терминал подключает агрегаторы — rewrite_stream соберёт и их
+        from azimuth_terminal import OGLMAzimuthTerminal
+        terminal = OGLMAzimuthTerminal(self.data_dir)
+        store = terminal.store
+        try:
+            if store.summary["count"]:
+                raise StorageError(f"{self.data_dir}: уже есть история ({store.summary['count']:,}) — "
+                                   f"миграция пишет только в пустое хранилище")
+            size = self.source.stat().st_size
+            with open(self.source, 'rb') as f:
+                reader = LegacyReader(f, str(self.origin))
+                totals = HistoryTotals()
+
+                def upgraded():
+                    position = last_id = 0
+                    entry = 1.0
+                    for chunk in reader.chunks():
+                        if "archive" in reader.header:
+                            raise StorageError(f"{self.source}: снапшот хранилища с архивом — "
+                                               f"сегменты лежат отдельно, мигрировать не нужно")
+                        out = []
+                        for pred in chunk:
+                            position += 1
+                            # Без id — позиция + 1, как у сводки, но не меньше уже выданных
+                            next_id = max(last_id, self.count) + 1
+                            try:
+                                entry = self.last_price = upgrade(pred, next_id, entry, self.filled)
+                            except ValueError as e:
+                                self.skipped.append((position, str(e)))
+                                continue
+                            if type(pred["id"]) is int:
+                                last_id = max(last_id, pred["id"])
+                            totals.add(pred)
+                            out.append(pred)
+                            self.count += 1
+                        if self.progress is not None:
+                            self.progress(self.count, reader.bytes_read, size)
+                        yield out
+
+                def finish():
+                    data = {key: value for key, value in reader.header.items()
+                            if key not in SERVICE_KEYS}
+                    data["stats"] = totals.stats(reader.header.get("stats"))
+                    data["market"] = totals.market(reader.header.get("market"))
+                    return data
+
+                store.rewrite_stream(upgraded(), finish)
+            if self.last_price is not None:
+                # Цена терминала продолжает перенесённую цепочку
+                terminal.current_price = self.last_price
+            terminal.save_config()
+        finally:
+            store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OGLM Azimuth migrate: старый JSON-файл в хранилище")
+    parser.add_argument("source", nargs="?", default=str(Path.home() / ".oglm"),
+                        help="старый azimuth_predictions.json или директория с ним (default: ~/.oglm)")
+    parser.add_argument("data_dir", nargs="?",
+                        help="директория терминала (default: директория файла)")
+    parser.add_argument("--quiet", action="store_true", help="без строки прогресса")
+    args = parser.parse_args()
+
+    source = Path(args.source)
+    if source.is_dir():
+        source = source / "azimuth_predictions.json"
+    data_dir = Path(args.data_dir) if args.data_dir else source.parent
+
+    started = time.perf_counter()
+    shown = [0.0]
+
+    def progress(count, done, total):
+        now = time.perf_counter()
+        if now - shown[0] < 0.5:
+            return
+        shown[0] = now
+        rate = done / (now - started) / 2 ** 20 if now > started else 0.0
+        percent = done / total * 100 if total else 100.0
+        print(f"\r  {count:,} прогнозов · {percent:5.1f}% · {rate:,.1f} МБ/с",
+              end='', file=sys.stderr, flush=True)
+
+    migration = Migration(source, data_dir, None if args.quiet else progress)
+    try:
+        migration.run()
+    except (OSError, StorageError) as e:
+        if not args.quiet and shown[0]:
+            print(file=sys.stderr)
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    if not args.quiet and shown[0]:
+        print(file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    rate = migration.count / elapsed if elapsed > 0 else 0.0
+    print(f"✅ Перенесено {migration.count:,} прогнозов → {data_dir} ({elapsed:.2f}s, {rate:,.0f}/s)")
+    if migration.filled:
+        print("   дописаны поля: " + ", ".join(f"{key} ({count:,})"
+                                               for key, count in migration.filled.most_common()))
+    if migration.skipped:
+        position, reason = migration.skipped[0]
+        print(f"   ⚠️  пропущено {len(migration.skipped):,} записей, первая — #{position}: {reason}")
+    if migration.backup is not None:
+        print(f"   старый файл: {migration.backup}")
+
+
+if __name__ == "__main__":
+    main()
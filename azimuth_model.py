@@ -0,0 +1,468 @@
+"""
+OGLM Azimuth Model
+Компактное представление истории прогнозов в памяти
+
+PredictionTable хранит прогнозы колонками: array('d') для цен и движений,
+эпоха (int) вместо строки timestamp, индекс в общей таблице строк вместо
+note и model, байт на resolved/correct. Прогноз-словарь стоит ~1.5 КБ,
+строка таблицы — ~110 байт, поэтому миллион прогнозов помещается в
+~120 МБ вместо ~1.5 ГБ.
+
+Для кода, который работает со словарями (экран, история, агрегаторы,
+replay), table[i] отдаёт PredictionRow — изменяемое отображение поверх
+колонок: pred["azimuth"], pred.get("note"), dict(pred). Значение, которое
+не ложится в колонку (другой тип, нестандартная дата, незнакомый ключ),
+хранится в extras строки, поэтому запись → чтение не меняет ни одного
+значения и ни одного типа.
+"""
+
+import operator
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableMapping
+from datetime import date, datetime, timedelta
+from itertools import repeat
+
+FLOATS = ("azimuth", "entry_price", "target_price", "actual_movement",
+          "dark_matter_signal", "exit_price", "error", "pnl")
+FLAGS = ("resolved", "correct")
+STRINGS = ("note", "model")
+
+# Порядок ключей словаря — как их создают терминал и azimuth_trader
+KEYS = ("id", "timestamp", "azimuth", "note", "horizon_days", "entry_price",
+        "target_price", "resolved", "correct", "seed", "model", "actual_movement",
+        "dark_matter_signal", "exit_price", "error", "pnl")
+
+INTS = {"id": 'q', "seed": 'q', "horizon_days": 'i'}
+NAN = float('nan')
+# Нет значения в целой колонке — минимум типа (сами значения строго больше)
+NO_INT = {'q': -2 ** 63, 'i': -2 ** 31}
+MAX_INT = {'q': 2 ** 63 - 1, 'i': 2 ** 31 - 1}
+FLAG_CODES = {False: 0, True: 1, None: 2}
+FLAG_VALUES = (False, True, None)
+
+UNIX_DAY = date(1970, 1, 1).toordinal()
+EPOCH = datetime(1970, 1, 1)
+SECOND = timedelta(seconds=1)
+CHUNK = 4096  # строк на пакет в records()
+_MISSING = object()
+_KNOWN = frozenset(KEYS)
+_FLAG_TYPES = {bool, type(None), object}
+# Коды флагов для пакетной записи; тип уже проверен, поэтому 1 ≠ True не путается
+_FLAG_PACK = {False: 0, True: 1, None: 2, _MISSING: -1}
+
+
+class TimestampCodec:
+    """'YYYY-MM-DD HH:MM:SS' ↔ секунды от 1970-01-01 без часового пояса
+
+    Дата не переводится в UTC: строка — локальное время терминала, и
+    обратное преобразование должно вернуть ровно её, в том числе в час
+    перевода часов. Дни кэшируются — история идёт по времени.
+    """
+
+    def __init__(self):
+        self._days = {}
+        self._dates = {}
+
+    def encode(self, text):
+        """Эпоха или None, если строка не в формате терминала"""
+        if type(text) is not str or len(text) != 19:
+            return None
+        prefix = text[:10]
+        day = self._days.get(prefix)
+        if day is None:
+            try:
+                day = date.fromisoformat(prefix).toordinal() - UNIX_DAY
+            except ValueError:
+                return None
+            # Принимаем только точный обратный образ (fromisoformat мягче)
+            if date.fromordinal(day + UNIX_DAY).isoformat() != prefix:
+                return None
+            self._days[prefix] = day
+            self._dates[day] = prefix
+        clock = text[10:]
+        # isdigit без isascii пропускает '١', int() — '+1' и ' 1'
+        if (clock[0] != ' ' or clock[3] != ':' or clock[6] != ':' or not clock.isascii()
+                or not (clock[1:3] + clock[4:6] + clock[7:]).isdigit()):
+            return None
+        hour, minute, second = int(clock[1:3]), int(clock[4:6]), int(clock[7:])
+        if hour > 23 or minute > 59 or second > 59:
+            return None
+        return day * 86400 + hour * 3600 + minute * 60 + second
+
+    def encode_many(self, texts):
+        """Эпохи списка строк или None, если хоть одна не в формате терминала
+
+        Пачка идёт через datetime в C без кадра Python на строку.
+        """
+        try:
+            stamps = list(map(datetime.fromisoformat, texts))
+        except (TypeError, ValueError):
+            return None
+        if list(map(str, stamps)) != texts:  # только точный обратный образ
+            return None
+        return list(map(operator.floordiv, map(EPOCH.__rsub__, stamps), repeat(SECOND)))
+
+    def decode(self, epoch):
+        day, seconds = divmod(epoch, 86400)
+        prefix = self._dates.get(day)
+        if prefix is None:
+            prefix = self._dates[day] = date.fromordinal(day + UNIX_DAY).isoformat()
+        hour, seconds = divmod(seconds, 3600)
+        minute, second = divmod(seconds, 60)
+        return f"{prefix} {hour:02d}:{minute:02d}:{second:02d}"
+
+
+class PredictionTable:
+    """История прогнозов колонками; table[i] — PredictionRow"""
+
+    def __init__(self, predictions=()):
+        self.times = array('q')
+        self.ints = {name: array(code) for name, code in INTS.items()}
+        self.ids = self.ints["id"]
+        self.floats = {name: array('d') for name in FLOATS}
+        self.flags = {name: array('b') for name in FLAGS}
+        self.refs = {name: array('i') for name in STRINGS}
+        self.strings = []       # общая таблица note/model
+        self._interned = {}
+        self.extras = {}        # позиция → значения, не легшие в колонки
+        self._codec = TimestampCodec()
+        self._blank = [(self.times, NO_INT['q'])]
+        self._blank += [(column, NO_INT[column.typecode]) for column in self.ints.values()]
+        self._blank += [(column, NAN) for column in self.floats.values()]
+        self._blank += [(column, -1) for column in self.flags.values()]
+        self._blank += [(column, -1) for column in self.refs.values()]
+        # Колонки в порядке ключей словаря — для records()
+        self._layout = []
+        for key in KEYS:
+            for kind, columns in (("float", self.floats), ("flag", self.flags),
+                                  ("ref", self.refs), ("int", self.ints)):
+                if key in columns:
+                    self._layout.append((key, kind, columns[key]))
+            if key == "timestamp":
+                self._layout.append((key, "time", self.times))
+        for pred in predictions:
+            self.append(pred)
+
+    # --- последовательность ---
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [PredictionRow(self, i) for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        return PredictionRow(self, position)
+
+    def __setitem__(self, position, prediction):
+        """Заменить прогноз целиком"""
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        if isinstance(prediction, PredictionRow):
+            prediction = prediction.copy()  # строка может быть этой же
+        self.extras.pop(position, None)
+        for key in KEYS:
+            self._clear(position, key)
+        for key, value in prediction.items():
+            self._set(position, key, value)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield PredictionRow(self, position)
+
+    def append(self, prediction):
+        position = len(self.ids)
+        for column, blank in self._blank:
+            column.append(blank)
+        # Новая строка без extras — _set с его чисткой не нужен
+        store = self._store
+        for key, value in prediction.items():
+            if not store(position, key, value):
+                self.extras.setdefault(position, {})[key] = value
+
+    def extend(self, predictions):
+        """Дописать пачку: колонками, если вся пачка ложится в колонки"""
+        predictions = list(predictions)
+        if not self._extend_columns(predictions):
+            for pred in predictions:
+                self.append(pred)
+
+    # --- поиск ---
+
+    def position(self, pred_id):
+        """Позиция прогноза по id (id возрастают вместе с позицией) или None"""
+        ids = self.ids
+        guess = pred_id - 1
+        if 0 <= guess < len(ids) and ids[guess] == pred_id:
+            return guess
+        position = bisect_left(ids, pred_id)
+        if position < len(ids) and ids[position] == pred_id:
+            return position
+        return None
+
+    def replace(self, prediction):
+        """Заменить прогноз с тем же id; позиция или None"""
+        position = self.position(prediction["id"])
+        if position is not None:
+            self[position] = prediction
+        return position
+
+    # --- словари ---
+
+    def record(self, position):
+        """Прогноз словарём (для json и копий)"""
+        extras = self.extras.get(position)
+        record = {}
+        for key in KEYS:
+            if extras is not None and key in extras:
+                record[key] = extras[key]
+                continue
+            value = self._get(position, key)
+            if value is not _MISSING:
+                record[key] = value
+        if extras is not None:
+            for key, value in extras.items():
+                if key not in record:
+                    record[key] = value
+        return record
+
+    def records(self, start=0, stop=None):
+        """Прогнозы словарями по порядку (собираются пачками по колонкам)"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for begin in range(start, stop, CHUNK):
+            yield from self._records(begin, min(begin + CHUNK, stop))
+
+    def _records(self, start, stop):
+        rows = [{} for _ in range(start, stop)]
+        for key, kind, column in self._layout:
+            values = column[start:stop]
+            if kind == "float":
+                for row, value in zip(rows, values):
+                    if value == value:
+                        row[key] = value
+            elif kind == "flag":
+                for row, code in zip(rows, values):
+                    if code >= 0:
+                        row[key] = FLAG_VALUES[code]
+            elif kind == "ref":
+                strings = self.strings
+                for row, ref in zip(rows, values):
+                    if ref >= 0:
+                        row[key] = strings[ref]
+            else:
+                missing = NO_INT[column.typecode]
+                decode = self._codec.decode if kind == "time" else None
+                for row, value in zip(rows, values):
+                    if value != missing:
+                        row[key] = decode(value) if decode else value
+        if self.extras:
+            get = self.extras.get
+            for i in range(start, stop):
+                if get(i) is not None:
+                    rows[i - start] = self.record(i)
+        return rows
+
+    def nbytes(self):
+        """Память колонок и таблицы строк (без extras), байт"""
+        columns = [self.times, *self.ints.values(), *self.floats.values(),
+                   *self.flags.values(), *self.refs.values()]
+        size = sum(column.itemsize * len(column) for column in columns)
+        return size + sum(len(s) + 49 for s in self.strings)
+
+    # --- колонки ---
+
+    def _extend_columns(self, preds):
+        """Пачка целиком в колонки (без extras) или False без изменений"""
+        if not all(map(_KNOWN.issuperset, preds)):
+            return False
+        missing = _MISSING
+        columns = []
+        for key, column in self.floats.items():
+            values = [p.get(key, NAN) for p in preds]
+            if not {float}.issuperset(map(type, values)):
+                return False
+            present = [v for v in values if v is not NAN]
+            total = sum(present)
+            if total != total and any(v != v for v in present):
+                return False  # записанный NaN неотличим от «нет значения»
+            columns.append((column, values))
+        for key, column in self.flags.items():
+            values = [p.get(key, missing) for p in preds]
+            if not _FLAG_TYPES.issuperset(map(type, values)):
+                return False
+            columns.append((column, [_FLAG_PACK[v] for v in values]))
+        strings = []
+        for key, column in self.refs.items():
+            values = [p.get(key, missing) for p in preds]
+            if not {str, object}.issuperset(map(type, values)):
+                return False
+            strings.append((column, values))
+        for key, column in self.ints.items():
+            values = [p.get(key, missing) for p in preds]
+            if not {int, object}.issuperset(map(type, values)):
+                return False
+            present = [v for v in values if v is not missing]
+            low, high = NO_INT[column.typecode], MAX_INT[column.typecode]
+            if present and not (low < min(present) and max(present) <= high):
+                return False
+            columns.append((column, [low if v is missing else v for v in values]))
+        texts = [p.get("timestamp", missing) for p in preds]
+        times = self._codec.encode_many(texts) if missing not in texts else None
+        if times is None:
+            encode = self._codec.encode
+            times = []
+            for text in texts:
+                epoch = NO_INT['q'] if text is missing else encode(text)
+                if epoch is None:
+                    return False
+                times.append(epoch)
+        columns.append((self.times, times))
+
+        intern = self._intern
+        for column, values in strings:
+            columns.append((column, [-1 if v is missing else intern(v) for v in values]))
+        for column, values in columns:
+            column.extend(values)
+        return True
+
+    def _intern(self, text):
+        ref = self._interned.get(text)
+        if ref is None:
+            ref = self._interned[text] = len(self.strings)
+            self.strings.append(text)
+        return ref
+
+    def _get(self, position, key):
+        """Значение из колонки или _MISSING (без учёта extras)"""
+        if key in self.floats:
+            value = self.floats[key][position]
+            return _MISSING if value != value else value  # NaN — нет значения
+        if key in self.flags:
+            code = self.flags[key][position]
+            return _MISSING if code < 0 else FLAG_VALUES[code]
+        if key in self.refs:
+            ref = self.refs[key][position]
+            return _MISSING if ref < 0 else self.strings[ref]
+        if key in self.ints:
+            column = self.ints[key]
+            value = column[position]
+            return _MISSING if value == NO_INT[column.typecode] else value
+        if key == "timestamp":
+            value = self.times[position]
+            return _MISSING if value == NO_INT['q'] else self._codec.decode(value)
+        return _MISSING
+
+    def _set(self, position, key, value):
+        """Положить значение в колонку, а если не ложится — в extras"""
+        stored = self._store(position, key, value)
+        extras = self.extras.get(position)
+        if stored:
+            if extras is not None:
+                extras.pop(key, None)
+                if not extras:
+                    del self.extras[position]
+        else:
+            self._clear(position, key)
+            self.extras.setdefault(position, {})[key] = value
+
+    def _store(self, position, key, value):
+        kind = type(value)
+        if key in self.floats:
+            if kind is not float or value != value:
+                return False
+            self.floats[key][position] = value
+        elif key in self.flags:
+            if value is not None and kind is not bool:
+                return False
+            self.flags[key][position] = FLAG_CODES[value]
+        elif key in self.refs:
+            if kind is not str:
+                return False
+            self.refs[key][position] = self._intern(value)
+        elif key in self.ints:
+            column = self.ints[key]
+            if kind is not int or not NO_INT[column.typecode] < value <= MAX_INT[column.typecode]:
+                return False
+            column[position] = value
+        elif key == "timestamp":
+            epoch = self._codec.encode(value)
+            if epoch is None:
+                return False
+            self.times[position] = epoch
+        else:
+            return False
+        return True
+
+    def _clear(self, position, key):
+        if key in self.floats:
+            self.floats[key][position] = NAN
+        elif key in self.flags:
+            self.flags[key][position] = -1
+        elif key in self.refs:
+            self.refs[key][position] = -1
+        elif key in self.ints:
+            column = self.ints[key]
+            column[position] = NO_INT[column.typecode]
+        elif key == "timestamp":
+            self.times[position] = NO_INT['q']
+
+
+class PredictionRow(MutableMapping):
+    """Прогноз-словарь поверх строки PredictionTable (запись — в колонки)"""
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, key):
+        extras = self._table.extras.get(self._row)
+        if extras is not None and key in extras:
+            return extras[key]
+        value = self._table._get(self._row, key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        extras = self._table.extras.get(self._row)
+        if extras is not None and key in extras:
+            return extras[key]
+        value = self._table._get(self._row, key)
+        return default if value is _MISSING else value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __setitem__(self, key, value):
+        self._table._set(self._row, key, value)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        table = self._table
+        extras = table.extras.get(self._row)
+        if extras is not None:
+            extras.pop(key, None)
+            if not extras:
+                del table.extras[self._row]
+        table._clear(self._row, key)
+
+    def __iter__(self):
+        return iter(self._table.record(self._row))
+
+    def __len__(self):
+        return len(self._table.record(self._row))
+
+    def copy(self):
+        return self._table.record(self._row)
+
+    def __repr__(self):
+        return f"PredictionRow({self.copy()!r})"
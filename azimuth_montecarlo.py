@@ -0,0 +1,171 @@
+"""
+OGLM Azimuth Monte Carlo
+Пакетная симуляция исходов прогноза
+
+Та же модель рынка, что и в calculate_outcome, но сразу на N траекторий:
+распределение фактического движения, вероятность попасть в допуск ±20%
+и ожидаемый P&L. С NumPy — миллионы траекторий в секунду, без NumPy —
+array-based фоллбэк на stdlib (медленнее, поэтому меньше выборка).
+
+Одиночный исход прогноза — seeded_outcome: у каждого прогноза свой seed,
+поэтому исход воспроизводится без остальной сессии (azimuth_replay).
+
+NumPy импортируется при первой симуляции (numpy()), а не при импорте
+модуля: терминал стартует без него (~0.2 s на Termux).
+"""
+
+import random
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+# Параметры модели рынка (общие для calculate_outcome и симуляции)
+MARKET_NOISE = 15.0      # базовый шум: uniform(-15, 15)
+DARK_MATTER_SIGMA = 8.0  # темная материя: gauss(0, 8)
+DIFFICULTY_FACTOR = 0.4  # большие движения сложнее предсказать
+TIME_FACTOR_SLOPE = 0.2  # +20% неопределённости за каждые 30 дней
+MIN_MOVEMENT = -99.9
+MAX_MOVEMENT = 1000.0
+TOLERANCE = 20.0         # прогноз точный, если ошибка ≤ ±20%
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+NUMPY_SAMPLES = 200_000
+STDLIB_SAMPLES = 20_000
+
+_system = random.SystemRandom()  # seed сессии, если не задан
+_numpy = False  # модуль numpy; None — не установлен, False — ещё не импортирован
+
+
+def numpy():
+    """Модуль numpy или None, если не установлен (импорт при первом вызове)"""
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy as module
+        except ImportError:
+            module = None
+        _numpy = module
+    return _numpy
+
+
+def movement_params(azimuth, days):
+    """Детерминированная часть модели: (смещение, временной множитель)"""
+    difficulty = min(abs(azimuth) / 100, 1.0)
+    accuracy_modifier = 1.0 - (difficulty * DIFFICULTY_FACTOR)
+    time_factor = 1.0 + (days / 30) * TIME_FACTOR_SLOPE
+    return azimuth * accuracy_modifier, time_factor
+
+
+def sample_outcome(azimuth, days=7, rng=random):
+    """Одна траектория: (фактическое движение, сигнал темной материи)"""
+    market_noise = rng.uniform(-MARKET_NOISE, MARKET_NOISE)
+    dark_matter = rng.gauss(0, DARK_MATTER_SIGMA)
+
+    base, time_factor = movement_params(azimuth, days)
+    actual = (base + market_noise + dark_matter) * time_factor
+    actual = max(min(actual, MAX_MOVEMENT), MIN_MOVEMENT)
+
+    return actual, dark_matter
+
+
+def seeded_outcome(azimuth, days, seed):
+    """Исход, воспроизводимый по seed (seed записывается в прогноз)"""
+    return sample_outcome(azimuth, days, random.Random(seed))
+
+
+def new_seed(rng=None):
+    """Seed прогноза из генератора сессии (или из os.urandom)"""
+    return (rng or _system).getrandbits(63)
+
+
+def score_outcome(prediction, exit_price, actual, dark_matter, tolerance=TOLERANCE):
+    """Записать исход в прогноз и оценить точность (общая формула для replay)"""
+    prediction["actual_movement"] = actual
+    prediction["dark_matter_signal"] = dark_matter
+    prediction["exit_price"] = exit_price
+
+    error = abs(actual - prediction["azimuth"])
+    prediction["resolved"] = True
+    prediction["correct"] = error <= tolerance
+    prediction["error"] = error
+    prediction["pnl"] = actual  # Упрощённо: P&L = движение цены
+    return prediction
+
+
+class OutcomeDistribution:
+    """Результат симуляции N траекторий для одного азимута"""
+
+    def __init__(self, azimuth, days, samples, quantiles, hit_probability, expected_pnl):
+        self.azimuth = azimuth
+        self.days = days
+        self.samples = samples
+        self.quantiles = quantiles  # {0.05: движение, ...}
+        self.hit_probability = hit_probability  # доля траекторий в допуске
+        self.expected_pnl = expected_pnl  # среднее движение, % (P&L = движение)
+
+    @property
+    def median(self):
+        return self.quantiles[0.5]
+
+    def to_dict(self):
+        return {
+            "azimuth": self.azimuth,
+            "days": self.days,
+            "samples": self.samples,
+            "quantiles": {str(q): v for q, v in self.quantiles.items()},
+            "hit_probability": self.hit_probability,
+            "expected_pnl": self.expected_pnl,
+        }
+
+
+def simulate(azimuth, days=7, samples=None, seed=None, tolerance=TOLERANCE):
+    """Симулировать samples траекторий и вернуть OutcomeDistribution"""
+    np = numpy()
+    if np is not None:
+        return _simulate_numpy(np, azimuth, days, samples or NUMPY_SAMPLES, seed, tolerance)
+    return _simulate_stdlib(azimuth, days, samples or STDLIB_SAMPLES, seed, tolerance)
+
+
+def _simulate_numpy(np, azimuth, days, samples, seed, tolerance):
+    rng = np.random.default_rng(seed)
+    base, time_factor = movement_params(azimuth, days)
+
+    actual = rng.uniform(-MARKET_NOISE, MARKET_NOISE, samples)
+    actual += rng.normal(0.0, DARK_MATTER_SIGMA, samples)
+    actual += base
+    actual *= time_factor
+    np.clip(actual, MIN_MOVEMENT, MAX_MOVEMENT, out=actual)
+
+    hits = np.count_nonzero(np.abs(actual - azimuth) <= tolerance)
+    values = np.quantile(actual, QUANTILES)
+
+    return OutcomeDistribution(
+        azimuth, days, samples,
+        {q: float(v) for q, v in zip(QUANTILES, values)},
+        hits / samples,
+        float(actual.mean()),
+    )
+
+
+def _simulate_stdlib(azimuth, days, samples, seed, tolerance):
+    rng = random.Random(seed)
+    uniform = rng.random
+    gauss = rng.gauss
+    base, time_factor = movement_params(azimuth, days)
+    span = 2 * MARKET_NOISE
+
+    actual = array('d', [
+        (base + uniform() * span - MARKET_NOISE + gauss(0.0, DARK_MATTER_SIGMA)) * time_factor
+        for _ in range(samples)
+    ])
+    actual = array('d', sorted(min(max(a, MIN_MOVEMENT), MAX_MOVEMENT) for a in actual))
+
+    hits = bisect_right(actual, azimuth + tolerance) - bisect_left(actual, azimuth - tolerance)
+    last = samples - 1
+
+    return OutcomeDistribution(
+        azimuth, days, samples,
+        {q: actual[round(q * last)] for q in QUANTILES},
+        hits / samples,
+        sum(actual) / samples,
+    )
@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+OGLM Azimuth Oracle
+Исходы прогнозов — консенсус ансамбля оракулов
+
+Поставщик исходов для терминала (как агентный рынок --market): вместо
+локальной модели движение даёт ансамбль из N узлов-оракулов.
+
+- Запрос уходит всем узлам сразу (asyncio-цикл в фоновом потоке).
+- Исход — медиана первых quorum ответов, взвешенная репутацией узлов;
+  остальные запросы отменяются. Хвост задержки ограничен самым быстрым
+  кворумом, а не самым медленным узлом.
+- На узел — таймаут; не ответил за свою обычную задержку (p95 последних
+  ответов) или ответил ошибкой — запрос дублируется (hedged retry).
+- Репутация узла ∈ [0, 1] (старт 0.5): R ← (1 − α)·R + α·точность, где
+  точность — близость ответа к консенсусу, отказ — 0. Хранится в
+  azimuth_oracles.json директории данных.
+
+Узлы (через запятую):
+- local:N        — N локальных оракулов-заглушек (для тестов)
+- tcp:HOST:PORT  — узел по TCP (заглушка: python azimuth_oracle.py serve ...)
+- unix:PATH      — узел по UNIX-сокету
+
+Протокол — строка JSON на запрос и на ответ:
+    → {"id": 1, "azimuth": -99.0, "days": 7, "seed": 4417299318215573817}
+    ← {"id": 1, "movement": -97.2, "dark_matter": 1.8} | {"id": 1, "error": "..."}
+
+Честный узел-заглушка отвечает моделью azimuth_montecarlo по seed
+запроса, поэтому честные узлы согласны, а нечестный (--bias) отсекается
+медианой и теряет репутацию.
+
+    python azimuth_oracle.py serve tcp:127.0.0.1:9301 --latency 0.02
+    python azimuth_oracle.py probe local:7 --requests 500
+    python azimuth_terminal.py --oracles local:4,tcp:127.0.0.1:9301
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+from azimuth_montecarlo import TOLERANCE, new_seed, seeded_outcome
+from azimuth_storage import atomic_write_json
+
+TIMEOUT = 2.0           # сколько ждать узел, сек (с повторами)
+RETRIES = 1             # дублей запроса к узлу (hedge или повтор после ошибки)
+HEDGE_DELAY = 0.1       # дубль, пока задержек узла мало для p95, сек
+HEDGE_QUANTILE = 0.95   # дубль — если узел не ответил за свой p95
+LATENCY_WINDOW = 64     # последних ответов узла для p95
+REPUTATION_START = 0.5
+REPUTATION_ALPHA = 0.1  # скорость обновления репутации
+MIN_WEIGHT = 0.01       # вес узла с нулевой репутацией
+STALL_TIME = 1.0        # зависание заглушки, сек
+STATE_FILE = "azimuth_oracles.json"
+
+
+class OracleError(Exception):
+    """Узел не ответил или кворум не собран"""
+
+
+def weighted_median(items, weights):
+    """Элемент, на котором накопленный вес (по возрастанию) достигает половины"""
+    order = sorted(range(len(items)), key=lambda i: items[i])
+    half = sum(weights) / 2
+    total = 0.0
+    for i in order:
+        total += weights[i]
+        if total >= half:
+            return items[i]
+    return items[order[-1]]
+
+
+def _quantile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class StandInOracle:
+    """Локальный оракул-заглушка: исход модели по seed запроса
+
+    latency — средняя задержка, stall — доля зависаний на STALL_TIME
+    (хвост задержки), fail — доля отказов, bias — сдвиг движения
+    (нечестный узел).
+    """
+
+    def __init__(self, name, latency=0.02, stall=0.02, fail=0.0, bias=0.0, rng=None):
+        self.name = name
+        self.latency = latency
+        self.stall = stall
+        self.fail = fail
+        self.bias = bias
+        self.rng = rng or random.Random()
+
+    async def query(self, request):
+        delay = self.rng.expovariate(1 / self.latency) if self.latency > 0 else 0.0
+        if self.rng.random() < self.stall:
+            delay += STALL_TIME
+        await asyncio.sleep(delay)
+        if self.rng.random() < self.fail:
+            raise OracleError(f"{self.name}: отказ")
+        movement, dark_matter = seeded_outcome(request["azimuth"], request["days"], request["seed"])
+        return movement + self.bias, dark_matter
+
+
+class StreamOracle:
+    """Узел по сокету: соединение на запрос (дубль не ждёт зависшего)"""
+
+    async def connect(self):
+        raise NotImplementedError
+
+    async def query(self, request):
+        reader, writer = await self.connect()
+        try:
+            writer.write((json.dumps(request) + "\n").encode('utf-8'))
+            await writer.drain()
+            line = await reader.readline()
+        finally:
+            writer.close()
+        if not line:
+            raise OracleError(f"{self.name}: соединение закрыто")
+        try:
+            reply = json.loads(line)
+            if "error" in reply:
+                raise OracleError(f"{self.name}: {reply['error']}")
+            return float(reply["movement"]), float(reply["dark_matter"])
+        except (ValueError, KeyError, TypeError) as e:
+            raise OracleError(f"{self.name}: ответ не разобрать ({e})") from None
+
+
+class TcpOracle(StreamOracle):
+    def __init__(self, host, port):
+        self.name = f"tcp:{host}:{port}"
+        self.host = host
+        self.port = port
+
+    def connect(self):
+        return asyncio.open_connection(self.host, self.port)
+
+
+class UnixOracle(StreamOracle):
+    def __init__(self, path):
+        self.name = f"unix:{path}"
+        self.path = path
+
+    def connect(self):
+        return asyncio.open_unix_connection(self.path)
+
+
+def parse_oracles(spec):
+    """'local:N,tcp:HOST:PORT,unix:PATH' → узлы; ValueError"""
+    oracles = []
+    for part in filter(None, (p.strip() for p in spec.split(','))):
+        kind, _, target = part.partition(':')
+        if not target:
+            raise ValueError(f"узел в формате local:N, tcp:HOST:PORT или unix:PATH: {part!r}")
+        if kind == 'local':
+            count = int(target)
+            if count < 1:
+                raise ValueError(f"local:N — N ≥ 1: {part!r}")
+            start = sum(1 for o in oracles if isinstance(o, StandInOracle))
+            oracles.extend(StandInOracle(f"local-{start + i + 1}") for i in range(count))
+        elif kind == 'tcp':
+            host, _, port = target.rpartition(':')
+            oracles.append(TcpOracle(host or '127.0.0.1', int(port)))
+        elif kind == 'unix':
+            oracles.append(UnixOracle(target))
+        else:
+            raise ValueError(f"неизвестный узел: {kind}")
+    if not oracles:
+        raise ValueError("нет ни одного узла")
+    names = [o.name for o in oracles]
+    if len(set(names)) != len(names):
+        raise ValueError(f"узлы повторяются: {spec!r}")
+    return oracles
+
+
+class OracleEnsemble:
+    """Поставщик исходов терминала: консенсус ансамбля оракулов
+
+    outcome() синхронный — вызывается из потока терминала, а запросы к
+    узлам идут в asyncio-цикле фонового потока.
+    """
+
+    errors = (OracleError,)  # исход недоступен — прогноз не создаётся
+
+    def __init__(self, oracles, quorum=None, timeout=TIMEOUT, retries=RETRIES, seed=None,
+                 state_file=None):
+        self.oracles = list(oracles)
+        self.quorum = len(self.oracles) // 2 + 1 if quorum is None else quorum
+        if not 1 <= self.quorum <= len(self.oracles):
+            raise ValueError(f"кворум {self.quorum}: от 1 до {len(self.oracles)} узлов")
+        self.timeout = timeout
+        self.retries = retries
+        self.rng = random.Random(seed)  # seed запросов: с --seed исходы воспроизводимы
+        self.state_file = state_file
+        self.reputation = {o.name: REPUTATION_START for o in self.oracles}
+        self.latencies = {o.name: deque(maxlen=LATENCY_WINDOW) for o in self.oracles}
+        self.consensus_latencies = deque(maxlen=LATENCY_WINDOW * 16)
+        self.requests = 0
+        self.hedges = 0       # дублей запроса к узлу
+        self.failures = 0     # узлов, не ответивших вовремя
+        self._loop = None
+        self._thread = None
+        self._load_state()
+
+    # --- поставщик исходов терминала ---
+
+    def start(self):
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.call_soon(ready.set)
+            try:
+                self._loop.run_forever()
+            finally:
+                self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="oglm-oracles", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def outcome(self, azimuth, horizon):
+        """(движение %, темная материя) за horizon дней — консенсус узлов; OracleError"""
+        seed = new_seed(self.rng)
+        future = asyncio.run_coroutine_threadsafe(self.consensus(azimuth, horizon, seed), self._loop)
+        return future.result()
+
+    def status(self, c):
+        """Строка шапки терминала (c — палитра Colors)"""
+        line = (f"  🔮 Оракулы: {c.CYAN}{len(self.oracles)}{c.ENDC}, кворум {self.quorum} · "
+                f"консенсусов: {c.CYAN}{self.requests:,}{c.ENDC}")
+        if self.consensus_latencies:
+            p99 = _quantile(self.consensus_latencies, 0.99) * 1000
+            line += f" · p99 {c.YELLOW}{p99:.0f} мс{c.ENDC}"
+        return line
+
+    def close(self):
+        """Остановить цикл и сохранить репутации"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(TIMEOUT)
+            self._loop = None
+        self._save_state()
+
+    # --- консенсус ---
+
+    async def consensus(self, azimuth, days, seed):
+        """Консенсус по запросу (seed — для модели узлов, у каждого прогноза свой)"""
+        request = {"id": self.requests + 1, "azimuth": azimuth, "days": days, "seed": seed}
+        return await self._gather(request)
+
+    async def _gather(self, request):
+        """Взвешенная медиана первых quorum ответов"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        self.requests += 1
+        tasks = {asyncio.ensure_future(self._ask(o, request)): o for o in self.oracles}
+        pending, answers, failed, error = set(tasks), [], [], None
+        try:
+            while len(answers) < self.quorum <= len(answers) + len(pending):
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = tasks[task].name
+                    if task.exception() is None:
+                        answers.append((name, task.result()))
+                    else:
+                        failed.append(name)
+                        error = task.exception()
+        finally:
+            # Опоздавшие не нужны: консенсус уже есть (или уже невозможен)
+            for task in pending:
+                task.cancel()
+        self.failures += len(failed)
+        if len(answers) < self.quorum:
+            self._score([], failed, None)
+            raise OracleError(f"кворум не собран: ответили {len(answers)} из "
+                              f"{len(self.oracles)}, нужно {self.quorum}"
+                              + (f" ({error})" if error else ""))
+
+        weights = [max(self.reputation[name], MIN_WEIGHT) for name, _ in answers]
+        outcome = weighted_median([answer for _, answer in answers], weights)
+        self._score(answers, failed, outcome[0])
+        self.consensus_latencies.append(loop.time() - started)
+        return outcome
+
+    async def _ask(self, oracle, request):
+        """Ответ узла в пределах timeout; дубль после p95 задержки узла или ошибки"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.timeout
+        attempts, launched, error = set(), 0, None
+        try:
+            while True:
+                if launched <= self.retries:
+                    attempts.add(asyncio.ensure_future(oracle.query(request)))
+                    self.hedges += launched > 0
+                    launched += 1
+                remaining = deadline - loop.time()
+                if remaining <= 0 or not attempts:
+                    break
+                wait = remaining if launched > self.retries else min(remaining, self._hedge_delay(oracle))
+                done, attempts = await asyncio.wait(attempts, timeout=wait,
+                                                    return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.latencies[oracle.name].append(loop.time() - started)
+                        return task.result()
+                    error = task.exception()
+        finally:
+            for task in attempts:
+                task.cancel()
+        raise OracleError(f"{oracle.name}: {error or f'нет ответа за {self.timeout:g}s'}")
+
+    def _hedge_delay(self, oracle):
+        latencies = self.latencies[oracle.name]
+        if len(latencies) < 8:
+            return HEDGE_DELAY
+        return _quantile(latencies, HEDGE_QUANTILE)
+
+    def _score(self, answers, failed, consensus):
+        """Репутация: близость к консенсусу для ответивших, 0 — для отказавших
+
+        Отменённые после кворума не оцениваются — они не ошиблись.
+        """
+        for name, (movement, _) in answers:
+            accuracy = max(0.0, 1 - abs(movement - consensus) / TOLERANCE)
+            self.reputation[name] += REPUTATION_ALPHA * (accuracy - self.reputation[name])
+        for name in failed:
+            self.reputation[name] -= REPUTATION_ALPHA * self.reputation[name]
+
+    # --- репутации на диске ---
+
+    def _load_state(self):
+        if self.state_file is None:
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f).get("reputation", {})
+        except (OSError, ValueError, AttributeError):
+            return
+        for name in self.reputation:
+            value = saved.get(name)
+            if isinstance(value, (int, float)) and 0 <= value <= 1:
+                self.reputation[name] = float(value)
+
+    def _save_state(self):
+        if self.state_file is None:
+            return
+        saved = {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f).get("reputation", {})
+        except (OSError, ValueError, AttributeError):
+            pass
+        # Узлы, не участвовавшие в этой сессии, сохраняют свою репутацию
+        saved.update(self.reputation)
+        atomic_write_json(self.state_file, {"reputation": saved})
+
+
+# --- узел-заглушка по сокету ---
+
+async def serve_oracle(spec, oracle):
+    """Отвечать на запросы оракула (unix:PATH или tcp:HOST:PORT)"""
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    movement, dark_matter = await oracle.query(request)
+                    reply = {"id": request.get("id"), "movement": movement, "dark_matter": dark_matter}
+                except (ValueError, KeyError, TypeError, AttributeError, OracleError) as e:
+                    reply = {"error": str(e)}
+                writer.write((json.dumps(reply) + "\n").encode('utf-8'))
+                await writer.drain()
+        except OSError:
+            pass
+        finally:
+            writer.close()
+
+    kind, _, target = spec.partition(':')
+    if kind == 'unix':
+        server = await asyncio.start_unix_server(handle, target)
+    elif kind == 'tcp':
+        host, _, port = target.rpartition(':')
+        server = await asyncio.start_server(handle, host or '127.0.0.1', int(port))
+    else:
+        raise ValueError(f"serve: нужен unix:PATH или tcp:HOST:PORT, не {spec!r}")
+    async with server:
+        await server.serve_forever()
+
+
+def probe(ensemble, requests, out=sys.stdout):
+    """Прогнать запросы через ансамбль → (задержки консенсусов, отказы кворума)"""
+    rng = random.Random(1)
+    latencies, errors = [], 0
+    for _ in range(requests):
+        started = time.perf_counter()
+        try:
+            ensemble.outcome(rng.uniform(-99, 99), rng.choice((1, 7, 30)))
+        except OracleError:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OGLM Azimuth oracles: консенсус ансамбля узлов")
+    sub = parser.add_subparsers(dest="command")
+    serve = sub.add_parser("serve", help="узел-заглушка по сокету")
+    serve.add_argument("spec", help="unix:PATH или tcp:HOST:PORT")
+    serve.add_argument("--latency", type=float, default=0.02, help="средняя задержка, сек")
+    serve.add_argument("--stall", type=float, default=0.02, help=f"доля зависаний на {STALL_TIME:g}s")
+    serve.add_argument("--fail", type=float, default=0.0, help="доля отказов")
+    serve.add_argument("--bias", type=float, default=0.0, help="сдвиг движения, %% (нечестный узел)")
+    check = sub.add_parser("probe", help="задержка консенсуса: кворум против ожидания всех")
+    check.add_argument("spec", help="узлы: local:N,tcp:HOST:PORT,unix:PATH")
+    check.add_argument("--requests", type=int, default=200, help="запросов (default: 200)")
+    check.add_argument("--quorum", type=int, help="кворум (default: большинство)")
+    check.add_argument("--timeout", type=float, default=TIMEOUT, help=f"на узел, сек (default: {TIMEOUT:g})")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        oracle = StandInOracle(args.spec, args.latency, args.stall, args.fail, args.bias)
+        try:
+            asyncio.run(serve_oracle(args.spec, oracle))
+        except KeyboardInterrupt:
+            pass
+        return
+    if args.command != "probe":
+        parser.print_help()
+        sys.exit(1)
+
+    try:
+        oracles = parse_oracles(args.spec)
+        runs = [("кворум", args.quorum), ("все узлы", len(oracles))]
+        if args.quorum == len(oracles):
+            runs = runs[:1]
+        for title, quorum in runs:
+            ensemble = OracleEnsemble(oracles, quorum, args.timeout).start()
+            try:
+                latencies, errors = probe(ensemble, args.requests)
+            finally:
+                ensemble.close()
+            ms = {q: _quantile(latencies, q) * 1000 for q in (0.5, 0.95, 0.99)}
+            print(f"{title:<9} (кворум {ensemble.quorum}/{len(oracles)}): "
+                  f"p50 {ms[0.5]:7.1f} мс · p95 {ms[0.95]:7.1f} мс · p99 {ms[0.99]:7.1f} мс · "
+                  f"max {max(latencies) * 1000:7.1f} мс · дублей {ensemble.hedges:,} · "
+                  f"без кворума {errors}")
+        print("Репутация: " + ", ".join(f"{name} {value:.2f}"
+                                          for name, value in ensemble.reputation.items()))
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+OGLM Azimuth Perf
+Счётчики и гистограммы задержек горячих участков терминала
+
+Включается переменной окружения OGLM_PERF=1 или флагом --perf. Выключенный
+замер — один if и общий пустой контекст, поэтому инструментирование
+можно держать в коде всегда:
+
+    with PERF.timer("load"):
+        store.load()
+    PERF.count("predictions")
+
+Время — монотонное (perf_counter). Гистограммы — с фиксированными
+границами корзин, как в Prometheus, поэтому память не растёт с числом
+замеров. Отчёт — команда perf в терминале, для сборщика — текстовый
+формат Prometheus (dump → *.prom, атомарно).
+"""
+
+import bisect
+import math
+import os
+import threading
+import time
+
+ENV = "OGLM_PERF"
+PREFIX = "oglm"
+
+# Границы корзин, секунды: от 100 мкс (кадр) до 10 с (ожидание ввода — в +Inf)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Задержки одного участка: корзины, сумма, максимум"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последняя — +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Оценка квантиля по корзинам (линейно внутри корзины)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = self.bounds[i - 1] if i else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(low + (high - low) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+
+class _Timer:
+    __slots__ = ("perf", "stage", "started")
+
+    def __init__(self, perf, stage):
+        self.perf = perf
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.perf.observe(self.stage, time.perf_counter() - self.started)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Perf:
+    """Реестр замеров процесса (потокобезопасный)"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = time.time()
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def timer(self, stage):
+        """Контекст, замеряющий участок stage (пустой, если выключено)"""
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(self, stage)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            hist = self.histograms.get(stage)
+            if hist is None:
+                hist = self.histograms[stage] = Histogram()
+            hist.observe(seconds)
+
+    def count(self, event, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[event] = self.counters.get(event, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.counters = {}
+            self.histograms = {}
+
+    def report_lines(self):
+        """Таблица для команды perf"""
+        lines = [f"{'участок':<14}{'вызовов':>9}{'среднее':>10}{'p50':>10}"
+                 f"{'p95':>10}{'p99':>10}{'макс':>10}{'всего':>10}"]
+        with self._lock:
+            stages = sorted(self.histograms.items(), key=lambda item: -item[1].sum)
+            for stage, hist in stages:
+                lines.append(
+                    f"{stage:<14}{hist.count:>9,}{fmt_seconds(hist.sum / hist.count):>10}"
+                    f"{fmt_seconds(hist.quantile(0.5)):>10}{fmt_seconds(hist.quantile(0.95)):>10}"
+                    f"{fmt_seconds(hist.quantile(0.99)):>10}{fmt_seconds(hist.max):>10}"
+                    f"{fmt_seconds(hist.sum):>10}")
+            if self.counters:
+                lines.append("")
+                lines.extend(f"{event:<14}{n:>9,}" for event, n in sorted(self.counters.items()))
+        return lines
+
+    def prometheus(self):
+        """Текстовый формат Prometheus (exposition format 0.0.4)"""
+        name = f"{PREFIX}_stage_seconds"
+        lines = [f"# HELP {name} Latency of terminal stages.",
+                 f"# TYPE {name} histogram"]
+        with self._lock:
+            for stage, hist in sorted(self.histograms.items()):
+                label = f'stage="{stage}"'
+                cumulative = 0
+                for bound, n in zip(hist.bounds + (math.inf,), hist.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == math.inf else repr(bound)
+                    lines.append(f'{name}_bucket{{{label},le="{le}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{label}}} {hist.sum!r}")
+                lines.append(f"{name}_count{{{label}}} {hist.count}")
+
+            name = f"{PREFIX}_events_total"
+            lines += [f"# HELP {name} Terminal events.", f"# TYPE {name} counter"]
+            for event, n in sorted(self.counters.items()):
+                lines.append(f'{name}{{event="{event}"}} {n}')
+
+        name = f"{PREFIX}_perf_start_time_seconds"
+        lines += [f"# HELP {name} When counters were last reset.", f"# TYPE {name} gauge",
+                  f"{name} {self.started!r}"]
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Записать отчёт Prometheus атомарно (для textfile collector)"""
+        path = str(path)
+        tmp = path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+        return path
+
+
+def fmt_seconds(seconds):
+    if seconds is None:
+        return "—"
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.1f}ms"
+    return f"{seconds * 1e6:.0f}µs"
+
+
+# Общий реестр процесса
+PERF = Perf(enabled=os.environ.get(ENV, "") not in ("", "0"))
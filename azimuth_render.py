@@ -0,0 +1,107 @@
+"""
+OGLM Azimuth Render
+Буферизованный рендер кадров терминала
+
+Экран собирается из именованных регионов (header, цена, статистика,
+последний результат, меню). Кадр уходит одним write: первый кадр и кадр
+после постороннего вывода перерисовываются целиком через ANSI-очистку
+(без subprocess), дальше переписываются только изменившиеся регионы.
+"""
+
+import re
+import shutil
+import sys
+import unicodedata
+
+CLEAR = '\033[2J\033[H'
+CLEAR_LINE = '\033[2K'
+CLEAR_BELOW = '\033[J'
+
+ANSI_RE = re.compile(r'\033\[[0-9;]*[A-Za-z]')
+
+PROMPT_RESERVE = 16  # строк под промпты прогноза ниже кадра
+
+
+def visible_width(text):
+    """Ширина строки в колонках терминала (без ANSI, эмодзи — 2)"""
+    width = 0
+    for ch in ANSI_RE.sub('', text):
+        if unicodedata.combining(ch) or ch == '\ufe0f':
+            continue
+        width += 2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1
+    return width
+
+
+def move_to(row):
+    return f'\033[{row};1H'
+
+
+class Screen:
+    """Кадр из регионов; render() пишет только то, что изменилось"""
+
+    def __init__(self, out=None):
+        self.out = out or sys.stdout
+        self.order = []
+        self.regions = {}
+        self._drawn = {}  # что сейчас на экране: регион → строки
+        self._drawn_rows = {}  # регион → строк экрана с учётом переноса
+        self._valid = False
+
+    def region(self, name, lines):
+        """Задать содержимое региона (порядок — по первому вызову)"""
+        if name not in self.regions:
+            self.order.append(name)
+        self.regions[name] = list(lines)
+
+    def invalidate(self):
+        """Экран испорчен посторонним выводом — следующий кадр целиком"""
+        self._valid = False
+
+    def clear(self):
+        """Очистить экран одной ANSI-последовательностью"""
+        self.out.write(CLEAR)
+        self.out.flush()
+        self.invalidate()
+
+    def _rows(self, lines, columns):
+        """Сколько строк экрана занимают lines с учётом переноса"""
+        return sum(max(1, -(-visible_width(line) // columns)) for line in lines)
+
+    def render(self):
+        """Собрать кадр в буфер и вывести одним write"""
+        size = shutil.get_terminal_size((80, 24))
+        columns = max(size.columns, 1)
+        layout = [(name, self.regions[name]) for name in self.order]
+        rows = {name: self._rows(lines, columns) for name, lines in layout}
+        height = sum(rows.values())
+
+        # Частичная перерисовка возможна, если геометрия не поменялась
+        # и кадр с промптами не прокручивает экран
+        partial = (
+            self._valid
+            and height + PROMPT_RESERVE <= size.lines
+            and all(self._drawn_rows.get(name) == rows[name] for name, _ in layout)
+        )
+
+        parts = []
+        if partial:
+            row = 1
+            for name, lines in layout:
+                changed = self._drawn.get(name) != lines
+                for line in lines:
+                    line_rows = self._rows([line], columns)
+                    if changed:
+                        parts.extend(move_to(row + r) + CLEAR_LINE for r in range(line_rows))
+                        parts.append(move_to(row) + line)
+                    row += line_rows
+            parts.append(move_to(row) + CLEAR_BELOW)
+        else:
+            parts.append(CLEAR)
+            for _, lines in layout:
+                parts.extend(line + '\n' for line in lines)
+
+        self.out.write(''.join(parts))
+        self.out.flush()
+        self._drawn = {name: lines for name, lines in layout}
+        self._drawn_rows = rows
+        self._valid = True
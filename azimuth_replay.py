@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+OGLM Azimuth Replay
+Пересчёт истории из исходных данных прогнозов
+
+Входные данные прогноза — азимут, горизонт, цена входа и seed. По seed
+исход пересчитывается той же моделью, что его получила (seeded_outcome
+терминала или модель v0.1 azimuth_trader, поле "model"), а по исходу —
+цена выхода, ошибка, точность, P&L, stats и ATH/ATL. Прогноз без seed
+(старая история, живой фид) берёт записанный исход как входные данные:
+пересчитывается только оценка.
+
+Цена входа, равная записанной цене выхода предыдущего прогноза, берётся
+из пересчитанной цепочки, поэтому после смены формул цена едет дальше
+так же, как ехала бы в терминале.
+
+    python azimuth_replay.py                 # проверить ~/.oglm бит в бит
+    python azimuth_replay.py DIR --write     # пересчитать и переписать историю
+
+Без --write история не меняется; код выхода 1 — если есть расхождение.
+"""
+
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+
+from azimuth_montecarlo import score_outcome, seeded_outcome
+from azimuth_model import PredictionTable
+from azimuth_trader import MODEL as TRADER_MODEL, trader_outcome
+
+TERMINAL_MODEL = "terminal"  # прогнозы без поля "model"
+
+
+def _terminal_fields(pred, entry):
+    """Производные поля прогноза терминала (и сервера)"""
+    azimuth = pred["azimuth"]
+    fields = {"target_price": entry * (1 + azimuth / 100)}
+    if "seed" in pred:
+        actual, dark_matter = seeded_outcome(azimuth, pred.get("horizon_days", 7), pred["seed"])
+        exit_price = entry * (1 + actual / 100)
+    elif pred.get("resolved") and "actual_movement" in pred:
+        actual = pred["actual_movement"]
+        dark_matter = pred.get("dark_matter_signal", actual - azimuth)
+        exit_price = pred.get("exit_price", entry * (1 + actual / 100))
+    else:
+        return fields  # ждёт цену на горизонте
+    scored = score_outcome({"azimuth": azimuth}, exit_price, actual, dark_matter)
+    del scored["azimuth"]
+    fields.update(scored)
+    return fields
+
+
+def _trader_fields(pred, entry):
+    """Производные поля azimuth_trader v0.1 (без цены выхода и P&L)"""
+    azimuth = pred["azimuth"]
+    fields = {"target_price": entry * (1 + azimuth / 100)}
+    if "seed" in pred:
+        actual = trader_outcome(azimuth, pred.get("horizon_days", 7), pred["seed"])
+    elif "actual_movement" in pred:
+        actual = pred["actual_movement"]
+    else:
+        return fields
+    error = abs(actual - azimuth)
+    fields.update(actual_movement=actual, resolved=True, correct=error <= 20, error=error)
+    return fields
+
+
+MODELS = {
+    TERMINAL_MODEL: _terminal_fields,
+    TRADER_MODEL: _trader_fields,
+}
+
+
+def _exit_price(pred, entry):
+    """Цена после прогноза (у v0.1 не записывается — считается)"""
+    if "exit_price" in pred:
+        return pred["exit_price"]
+    if "actual_movement" in pred:
+        return entry * (1 + pred["actual_movement"] / 100)
+    return None
+
+
+class Replay:
+    """Пересчитанная история: прогнозы, stats, market и расхождения"""
+
+    def __init__(self, data):
+        self.recorded = data
+        self.predictions = []
+        self.seeded = self.external = self.open = 0
+        self.divergences = []  # (id или позиция, поле, записано, пересчитано)
+        self.missing = set()   # поля, которых нет в записанных прогнозах
+        self.notes = []
+
+        self._replay_predictions(data["predictions"])
+        self.stats = self._replay_stats(data.get("stats") or {})
+        self.market = self._replay_market(data.get("market"))
+
+    def _replay_predictions(self, preds):
+        if isinstance(preds, PredictionTable):
+            preds = preds.records()  # словари пачками быстрее строк-представлений
+        prev_recorded = prev_derived = None
+        for position, pred in enumerate(preds):
+            model = MODELS.get(pred.get("model", TERMINAL_MODEL))
+            if model is None:
+                raise ValueError(f"прогноз #{pred.get('id', position + 1)}: "
+                                 f"неизвестная модель {pred.get('model')!r}")
+            entry = pred["entry_price"]
+            # Цена входа из цепочки: после смены формул цена едет по-новому
+            if prev_recorded is not None and entry == prev_recorded:
+                entry = prev_derived
+
+            fields = model(pred, entry)
+            if "seed" in pred:
+                self.seeded += 1
+            elif fields.get("resolved"):
+                self.external += 1
+            else:
+                self.open += 1
+
+            derived = dict(pred)
+            derived["entry_price"] = entry
+            derived.update(fields)
+            self._compare(pred, derived, pred.get("id", position + 1))
+            self.predictions.append(derived)
+
+            recorded_exit = _exit_price(pred, pred["entry_price"])
+            if recorded_exit is not None:
+                prev_recorded, prev_derived = recorded_exit, _exit_price(derived, entry)
+
+    def _compare(self, recorded, derived, label):
+        for key, value in derived.items():
+            if key not in recorded:
+                self.missing.add(key)
+            elif recorded[key] != value:
+                self.divergences.append((label, key, recorded[key], value))
+
+    def _replay_stats(self, recorded):
+        resolved = [p for p in self.predictions if p.get("resolved")]
+        total = len(resolved)
+        correct = sum(1 for p in resolved if p.get("correct"))
+        stats = {"total": total, "correct": correct,
+                 "accuracy": (correct / total) * 100 if total else 0.0}
+        if any("pnl" in p for p in resolved):
+            stats["total_pnl"] = 0
+            for p in resolved:
+                stats["total_pnl"] += p.get("pnl", 0)
+            best = worst = None
+            for p in resolved:
+                if best is None or p["error"] < best["error"]:
+                    best = {"id": p.get("id"), "error": p["error"]}
+                if worst is None or p["error"] > worst["error"]:
+                    worst = {"id": p.get("id"), "error": p["error"]}
+            stats["best_prediction"] = best
+            stats["worst_prediction"] = worst
+
+        for key, value in stats.items():
+            if key not in recorded:
+                continue
+            old = recorded[key]
+            if key == "total_pnl":
+                # Сумма по пачкам фида складывается в другом порядке
+                same = math.isclose(old, value, rel_tol=1e-9, abs_tol=1e-9)
+            else:
+                same = old == value
+            if not same:
+                self.divergences.append(("stats", key, old, value))
+        return stats
+
+    def _replay_market(self, recorded):
+        if recorded is None:
+            return None
+        high = low = 1.0
+        for pred in self.predictions:
+            price = pred.get("exit_price")
+            if price is None:
+                continue
+            high = max(high, price)
+            low = min(low, price)
+        market = dict(recorded, all_time_high=high, all_time_low=low)
+        if (recorded.get("all_time_high"), recorded.get("all_time_low")) != (high, low):
+            if self.external:
+                # Цены тиков фида в истории не хранятся — ATH/ATL не пересчитать
+                self.notes.append("market: ATH/ATL не пересчитываются — в истории "
+                                  "есть исходы без seed (тики фида не хранятся)")
+                return dict(recorded)
+            self.divergences.append(("market", "all_time_high/low",
+                                     (recorded.get("all_time_high"), recorded.get("all_time_low")),
+                                     (high, low)))
+        return market
+
+    def data(self):
+        """Пересчитанная история в формате снапшота"""
+        data = dict(self.recorded)
+        data["predictions"] = self.predictions
+        data["stats"] = dict(self.recorded.get("stats") or {}, **self.stats)
+        if self.market is not None:
+            data["market"] = self.market
+        return data
+
+
+def _open(target):
+    """(хранилище, терминал или None) для директории или файла истории"""
+    target = Path(target)
+    if target.is_dir():
+        # Терминал подключает агрегаторы — rewrite пересоберёт и их
+        from azimuth_terminal import OGLMAzimuthTerminal
+        terminal = OGLMAzimuthTerminal(target)
+        return terminal.store, terminal
+    if target.suffix == ".sqlite":
+        from azimuth_sqlite import SQLiteStore
+        store = SQLiteStore(target)
+    else:
+        from azimuth_storage import JournalStore
+        store = JournalStore(target)
+    store.open(lambda: {"predictions": [], "stats": {}})
+    return store, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OGLM Azimuth replay: пересчёт истории по seed")
+    parser.add_argument("target", nargs="?", default=str(Path.home() / ".oglm"),
+                        help="директория терминала или файл истории (default: ~/.oglm)")
+    parser.add_argument("--write", action="store_true",
+                        help="переписать историю пересчитанной (после смены формул или схемы)")
+    parser.add_argument("--limit", type=int, default=10, help="сколько расхождений показать")
+    args = parser.parse_args()
+
+    from azimuth_storage import StorageError
+    try:
+        store, terminal = _open(args.target)
+    except (OSError, StorageError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        started = time.perf_counter()
+        try:
+            replay = Replay(store.load())
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"❌ История не пересчитывается: {e}", file=sys.stderr)
+            sys.exit(1)
+        elapsed = time.perf_counter() - started
+
+        count = len(replay.predictions)
+        rate = count / elapsed if elapsed > 0 else 0.0
+        print(f"Replay: {count:,} прогнозов за {elapsed:.2f}s ({rate:,.0f}/s)")
+        print(f"  по seed: {replay.seeded:,} · исход записан (без seed): {replay.external:,} · "
+              f"ждут цену: {replay.open:,}")
+        for note in replay.notes:
+            print(f"  ⚠️  {note}")
+        if replay.missing:
+            print(f"  новых полей (нет в записи): {', '.join(sorted(replay.missing))}")
+
+        if not replay.divergences:
+            print("  ✅ совпадает бит в бит")
+        else:
+            label, key, old, new = replay.divergences[0]
+            where = f"#{label}" if isinstance(label, int) else label
+            print(f"  ❌ расхождений: {len(replay.divergences):,}, первое — {where} {key}: "
+                  f"записано {old!r}, пересчитано {new!r}")
+            for label, key, old, new in replay.divergences[1:args.limit]:
+                where = f"#{label}" if isinstance(label, int) else label
+                print(f"     {where} {key}: {old!r} → {new!r}")
+
+        if args.write:
+            store.rewrite(replay.data())
+            if terminal is not None and replay.predictions:
+                # Цена терминала продолжает пересчитанную цепочку
+                last = replay.recorded["predictions"][-1]
+                if terminal.current_price == _exit_price(last, last["entry_price"]):
+                    terminal.current_price = _exit_price(replay.predictions[-1],
+                                                         replay.predictions[-1]["entry_price"])
+                    terminal.save_config()
+            print(f"  💾 история переписана: {args.target}")
+        elif replay.divergences:
+            sys.exit(1)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
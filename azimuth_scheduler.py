@@ -0,0 +1,173 @@
+"""
+OGLM Azimuth Scheduler
+Очередь неразрешённых прогнозов по сроку
+
+ResolutionScheduler — агрегатор JournalStore: каждый прогноз с
+resolved=False попадает в min-кучу (срок, id), срок = timestamp +
+horizon_days. На диске — журнал azimuth_predictions.pending из записей
+фиксированного размера (добавлен / разрешён), поэтому куча переживает
+перезапуск без скана истории. pop_due(ts) снимает все наступившие сроки
+за O(k log n); журнал сжимается, когда в нём копятся разрешённые.
+"""
+
+import heapq
+import os
+import struct
+
+from azimuth_history import parse_timestamp
+
+RECORD = struct.Struct('<qqb')  # срок (epoch), id, операция
+ADDED, RESOLVED = 0, 1
+DAY = 86400
+COMPACT_MIN = 4096  # не сжимать журнал меньше этого числа записей
+
+
+def due_time(pred):
+    """Срок разрешения прогноза (epoch)"""
+    horizon = int(pred.get("horizon_days", 0) or 0)
+    return parse_timestamp(pred.get("timestamp", "")) + horizon * DAY
+
+
+class ResolutionScheduler:
+    """Куча (срок, id) ожидающих прогнозов + журнал на диске"""
+
+    def __init__(self, path):
+        self.path = path
+        self.length = 0  # записей в журнале
+        self.open = None  # id → срок, загружается при первом обращении
+        self.heap = None
+        self._file = None
+
+    # --- протокол агрегатора JournalStore ---
+
+    def reset(self):
+        self._close()
+        with open(self.path, 'wb'):
+            pass
+        self.length = 0
+        self.open = {}
+        self.heap = []
+
+    def update(self, pred):
+        pred_id = pred.get("id")
+        if pred_id is None:
+            return  # без id (AzimuthTrader) прогноз разрешается сразу
+        self.load()
+        if not pred.get("resolved"):
+            due = due_time(pred)
+            self._write(due, pred_id, ADDED)
+            self.open[pred_id] = due
+            heapq.heappush(self.heap, (due, pred_id))
+        elif pred_id in self.open:
+            # Из кучи не удаляем: устаревшая запись пропускается в pop_due
+            self._write(self.open.pop(pred_id), pred_id, RESOLVED)
+
+    def state(self):
+        if self._file is not None:
+            self._file.flush()
+        if self.open is not None and self.length > max(COMPACT_MIN, 2 * len(self.open)):
+            self._compact()
+        return {"length": self.length}
+
+    def restore(self, state):
+        """False, если журнал короче сохранённого состояния (нужна пересборка)"""
+        self._close()
+        length = state["length"]
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        if size < length * RECORD.size:
+            return False
+        if size > length * RECORD.size:
+            # Хвост, записанный после состояния, будет дописан из журнала истории
+            with open(self.path, 'r+b') as f:
+                f.truncate(length * RECORD.size)
+        self.length = length
+        self.open = None
+        self.heap = None
+        return True
+
+    # --- очередь ---
+
+    def load(self):
+        """Прочитать журнал и построить кучу (один раз)"""
+        if self.open is None:
+            if self._file is not None:
+                self._file.flush()
+            opened = {}
+            if self.length:
+                with open(self.path, 'rb') as f:
+                    data = f.read(self.length * RECORD.size)
+                for due, pred_id, op in RECORD.iter_unpack(data):
+                    if op == ADDED:
+                        opened[pred_id] = due
+                    else:
+                        opened.pop(pred_id, None)
+            self.open = opened
+            self.heap = [(due, pred_id) for pred_id, due in opened.items()]
+            heapq.heapify(self.heap)
+        return self.open
+
+    def __len__(self):
+        return len(self.load())
+
+    def next_due(self):
+        """Ближайший срок или None"""
+        self.load()
+        heap = self.heap
+        while heap and self.open.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_due(self, ts):
+        """id всех прогнозов со сроком ≤ ts (по возрастанию срока)
+
+        id снимаются с кучи, но остаются в open и журнале до
+        update(разрешённый прогноз) или discard. Если разрешить не
+        удалось — requeue() вернёт их в очередь.
+        """
+        self.load()
+        heap, opened = self.heap, self.open
+        due_ids = []
+        while heap and heap[0][0] <= ts:
+            due, pred_id = heapq.heappop(heap)
+            if opened.get(pred_id) == due:
+                due_ids.append(pred_id)
+        return due_ids
+
+    def requeue(self):
+        """Вернуть в очередь снятые pop_due, но не разрешённые прогнозы
+
+        Куча строится заново из журнала при следующем обращении.
+        """
+        self.open = None
+        self.heap = None
+
+    def discard(self, pred_id):
+        """Убрать прогноз из очереди без разрешения (удалён или разрешён другим процессом)"""
+        if pred_id in self.load():
+            self._write(self.open.pop(pred_id), pred_id, RESOLVED)
+
+    # --- журнал ---
+
+    def _write(self, due, pred_id, op):
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        self._file.write(RECORD.pack(due, pred_id, op))
+        self.length += 1
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _compact(self):
+        """Переписать журнал только открытыми прогнозами (атомарно)"""
+        self._close()
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            for pred_id, due in sorted(self.open.items()):
+                f.write(RECORD.pack(due, pred_id, ADDED))
+        os.replace(str(tmp), str(self.path))
+        self.length = len(self.open)
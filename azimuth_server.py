@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+OGLM Azimuth Server
+Многопользовательский режим терминала
+
+Один asyncio-процесс обслуживает тысячи соединений без потока на клиента.
+Протокол — JSON по строке в обе стороны (TCP или UNIX-сокет):
+
+    → {"op": "login", "user": "@whale"}
+    ← {"ok": true, "user": "@whale", "price": 1.0}
+    → {"op": "predict", "azimuth": 50, "horizon": 7, "note": "..."}
+    ← {"ok": true, "prediction": {...}, "price": 1.37}
+
+Операции: login, price, predict, stats, chart, history. Поле "id" из
+запроса возвращается в ответе, "user" можно передать в любом запросе.
+
+У каждого трейдера своя директория (DATA/users/<имя без @>/) и свой движок
+OGLMAzimuthTerminal; цена OGLM — общая на сервер. Движки открываются
+по первому запросу и закрываются по LRU, дисковые операции идут в
+небольшом пуле потоков, запросы одного трейдера — строго по очереди.
+
+    python azimuth_server.py serve tcp:127.0.0.1:9010 --data ~/.oglm-server
+    python azimuth_server.py load tcp:127.0.0.1:9010 --clients 2000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import signal
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from azimuth_chart import render_chart
+from azimuth_history import HistoryPager, parse_query
+from azimuth_montecarlo import new_seed, seeded_outcome
+from azimuth_storage import StorageError, atomic_write_json
+from azimuth_terminal import OGLMAzimuthTerminal
+
+USER_RE = re.compile(r'^@?[A-Za-z0-9_][A-Za-z0-9_.-]{0,31}$')
+MAX_ENGINES = 256     # открытых движков (у каждого несколько файлов)
+WORKERS = 8           # потоков под дисковые операции
+SAVE_INTERVAL = 5.0   # как часто сохранять общую цену, сек
+BACKLOG = 4096
+
+
+class ClientError(Exception):
+    """Ошибка в запросе клиента (уходит в ответ, соединение живёт)"""
+
+
+class SharedMarket:
+    """Общая цена OGLM: каждый прогноз двигает её для всех"""
+
+    def __init__(self, path, seed=None):
+        self.path = path
+        self.price = 1.0
+        self.dirty = False
+        self.rng = random.Random(new_seed() if seed is None else seed)
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.price = json.load(f)["current_price"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def advance(self, azimuth, horizon):
+        """Исход прогноза на общем рынке → (цена входа, (движение, темная материя), seed)"""
+        with self._lock:
+            entry = self.price
+            seed = new_seed(self.rng)
+            outcome = seeded_outcome(azimuth, horizon, seed)
+            self.price = entry * (1 + outcome[0] / 100)
+            self.dirty = True
+            return entry, outcome, seed
+
+    def save(self):
+        with self._lock:
+            if not self.dirty:
+                return
+            price = self.price
+            self.dirty = False
+        atomic_write_json(self.path, {"current_price": price})
+
+
+class AzimuthServer:
+    def __init__(self, data_dir, max_engines=MAX_ENGINES, workers=WORKERS):
+        self.data_dir = Path(data_dir)
+        (self.data_dir / "users").mkdir(parents=True, exist_ok=True)
+        self.market = SharedMarket(self.data_dir / "market.json")
+        self.max_engines = max_engines
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.engines = OrderedDict()  # имя → движок, в порядке последнего обращения
+        self.locks = {}  # имя → asyncio.Lock: запросы трейдера по очереди
+        self.waiting = {}  # имя → сколько запросов держат или ждут lock
+        self.closing = {}  # имя → future закрытия вытесненного движка
+        self.connections = 0
+        self.requests = 0
+        self.handlers = {
+            "login": self.op_login,
+            "price": self.op_price,
+            "predict": self.op_predict,
+            "stats": self.op_stats,
+            "chart": self.op_chart,
+            "history": self.op_history,
+        }
+
+    # --- соединения ---
+
+    async def start(self, spec):
+        kind, _, target = spec.partition(':')
+        if kind == 'unix':
+            return await asyncio.start_unix_server(self.handle, target, backlog=BACKLOG)
+        if kind == 'tcp':
+            host, _, port = target.rpartition(':')
+            return await asyncio.start_server(self.handle, host or '127.0.0.1', int(port),
+                                              backlog=BACKLOG)
+        raise ValueError(f"нужен unix:PATH или tcp:HOST:PORT, не {spec!r}")
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        session = {"user": None}
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                response = await self.dispatch(line, session)
+                writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode('utf-8'))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # клиент оборвал соединение или прислал слишком длинную строку
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def dispatch(self, line, session):
+        """Строка запроса → ответ; ошибки клиента не рвут соединение"""
+        self.requests += 1
+        request = {}
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                raise ClientError("запрос — JSON-объект на одной строке")
+            if not isinstance(request, dict):
+                raise ClientError("запрос — JSON-объект на одной строке")
+            handler = self.handlers.get(request.get("op"))
+            if handler is None:
+                raise ClientError(f"неизвестная операция: {request.get('op')!r}")
+            response = await handler(request, session)
+            response["ok"] = True
+        except ClientError as e:
+            response = {"ok": False, "error": str(e)}
+        except StorageError as e:
+            response = {"ok": False, "error": f"данные повреждены: {e}"}
+        if "id" in request:
+            response["id"] = request["id"]
+        return response
+
+    # --- движки трейдеров ---
+
+    def _user(self, request, session):
+        name = request.get("user") or session["user"]
+        if name is None:
+            raise ClientError("сначала login")
+        if not USER_RE.match(name):
+            raise ClientError(f"недопустимое имя: {name!r}")
+        # whale и @whale — один трейдер: одна директория, один движок и lock
+        return '@' + name.lstrip('@')
+
+    def _open_engine(self, name):
+        engine = OGLMAzimuthTerminal(self.data_dir / "users" / name[1:])
+        engine.username = name
+        return engine
+
+    async def call(self, name, func, *args):
+        """Выполнить func(движок, *args) в пуле, по очереди для трейдера"""
+        loop = asyncio.get_running_loop()
+        lock = self.locks.setdefault(name, asyncio.Lock())
+        self.waiting[name] = self.waiting.get(name, 0) + 1
+        try:
+            async with lock:
+                engine = self.engines.get(name)
+                if engine is None:
+                    if name in self.closing:
+                        # Движок ещё закрывается — не открывать те же файлы дважды
+                        await asyncio.shield(self.closing[name])
+                    engine = await loop.run_in_executor(self.executor, self._open_engine, name)
+                    self.engines[name] = engine
+                    await self._evict()
+                else:
+                    self.engines.move_to_end(name)
+                return await loop.run_in_executor(self.executor, func, engine, *args)
+        finally:
+            self.waiting[name] -= 1
+            if not self.waiting[name]:
+                del self.waiting[name]
+                if name not in self.engines:
+                    # Движок не открылся или вытеснен — lock больше не нужен
+                    self.locks.pop(name, None)
+
+    async def _evict(self):
+        """Закрыть давно не используемые движки сверх лимита"""
+        loop = asyncio.get_running_loop()
+        # Выбор жертв — без await, чтобы параллельные вызовы не делили движки
+        victims = []
+        for name in list(self.engines):
+            if len(self.engines) <= self.max_engines:
+                break
+            if name in self.waiting:
+                continue  # движок сейчас занят запросом или его ждут
+            engine = self.engines.pop(name)
+            self.locks.pop(name, None)
+            victims.append(name)
+            self.closing[name] = loop.run_in_executor(self.executor, engine.store.close)
+        for name in victims:
+            future = self.closing[name]
+            try:
+                await asyncio.shield(future)
+            finally:
+                if self.closing.get(name) is future:
+                    del self.closing[name]
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        for engine in self.engines.values():
+            await loop.run_in_executor(self.executor, engine.store.close)
+        self.engines.clear()
+        self.market.save()
+        self.executor.shutdown()
+
+    async def save_periodically(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(SAVE_INTERVAL)
+            await loop.run_in_executor(self.executor, self.market.save)
+
+    # --- операции ---
+
+    async def op_login(self, request, session):
+        name = self._user(request, session)
+        stats = await self.call(name, lambda engine: dict(engine.summary["stats"]))
+        session["user"] = name
+        return {"user": name, "price": self.market.price, "stats": stats}
+
+    async def op_price(self, request, session):
+        return {"price": self.market.price}
+
+    async def op_predict(self, request, session):
+        name = self._user(request, session)
+        try:
+            azimuth = float(request["azimuth"])
+            horizon = int(request.get("horizon", 7))
+        except (KeyError, TypeError, ValueError):
+            raise ClientError("predict: нужен числовой azimuth (и целый horizon)")
+        note = str(request.get("note", ""))
+        prediction = await self.call(name, self._predict, azimuth, horizon, note)
+        return {"prediction": prediction, "price": self.market.price}
+
+    def _predict(self, engine, azimuth, horizon, note):
+        entry, outcome, seed = self.market.advance(azimuth, horizon)
+        with engine.lock:
+            engine.current_price = entry
+            return engine.record_prediction(azimuth, note, horizon, outcome, seed)
+
+    async def op_stats(self, request, session):
+        return await self.call(self._user(request, session), self._stats)
+
+    @staticmethod
+    def _stats(engine):
+        s = engine.streaming
+        streaming = {"count": s.count}
+        if s.count:
+            streaming.update({
+                "error_mean": s.error.mean,
+                "error_std": s.error.std,
+                "quantiles": {q: s.quantile(float(q)) for q in ("0.5", "0.9", "0.99")},
+                "accuracy": {str(w): s.accuracy(w) for w in s.windows},
+                "max_drawdown": s.max_drawdown,
+            })
+        # Копии: ответ сериализуется уже после того, как движок отпущен
+        return {
+            "stats": dict(engine.summary["stats"]),
+            "market": dict(engine.summary["market"]),
+            "streaming": streaming,
+            "recent": list(engine.summary["recent"]),
+            "pending": len(engine.scheduler),
+        }
+
+    async def op_chart(self, request, session):
+        try:
+            width = max(10, min(int(request.get("width", 60)), 500))
+            height = max(2, min(int(request.get("height", 10)), 100))
+            first = request.get("first")
+            last = request.get("last")
+            first = int(first) if first is not None else None
+            last = int(last) if last is not None else None
+        except (TypeError, ValueError):
+            raise ClientError("chart: width/height/first/last — целые")
+        return await self.call(self._user(request, session), self._chart, width, height, first, last)
+
+    @staticmethod
+    def _chart(engine, width, height, first, last):
+        # Та же разметка, что в draw_price_chart: точка 0 — стартовая цена
+        index = engine.price_index
+        start = max(first - 1, 0) if first else 0
+        stop = last + 1 if last else None
+        buckets = index.downsample(width, start, stop) if index.length >= 2 else []
+        return {"points": index.length, "lines": render_chart(buckets, height)}
+
+    async def op_history(self, request, session):
+        args = request.get("args", [])
+        if isinstance(args, str):
+            args = args.split()
+        try:
+            query = parse_query(args)
+            cursor = request.get("cursor")
+            cursor = int(cursor) if cursor is not None else None
+            page_size = max(1, min(int(request.get("page_size", 20)), 500))
+        except (TypeError, ValueError) as e:
+            raise ClientError(f"history: {e}")
+        direction = request.get("direction", "older")
+        if direction not in ("older", "newer"):
+            raise ClientError("history: direction — older или newer")
+        return await self.call(self._user(request, session), self._history,
+                               query, cursor, direction, page_size)
+
+    @staticmethod
+    def _history(engine, query, cursor, direction, page_size):
+        """Страница истории; cursor — позиция, от которой листать"""
+        if engine.summary["count"] == 0:
+            return {"predictions": [], "position": "0 из 0", "cursor": None}
+        pager = HistoryPager(engine.store, query, page_size)
+        if cursor is None:
+            records = pager.first()
+        else:
+            pager.page = [cursor]
+            records = pager.older() if direction == "older" else pager.newer()
+            if pager.page == [cursor]:
+                records = []  # дальше листать некуда
+        cursor = [pager.page[0], pager.page[-1]] if records else None
+        return {"predictions": records, "position": pager.position(), "cursor": cursor}
+
+
+async def serve(spec, data_dir, max_engines=MAX_ENGINES, workers=WORKERS):
+    server = AzimuthServer(data_dir, max_engines, workers)
+    listener = await server.start(spec)
+    saver = asyncio.ensure_future(server.save_periodically())
+    print(f"OGLM server: {spec}, данные в {server.data_dir}", file=sys.stderr)
+
+    # SIGTERM/SIGINT — штатная остановка: движки закрываются, цена сохраняется
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, task.cancel)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: остаётся KeyboardInterrupt
+    try:
+        async with listener:
+            await listener.serve_forever()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        saver.cancel()
+        await server.close()
+
+
+# --- генератор нагрузки ---
+
+async def _connect(spec):
+    kind, _, target = spec.partition(':')
+    if kind == 'unix':
+        return await asyncio.open_unix_connection(target)
+    host, _, port = target.rpartition(':')
+    return await asyncio.open_connection(host or '127.0.0.1', int(port))
+
+
+def _random_request():
+    """Смесь операций: в основном прогнозы, немного чтения"""
+    roll = random.random()
+    if roll < 0.7:
+        return {"op": "predict", "azimuth": round(random.gauss(0, 25), 1),
+                "horizon": random.choice((1, 7, 30))}
+    if roll < 0.85:
+        return {"op": "stats"}
+    if roll < 0.95:
+        return {"op": "history", "page_size": 10}
+    return {"op": "chart", "width": 60}
+
+
+async def _client(spec, user, requests, latencies, errors):
+    try:
+        reader, writer = await _connect(spec)
+    except OSError:
+        errors.append("connect")
+        return
+    try:
+        for i in range(requests + 1):
+            request = {"op": "login", "user": user} if i == 0 else _random_request()
+            request["id"] = i
+            started = time.perf_counter()
+            writer.write((json.dumps(request) + "\n").encode('utf-8'))
+            await writer.drain()
+            line = await reader.readline()
+            if not line:
+                errors.append("disconnect")
+                return
+            latencies.append(time.perf_counter() - started)
+            response = json.loads(line)
+            if not response.get("ok"):
+                errors.append(response.get("error"))
+    except (OSError, ValueError) as e:
+        errors.append(str(e))
+    finally:
+        writer.close()
+
+
+async def load(spec, clients=1000, requests=20, users=100):
+    """Открыть clients соединений одновременно, каждое шлёт requests запросов"""
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _client(spec, f"@trader{i % users}", requests, latencies, errors)
+        for i in range(clients)
+    ))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    def pct(q):
+        return latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000 if latencies else 0.0
+    print(f"Load: {clients} клиентов × {requests} запросов, {users} трейдеров")
+    print(f"  {len(latencies)} ответов за {elapsed:.2f}s ({len(latencies) / elapsed:,.0f}/s)")
+    print(f"  Задержка: p50 {pct(0.5):.1f}ms · p90 {pct(0.9):.1f}ms · p99 {pct(0.99):.1f}ms")
+    print(f"  Ошибок: {len(errors)}" + (f" (например: {errors[0]})" if errors else ""))
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OGLM Azimuth multi-user server")
+    sub = parser.add_subparsers(dest="command")
+    p_serve = sub.add_parser("serve", help="запустить сервер")
+    p_serve.add_argument("spec", help="unix:PATH или tcp:HOST:PORT")
+    p_serve.add_argument("--data", default=str(Path.home() / ".oglm-server"),
+                         help="директория данных (default: ~/.oglm-server)")
+    p_serve.add_argument("--max-engines", type=int, default=MAX_ENGINES)
+    p_serve.add_argument("--workers", type=int, default=WORKERS)
+    p_load = sub.add_parser("load", help="генератор нагрузки")
+    p_load.add_argument("spec", help="unix:PATH или tcp:HOST:PORT")
+    p_load.add_argument("--clients", type=int, default=1000, help="одновременных соединений")
+    p_load.add_argument("--requests", type=int, default=20, help="запросов на соединение")
+    p_load.add_argument("--users", type=int, default=100, help="разных трейдеров")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "serve":
+            asyncio.run(serve(args.spec, args.data, args.max_engines, args.workers))
+        elif args.command == "load":
+            asyncio.run(load(args.spec, args.clients, args.requests, args.users))
+        else:
+            parser.print_help()
+            sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
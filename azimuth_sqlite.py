@@ -0,0 +1,697 @@
+#!/usr/bin/env python3
+"""
+OGLM Azimuth SQLite
+Хранилище истории в SQLite: индексы и запросы без скана истории
+
+Включается в config.json: "storage": "sqlite" — или командой migrate,
+которая переносит историю JSON и сама переключает config. Файл —
+azimuth_predictions.sqlite рядом со старыми; JSON-файлы миграция не
+трогает, вернуться можно через "storage": "json".
+
+Прогноз хранится целиком (JSON в колонке record — читается ровно то, что
+записано), а поля для поиска — колонками с индексами: время, горизонт,
+статус, азимут, ошибка. Режим WAL: запросы не ждут писателя, пачка
+(batch) — одна транзакция.
+
+Интерфейс — как у JournalStore. Сводка (stats, market, recent) и
+состояния агрегаторов лежат в таблице meta и пишутся в той же
+транзакции, что и прогнозы, поэтому после падения они не расходятся.
+
+    python azimuth_sqlite.py migrate [DIR]
+    python azimuth_sqlite.py query DIR --azimuth -99 --horizon 30 --since 2026-10-01 --until 2026-10-31
+    python azimuth_sqlite.py query DIR --sort -error --limit 20
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from azimuth_history import make_entry, parse_search, search_lines
+from azimuth_model import PredictionTable
+from azimuth_perf import PERF
+from azimuth_storage import (PARSE_CHUNK, RECENT_SIZE, JournalStore, StorageError,
+                             atomic_write_json, create_store, fsync_dir)
+
+TABLES = """
+CREATE TABLE IF NOT EXISTS predictions (
+    position INTEGER PRIMARY KEY,  -- порядок записи, с 0
+    id INTEGER NOT NULL,
+    epoch INTEGER NOT NULL,
+    horizon_days INTEGER NOT NULL,
+    status INTEGER NOT NULL,
+    azimuth REAL,
+    error REAL,
+    pnl REAL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS predictions_id ON predictions(id);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+# Индексы поиска; при миграции строятся после вставки — так быстрее
+INDEXES = """
+CREATE INDEX IF NOT EXISTS predictions_time ON predictions(epoch);
+CREATE INDEX IF NOT EXISTS predictions_horizon ON predictions(horizon_days, epoch);
+CREATE INDEX IF NOT EXISTS predictions_status ON predictions(status, epoch);
+CREATE INDEX IF NOT EXISTS predictions_azimuth ON predictions(azimuth);
+CREATE INDEX IF NOT EXISTS predictions_error ON predictions(error);
+"""
+
+INSERT = "INSERT INTO predictions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+UPDATE = ("UPDATE predictions SET epoch = ?, horizon_days = ?, status = ?, azimuth = ?, "
+          "error = ?, pnl = ?, record = ? WHERE id = ?")
+MIGRATE_BATCH = 5000  # строк на один executemany при миграции
+SQL_VARS = 500  # параметров в одном IN (...) — с запасом до лимита SQLite
+
+
+def _number(value):
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _row(pred, position):
+    """Строка таблицы predictions: (позиция, id, колонки поиска..., JSON)"""
+    entry = make_entry(pred, position, position, 0, 0)
+    return (position, entry[0], entry[1], entry[4], entry[5], _number(pred.get("azimuth")),
+            _number(pred.get("error")), _number(pred.get("pnl")),
+            json.dumps(pred, ensure_ascii=False))
+
+
+def _chunks(cursor):
+    """Пачки прогнозов из курсора по record, каждая — один json.loads"""
+    while True:
+        rows = cursor.fetchmany(PARSE_CHUNK)
+        if not rows:
+            return
+        yield json.loads('[' + ','.join(row[0] for row in rows) + ']')
+
+
+def _records(cursor):
+    """Прогнозы из курсора по record"""
+    for chunk in _chunks(cursor):
+        yield from chunk
+
+
+def _where(search):
+    """WHERE и параметры для фильтров parse_search"""
+    clauses, params = [], []
+    if search["status"] is not None:
+        clauses.append("status = ?")
+        params.append(search["status"])
+    if search["horizon"] is not None:
+        clauses.append("horizon_days = ?")
+        params.append(search["horizon"])
+    if search["first"] is not None:
+        clauses.append("id BETWEEN ? AND ?")
+        params += [search["first"], search["last"]]
+    if search["azimuth"] is not None:
+        clauses.append("azimuth BETWEEN ? AND ?")
+        params += list(search["azimuth"])
+    if search["since"] is not None:
+        clauses.append("epoch >= ?")
+        params.append(search["since"])
+    if search["until"] is not None:
+        clauses.append("epoch < ?")
+        params.append(search["until"] + 86400)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+class SQLiteIndex:
+    """Индекс для HistoryPager поверх таблицы
+
+    Записи — как у HistoryIndex: (id, epoch, позиция, 0, горизонт, статус, 0),
+    смещение — позиция строки.
+    """
+
+    COLUMNS = "id, epoch, position, 0, horizon_days, status, 0"
+
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        (last,), = self.store._read("SELECT MAX(position) FROM predictions")
+        return 0 if last is None else last + 1
+
+    def entries(self, start, stop):
+        return self.store._read(f"SELECT {self.COLUMNS} FROM predictions "
+                                "WHERE position >= ? AND position < ? ORDER BY position",
+                                (start, stop))
+
+    def position_of(self, key, value):
+        """Позиция по id (key=0) или времени (key=1): первая, где поле >= value"""
+        column = ("id", "epoch")[key]
+        rows = self.store._read(f"SELECT position FROM predictions WHERE {column} >= ? "
+                                f"ORDER BY {column}, position LIMIT 1", (value,))
+        return rows[0][0] if rows else len(self)
+
+    def lookup(self, ids):
+        """{id: (позиция, запись)}"""
+        ids = sorted(set(ids))
+        found = {}
+        for i in range(0, len(ids), SQL_VARS):
+            chunk = ids[i:i + SQL_VARS]
+            rows = self.store._read(f"SELECT {self.COLUMNS} FROM predictions "
+                                    f"WHERE id IN ({','.join('?' * len(chunk))}) ORDER BY position",
+                                    chunk)
+            for entry in rows:
+                found.setdefault(entry[0], (entry[2], entry))
+        return found
+
+    def find(self, start, stop, limit, reverse=False, status=None, horizon=None):
+        """До limit позиций из [start, stop), подходящих под фильтры"""
+        sql = "SELECT position FROM predictions WHERE position >= ? AND position < ?"
+        params = [start, stop]
+        if status is not None:
+            sql += " AND status = ?"
+            params.append(status)
+        if horizon is not None:
+            sql += " AND horizon_days = ?"
+            params.append(horizon)
+        sql += f" ORDER BY position {'DESC' if reverse else 'ASC'} LIMIT ?"
+        found = [row[0] for row in self.store._read(sql, params + [limit])]
+        if reverse:
+            found.reverse()
+        return found
+
+
+class SQLiteStore:
+    """История в SQLite с интерфейсом JournalStore"""
+
+    def __init__(self, db_file, sync=True):
+        self.db_file = Path(db_file)
+        self.sync = sync  # synchronous=FULL: COMMIT переживает падение питания
+        self.summary = None
+        self.aggregators = {}
+        self._empty = None
+        self._data = None
+        self._conn = None
+        self._index = None
+        self._lock = threading.RLock()
+        self._depth = 0  # вложенность transaction()
+        self._version = None  # PRAGMA data_version на момент нашей синхронизации
+        self._dirty = False  # сводка изменилась — записать перед COMMIT
+
+    def register(self, name, aggregator):
+        """Подключить инкрементальный агрегатор (до open)"""
+        self.aggregators[name] = aggregator
+        return aggregator
+
+    def _connect(self):
+        if self._conn is None:
+            # Соединение общее для потоков (фид, фоновые задачи) — под self._lock
+            conn = sqlite3.connect(str(self.db_file), timeout=60, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={'FULL' if self.sync else 'NORMAL'}")
+            conn.executescript(TABLES + INDEXES)
+            self._conn = conn
+        return self._conn
+
+    def _read(self, sql, params=()):
+        """Запрос вне транзакции записи (снимок WAL, писателя не ждёт)"""
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def open(self, empty):
+        """Открыть базу и вернуть сводку, не читая полную историю"""
+        self._empty = empty
+        with PERF.timer("open"), self.transaction():
+            pass
+        return self.summary
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    @property
+    def data(self):
+        """Полная история (загружается при первом обращении)"""
+        return self.load()
+
+    def load_in_background(self):
+        """Ничего не делает: history, query и get читают базу запросами"""
+
+    # --- транзакции и другие процессы ---
+
+    @contextmanager
+    def transaction(self):
+        """Эксклюзивная запись (BEGIN IMMEDIATE); на входе — чужие изменения
+
+        Сводка пишется перед COMMIT, поэтому пачка записей внутри одной
+        transaction() — одна транзакция и один fsync.
+        """
+        with self._lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield self
+                finally:
+                    self._depth -= 1
+                return
+
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            self._depth = 1
+            try:
+                self._catch_up()
+                yield self
+                if self._dirty:
+                    self._write_summary()
+                with PERF.timer("commit"):
+                    conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                # Память могла уйти вперёд базы — в следующий раз перечитать
+                self._version = None
+                self._dirty = False
+                raise
+            finally:
+                self._depth = 0
+
+    def _catch_up(self):
+        """Подхватить то, что записали другие процессы (под блокировкой)"""
+        (version,), = self._conn.execute("PRAGMA data_version").fetchall()
+        if version != self._version:
+            self._sync()
+            self._version = version
+
+    def _sync(self):
+        """Сводка, агрегаторы и загруженная история — по базе"""
+        rows = self._conn.execute("SELECT value FROM meta WHERE key = 'summary'").fetchall()
+        if rows:
+            summary = json.loads(rows[0][0])
+            states = summary.pop("aggregates", {})
+        else:
+            summary = self._build_summary()
+            states = {}
+            self._dirty = True
+
+        stale = [aggregator for name, aggregator in self.aggregators.items()
+                 if name not in states or aggregator.restore(states[name]) is False]
+        if stale:
+            for aggregator in stale:
+                aggregator.reset()
+            for pred in self._scan():
+                for aggregator in stale:
+                    aggregator.update(pred)
+            self._dirty = True
+
+        self._adopt(summary)
+        if self._data is not None:
+            # На историю держат ссылки — перечитываем на месте
+            data = self._load_full()
+            self._data.clear()
+            self._data.update(data)
+            self._bind(self._data)
+
+    def _build_summary(self):
+        """Сводка по таблице (новая база): stats/market — из шаблона"""
+        data = self._empty()
+        (count, last_id), = self._conn.execute(
+            "SELECT COUNT(*), MAX(id) FROM predictions").fetchall()
+        return {
+            "count": count,
+            "last_id": max(last_id or 0, count),
+            "stats": data["stats"],
+            "market": data.get("market"),
+            "recent": self._recent(),
+        }
+
+    def _recent(self):
+        cursor = self._conn.execute("SELECT record FROM predictions ORDER BY position DESC LIMIT ?",
+                                    (RECENT_SIZE,))
+        return list(reversed(list(_records(cursor))))
+
+    def _adopt(self, summary):
+        """Принять сводку на месте: терминал держит ссылки на summary/stats/market"""
+        current = self.summary
+        if current is None:
+            self.summary = summary
+            return
+        for key in ("stats", "market"):
+            old, new = current.get(key), summary.get(key)
+            if isinstance(old, dict) and isinstance(new, dict):
+                old.clear()
+                old.update(new)
+                summary[key] = old
+        current.clear()
+        current.update(summary)
+
+    def _write_summary(self):
+        with PERF.timer("summary"):
+            states = {name: aggregator.state() for name, aggregator in self.aggregators.items()}
+            summary = dict(self.summary, aggregates=states)
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('summary', ?)",
+                               (json.dumps(summary, ensure_ascii=False),))
+            self._dirty = False
+
+    def next_id(self):
+        """Следующий id прогноза (вызывать внутри transaction(), вместе с append)"""
+        summary = self.summary
+        return max(summary.get("last_id", 0), summary["count"]) + 1
+
+    # --- запись ---
+
+    def append(self, prediction):
+        """Добавить прогноз; stats/market — из сводки"""
+        with self.transaction():
+            summary = self.summary
+            self._conn.execute(INSERT, _row(prediction, summary["count"]))
+            if self._data is not None:
+                self._data["predictions"].append(prediction)
+            for aggregator in self.aggregators.values():
+                aggregator.update(prediction)
+            summary["count"] += 1
+            if prediction.get("id", 0) > summary.get("last_id", 0):
+                summary["last_id"] = prediction["id"]
+            summary["recent"].append(prediction)
+            del summary["recent"][:-RECENT_SIZE]
+            self._dirty = True
+
+    def resolve(self, prediction):
+        """Записать разрешение ранее добавленного прогноза (ищется по id)"""
+        self.resolve_many([prediction])
+
+    def resolve_many(self, predictions):
+        """Записать разрешения пачкой (одна транзакция)"""
+        with self.transaction():
+            summary = self.summary
+            recent = {pred.get("id"): i for i, pred in enumerate(summary["recent"])}
+            rows = []
+            for prediction in predictions:
+                row = _row(prediction, 0)
+                rows.append(row[2:] + (prediction["id"],))
+                if self._data is not None:
+                    self._data["predictions"].replace(prediction)
+                for aggregator in self.aggregators.values():
+                    aggregator.update(prediction)
+                if prediction["id"] in recent:
+                    summary["recent"][recent[prediction["id"]]] = prediction
+            self._conn.executemany(UPDATE, rows)
+            self._dirty = True
+
+    @contextmanager
+    def batch(self):
+        """Пакетная запись: одна транзакция, один fsync и одна сводка"""
+        with self.transaction():
+            yield self
+
+    def checkpoint(self):
+        """Записать сводку с изменениями stats/market вне append/resolve"""
+        with self.transaction():
+            self._dirty = True
+
+    def compact(self):
+        """Перенести WAL в основной файл базы (аналог свёртки журнала)"""
+        with PERF.timer("save"), self._lock:
+            if not self._depth:
+                self._connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def rewrite(self, data):
+        """Заменить историю целиком (пересчёт azimuth_replay)"""
+        if not isinstance(data["predictions"], PredictionTable):
+            data["predictions"] = PredictionTable(data["predictions"])
+        with self.transaction():
+            conn = self._conn
+            conn.execute("DELETE FROM predictions")
+            for aggregator in self.aggregators.values():
+                aggregator.reset()
+            rows = []
+            for position, pred in enumerate(data["predictions"].records()):
+                rows.append(_row(pred, position))
+                for aggregator in self.aggregators.values():
+                    aggregator.update(pred)
+                if len(rows) == MIGRATE_BATCH:
+                    conn.executemany(INSERT, rows)
+                    rows = []
+            conn.executemany(INSERT, rows)
+
+            preds = data["predictions"]
+            self._adopt({
+                "count": len(preds),
+                "last_id": max(max(preds.ids, default=0), len(preds)),
+                "stats": data["stats"],
+                "market": data.get("market"),
+                "recent": [dict(p) for p in preds[-RECENT_SIZE:]],
+            })
+            self._bind(data)
+            self._data = data
+            self._dirty = True
+
+    def rewrite_stream(self, chunks, finish):
+        """Заменить историю потоком пачек (миграция): как rewrite, без истории в памяти
+
+        finish() после последней пачки возвращает stats, market и прочее.
+        """
+        with self.transaction():
+            conn = self._conn
+            conn.execute("DELETE FROM predictions")
+            for aggregator in self.aggregators.values():
+                aggregator.reset()
+            position = last_id = 0
+            recent = []
+            for chunk in chunks:
+                conn.executemany(INSERT, [_row(pred, position + i) for i, pred in enumerate(chunk)])
+                for pred in chunk:
+                    last_id = max(last_id, pred.get("id", 0))
+                    for aggregator in self.aggregators.values():
+                        aggregator.update(pred)
+                position += len(chunk)
+                recent = (recent + chunk)[-RECENT_SIZE:]
+
+            data = finish()
+            self._adopt({
+                "count": position,
+                "last_id": max(last_id, position),
+                "stats": data["stats"],
+                "market": data.get("market"),
+                "recent": recent,
+            })
+            self._data = None
+            self._dirty = True
+
+    # --- чтение ---
+
+    def load(self):
+        """Полная история в памяти (PredictionTable), как у JournalStore"""
+        with self.transaction():
+            if self._data is None:
+                with PERF.timer("load"):
+                    data = self._load_full()
+                self._bind(data)
+                self._data = data
+            return self._data
+
+    def _load_full(self):
+        data = self._empty()
+        table = data["predictions"] = PredictionTable()
+        for chunk in _chunks(self._conn.execute("SELECT record FROM predictions ORDER BY position")):
+            table.extend(chunk)
+        return data
+
+    def _scan(self):
+        """Прогнозы по порядку, не собирая историю в памяти"""
+        return _records(self._conn.execute("SELECT record FROM predictions ORDER BY position"))
+
+    def iter_chunks(self, start=0):
+        """Прогнозы с позиции start пачками
+
+        Своё соединение только для чтения: один SELECT — один снимок WAL,
+        поэтому выгрузка не держит общее соединение и не ждёт писателей.
+        """
+        conn = sqlite3.connect(self.db_file.resolve().as_uri() + "?mode=ro", uri=True, timeout=60)
+        try:
+            yield from _chunks(conn.execute("SELECT record FROM predictions WHERE position >= ? "
+                                            "ORDER BY position", (start,)))
+        finally:
+            conn.close()
+
+    def _bind(self, data):
+        """Сводка и история делят stats/market: правка видна обоим"""
+        data["stats"] = self.summary["stats"]
+        if self.summary.get("market") is not None:
+            data["market"] = self.summary["market"]
+
+    def ensure_index(self):
+        """Индекс для HistoryPager (всегда актуален — это сама таблица)"""
+        if self._index is None:
+            self._index = SQLiteIndex(self)
+        return self._index
+
+    def read_predictions(self, entries):
+        """Прогнозы по записям индекса (позиция — entry[2])"""
+        positions = [entry[2] for entry in entries]
+        found = {}
+        for i in range(0, len(positions), SQL_VARS):
+            chunk = positions[i:i + SQL_VARS]
+            rows = self._read(f"SELECT position, record FROM predictions "
+                              f"WHERE position IN ({','.join('?' * len(chunk))})", chunk)
+            found.update((position, json.loads(record)) for position, record in rows)
+        return [found[position] for position in positions if position in found]
+
+    def get(self, pred_id):
+        """Прогноз по id или None"""
+        return self.get_many([pred_id])[0]
+
+    def get_many(self, ids):
+        """Прогнозы по списку id (None для ненайденных)"""
+        ids = list(ids)
+        with self.transaction():
+            if self._data is not None:
+                preds = self._data["predictions"]
+                positions = [preds.position(pred_id) for pred_id in ids]
+                return [preds.record(p) if p is not None else None for p in positions]
+            found = {}
+            wanted = sorted(set(ids))
+            for i in range(0, len(wanted), SQL_VARS):
+                chunk = wanted[i:i + SQL_VARS]
+                rows = self._conn.execute(
+                    f"SELECT id, record FROM predictions WHERE id IN ({','.join('?' * len(chunk))}) "
+                    "ORDER BY position", chunk).fetchall()
+                for pred_id, record in rows:
+                    found.setdefault(pred_id, json.loads(record))
+            return [found.get(pred_id) for pred_id in ids]
+
+    def query(self, search):
+        """(найдено, прогнозы) по фильтрам parse_search — по индексам"""
+        where, params = _where(search)
+        (total,), = self._read(f"SELECT COUNT(*) FROM predictions{where}", params)
+        order = "position"
+        if search["sort"] is not None:
+            # Поле из SORTS (белый список); равные — по порядку записи, как в скане
+            order = f"{search['sort']} {'DESC' if search['descending'] else 'ASC'}, position"
+        elif search["descending"]:
+            order = "position DESC"
+        sql = f"SELECT record FROM predictions{where} ORDER BY {order}"
+        if search["limit"]:
+            sql += " LIMIT ?"
+            params = params + [search["limit"]]
+        with self._lock:
+            preds = list(_records(self._connect().execute(sql, params)))
+        return total, preds
+
+    def close(self):
+        """Закрыть соединение"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def migrate(data_dir, batch=MIGRATE_BATCH):
+    """Перенести историю JSON в SQLite потоком и переключить config.json
+
+    Снапшот читается пачками, журнал — записями: разрешение становится
+    UPDATE, поэтому история целиком в памяти не собирается. База пишется
+    во временный файл и переименовывается; JSON-файлы не меняются.
+    Возвращает число перенесённых прогнозов.
+    """
+    data_dir = Path(data_dir)
+    target = data_dir / "azimuth_predictions.sqlite"
+    if target.exists():
+        raise StorageError(f"{target} уже есть — история уже перенесена")
+    tmp = target.with_name(target.name + ".tmp")
+    for path in (tmp, tmp.with_name(tmp.name + "-journal")):
+        if path.exists():
+            path.unlink()
+
+    source = JournalStore(data_dir / "azimuth_predictions.json")
+    try:
+        # Блокировка JSON-хранилища держится всю миграцию: терминалы ждут
+        with source.transaction():
+            summary = source.open(lambda: {"predictions": [], "stats": {}})
+            if summary["count"] == 0:
+                raise StorageError(f"{data_dir}: история пуста — переносить нечего")
+
+            conn = sqlite3.connect(str(tmp), isolation_level=None)
+            try:
+                conn.execute("PRAGMA synchronous=OFF")  # fsync — один раз, перед rename
+                conn.executescript(TABLES)
+                conn.execute("BEGIN")
+                position = 0
+                rows = []
+                for op, pred in source.iter_records():
+                    if op == "resolve":
+                        conn.executemany(INSERT, rows)  # разрешаемый прогноз может быть в пачке
+                        rows = []
+                        conn.execute(UPDATE, _row(pred, 0)[2:] + (pred["id"],))
+                        continue
+                    rows.append(_row(pred, position))
+                    position += 1
+                    if len(rows) == batch:
+                        conn.executemany(INSERT, rows)
+                        rows = []
+                conn.executemany(INSERT, rows)
+                if position != summary["count"]:
+                    raise StorageError(f"прочитано {position} прогнозов, в сводке {summary['count']}")
+
+                meta = {key: summary[key] for key in ("count", "last_id", "stats", "market", "recent")}
+                conn.execute("INSERT INTO meta VALUES ('summary', ?)",
+                             (json.dumps(meta, ensure_ascii=False),))
+                conn.execute("COMMIT")
+                conn.executescript(INDEXES)
+            finally:
+                conn.close()
+
+            with open(tmp, 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(str(tmp), str(target))
+            fsync_dir(data_dir)
+
+            config_file = data_dir / "config.json"
+            config = {}
+            if config_file.exists():
+                with open(config_file, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+            config["storage"] = "sqlite"
+            atomic_write_json(config_file, config)
+    finally:
+        source.close()
+    return position
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OGLM Azimuth SQLite: миграция и запросы к истории")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_migrate = sub.add_parser("migrate", help="перенести историю JSON в SQLite и переключить config.json")
+    p_migrate.add_argument("data_dir", nargs="?", default=str(Path.home() / ".oglm"),
+                           help="директория терминала (default: ~/.oglm)")
+
+    p_query = sub.add_parser("query", help="прогнозы по фильтрам, как команда query терминала")
+    p_query.add_argument("data_dir", help="директория терминала (json или sqlite по config.json)")
+    p_query.add_argument("filters", nargs=argparse.REMAINDER,
+                         help="--since/--until ДАТА, --horizon N, --azimuth A[:B], "
+                              "--correct/--incorrect/--pending, --sort [-]time|azimuth|error|pnl, --limit N")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "migrate":
+            count = migrate(args.data_dir)
+            print(f"✅ Перенесено {count:,} прогнозов в {Path(args.data_dir) / 'azimuth_predictions.sqlite'}")
+            print("   config.json: \"storage\": \"sqlite\" (JSON-файлы не изменены)")
+            return
+
+        search = parse_search(args.filters)
+        store = create_store(args.data_dir)
+        try:
+            store.open(lambda: {"predictions": [], "stats": {}})
+            total, preds = store.query(search)
+        finally:
+            store.close()
+        print("\n".join(search_lines(total, preds)))
+    except ValueError as e:
+        print(f"❌ query: {e}", file=sys.stderr)
+        sys.exit(2)
+    except (OSError, StorageError, sqlite3.Error) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
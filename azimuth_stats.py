@@ -0,0 +1,226 @@
+"""
+OGLM Azimuth Streaming Stats
+Инкрементальная статистика прогнозов
+
+Обновляется за O(1) на прогноз и хранится рядом с историей (агрегатор
+JournalStore), поэтому print_stats не пересканирует predictions:
+- среднее и дисперсия ошибки (Welford)
+- квантили ошибки (t-digest)
+- точность в скользящих окнах 50 / 500 / 5000
+- максимальная просадка траектории цены
+"""
+
+import math
+
+WINDOWS = (50, 500, 5000)
+
+
+class Welford:
+    """Среднее и дисперсия за один проход"""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class TDigest:
+    """Merging t-digest: квантили потока с ограниченной памятью"""
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.centroids = []  # [[среднее, вес], ...] по возрастанию
+        self.buffer = []
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x):
+        self.buffer.append(x)
+        self.count += 1
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        if len(self.buffer) >= self.compression * 5:
+            self._merge()
+
+    def _k_limit(self, q):
+        """Граница следующего центроида по шкале k1 (узко на хвостах)"""
+        k = self.compression / (2 * math.pi) * math.asin(2 * q - 1) + 1
+        if k >= self.compression / 4:
+            return 1.0
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def _merge(self):
+        if not self.buffer:
+            return
+        points = sorted(self.centroids + [[x, 1] for x in self.buffer])
+        self.buffer = []
+
+        total = self.count
+        merged = [points[0][:]]
+        so_far = 0
+        limit = self._k_limit(0.0) * total
+        for mean, weight in points[1:]:
+            current = merged[-1]
+            if so_far + current[1] + weight <= limit:
+                current[0] += (mean - current[0]) * weight / (current[1] + weight)
+                current[1] += weight
+            else:
+                so_far += current[1]
+                limit = self._k_limit(so_far / total) * total
+                merged.append([mean, weight])
+        self.centroids = merged
+
+    def quantile(self, q):
+        self._merge()
+        if not self.centroids:
+            return 0.0
+        if len(self.centroids) == 1:
+            return self.centroids[0][0]
+
+        target = q * self.count
+        cumulative = 0
+        prev_mean, prev_center = self.min, 0.0
+        for mean, weight in self.centroids:
+            center = cumulative + weight / 2
+            if target < center:
+                span = center - prev_center
+                t = (target - prev_center) / span if span else 0.0
+                return prev_mean + t * (mean - prev_mean)
+            cumulative += weight
+            prev_mean, prev_center = mean, center
+
+        span = self.count - prev_center
+        t = (target - prev_center) / span if span else 1.0
+        return prev_mean + t * (self.max - prev_mean)
+
+    def state(self):
+        self._merge()
+        return {
+            "compression": self.compression,
+            "centroids": self.centroids,
+            "count": self.count,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        digest = cls(state["compression"])
+        digest.centroids = [list(c) for c in state["centroids"]]
+        digest.count = state["count"]
+        if digest.count:
+            digest.min = state["min"]
+            digest.max = state["max"]
+        return digest
+
+
+class RollingAccuracy:
+    """Точность в скользящих окнах: последние исходы — биты одного int"""
+
+    def __init__(self, windows=WINDOWS):
+        self.windows = tuple(windows)
+        self.mask = (1 << max(self.windows)) - 1
+        self.bits = 0
+        self.n = 0
+        self.counts = [0] * len(self.windows)
+
+    def add(self, correct):
+        bit = 1 if correct else 0
+        for i, window in enumerate(self.windows):
+            if self.n >= window:
+                # Исход, выпадающий из окна
+                self.counts[i] -= (self.bits >> (window - 1)) & 1
+            self.counts[i] += bit
+        self.bits = ((self.bits << 1) | bit) & self.mask
+        self.n += 1
+
+    def accuracy(self, window):
+        i = self.windows.index(window)
+        size = min(self.n, window)
+        return self.counts[i] / size * 100 if size else 0.0
+
+
+class StreamingStats:
+    """Агрегатор для JournalStore: вся расширенная статистика за O(1)"""
+
+    def __init__(self, windows=WINDOWS):
+        self.windows = tuple(windows)
+        self.reset()
+
+    def reset(self):
+        self.error = Welford()
+        self.digest = TDigest()
+        self.rolling = RollingAccuracy(self.windows)
+        self.peak = None
+        self.max_drawdown = 0.0  # %, отрицательное число
+
+    def update(self, pred):
+        if not pred.get("resolved"):
+            return
+        error = pred.get("error", 0.0)
+        self.error.add(error)
+        self.digest.add(error)
+        self.rolling.add(pred.get("correct"))
+
+        # Просадка от максимума траектории цены
+        price = pred.get("exit_price")
+        if price is None or not math.isfinite(price):
+            return
+        if self.peak is None:
+            self.peak = max(pred.get("entry_price", price), price)
+        if price > self.peak:
+            self.peak = price
+        elif self.peak > 0:
+            drawdown = (price / self.peak - 1) * 100
+            if drawdown < self.max_drawdown:
+                self.max_drawdown = drawdown
+
+    def quantile(self, q):
+        return self.digest.quantile(q)
+
+    def accuracy(self, window):
+        return self.rolling.accuracy(window)
+
+    @property
+    def count(self):
+        return self.error.n
+
+    def state(self):
+        return {
+            "error": [self.error.n, self.error.mean, self.error.m2],
+            "digest": self.digest.state(),
+            "rolling": {
+                "bits": format(self.rolling.bits, 'x'),
+                "n": self.rolling.n,
+                "counts": self.rolling.counts,
+            },
+            "peak": self.peak,
+            "max_drawdown": self.max_drawdown,
+        }
+
+    def restore(self, state):
+        self.reset()
+        self.error.n, self.error.mean, self.error.m2 = state["error"]
+        self.digest = TDigest.from_state(state["digest"])
+        self.rolling.bits = int(state["rolling"]["bits"], 16)
+        self.rolling.n = state["rolling"]["n"]
+        self.rolling.counts = list(state["rolling"]["counts"])
+        self.peak = state["peak"]
+        self.max_drawdown = state["max_drawdown"]
@@ -0,0 +1,1023 @@
+"""
+OGLM Azimuth Storage
+Журнальное хранилище прогнозов
+
+Формат на диске:
+- azimuth_predictions.json    — снапшот (совместим со старым форматом)
+- azimuth_predictions.journal — журнал: одна JSON-запись на строку
+- azimuth_predictions.summary.json — сводка для быстрого старта
+- azimuth_predictions.idx     — индекс смещений записей (azimuth_history)
+- azimuth_predictions.archive/ — старая история сжатыми сегментами (azimuth_archive)
+
+Каждый новый прогноз дописывается в журнал одной строкой вместе с
+обновлённой статистикой, поэтому запись стоит O(1), а не O(история).
+Раз в compact_every записей журнал сворачивается в новый снапшот.
+Снапшот пишется атомарно (tmp + fsync + rename), оборванная последняя
+строка журнала при загрузке отбрасывается.
+
+Снапшот — горячий ярус: при свёртке разрешённая история старше
+hot_size последних прогнозов уходит сегментами по segment_size в
+архив, поэтому свёртка и старт не растут с длиной истории. Позиции
+(индекс, iter_chunks) сквозные: сначала архив, потом снапшот и журнал.
+
+Сводка (stats, market, последние прогнозы) обновляется при каждой записи,
+поэтому терминал стартует за O(1), а полная история грузится в фоне или
+при первом обращении.
+
+Агрегаторы (register) — объекты с методами update(prediction), state(),
+restore(state) и reset(). Их состояние хранится в сводке и снапшоте,
+а при перестроении сводки пересчитывается по истории и журналу.
+restore возвращает False, если состояние не сходится с собственными
+файлами агрегатора — тогда он пересобирается.
+
+Несколько процессов могут писать в одну директорию: запись идёт под
+advisory-блокировкой (azimuth_predictions.lock), а на входе в
+transaction() подхватывается всё, что записали другие (по сводке,
+которую каждый писатель оставляет за собой). id выдаёт next_id() из
+сводки, а fsync журнала групповой — один на всех ожидающих.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from azimuth_history import (ARCHIVE, JOURNAL, SNAPSHOT, make_entry, prediction_status,
+                             search_filter, search_predictions, search_result)
+from azimuth_lock import FileLock, GroupCommit
+from azimuth_model import PredictionTable
+from azimuth_perf import PERF
+
+RECENT_SIZE = 5  # сколько последних прогнозов держать в сводке
+PARSE_CHUNK = 4096  # строк снапшота на один json.loads при загрузке
+SEGMENT_SIZE = 65_536  # прогнозов в сегменте архива
+HOT_SIZE = 16_384  # последних прогнозов, которые всегда остаются в снапшоте
+
+
+class StorageError(Exception):
+    """Данные повреждены и не могут быть загружены без потерь"""
+
+
+def fsync_dir(path):
+    """fsync директории, чтобы rename пережил падение питания (POSIX)"""
+    if os.name == 'nt':
+        return
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_json(path, obj, sync=True, indent=2):
+    """Атомарно записать JSON: читатель видит либо старый, либо новый файл
+
+    indent=None — компактно и через C-энкодер (для служебных файлов).
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(obj, indent=indent, ensure_ascii=False))
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(str(tmp), str(path))
+    if sync:
+        fsync_dir(path.parent)
+
+
+def create_store(data_dir, storage=None):
+    """Хранилище истории директории: storage из config.json, если не задано
+
+    "json" (по умолчанию) — снапшот + журнал, "sqlite" — azimuth_sqlite.
+    """
+    data_dir = Path(data_dir)
+    data_file = data_dir / "azimuth_predictions.json"
+    if storage is None:
+        try:
+            with open(data_dir / "config.json", 'r', encoding='utf-8') as f:
+                storage = json.load(f).get("storage")
+        except (OSError, ValueError, AttributeError):
+            storage = None
+    if storage == "sqlite":
+        from azimuth_sqlite import SQLiteStore
+        return SQLiteStore(data_file.with_suffix('.sqlite'))
+    if storage not in (None, "json"):
+        raise StorageError(f"config.json: неизвестное хранилище {storage!r} (json или sqlite)")
+    return JournalStore(data_file)
+
+
+class JournalStore:
+    """Снапшот + журнал добавлений для структуры {predictions, stats, market}"""
+
+    def __init__(self, data_file, compact_every=1000, sync=True,
+                 segment_size=SEGMENT_SIZE, hot_size=HOT_SIZE):
+        from azimuth_archive import Archive, TieredIndex  # azimuth_archive берёт StorageError отсюда
+
+        self.data_file = Path(data_file)
+        self.journal_file = self.data_file.with_suffix('.journal')
+        self.summary_file = self.data_file.with_suffix('.summary.json')
+        self.archive = Archive(self.data_file.with_suffix('.archive'))
+        self.index = TieredIndex(self.data_file.with_suffix('.idx'), self.archive)
+        self.compact_every = compact_every
+        self.segment_size = segment_size
+        self.hot_size = hot_size
+        self.sync = sync  # fsync после каждой записи журнала (групповой)
+        self.seq = 0  # номер последней применённой записи журнала
+        self.pending = 0  # записей в журнале после последнего снапшота
+        self.summary = None
+        self._empty = None
+        self._data = None
+        self._journal = None
+        self._loader = None
+        self._batch = False
+        self._lock = threading.RLock()
+        self._flock = FileLock(self.data_file.with_suffix('.lock'))
+        self._group = GroupCommit(self.journal_file, self.data_file.with_suffix('.commit'))
+        self._depth = 0  # вложенность transaction()
+        self._known = None  # fingerprint файлов после нашей последней записи/чтения
+        self._unsynced = None  # (поколение, смещение) журнала, ждущее fsync
+        self.aggregators = {}
+
+    def register(self, name, aggregator):
+        """Подключить инкрементальный агрегатор (до open)"""
+        self.aggregators[name] = aggregator
+        return aggregator
+
+    def open(self, empty):
+        """Открыть хранилище и вернуть сводку, не читая полную историю"""
+        self._empty = empty
+        with PERF.timer("open"), self._lock, self._flock:
+            summary = self._read_summary()
+            if summary is None:
+                # Сводки нет или она отстала от файлов — строим по полной истории
+                self.load()
+            else:
+                self.summary = summary
+                self.seq = summary["seq"]
+                self.pending = summary["pending"]
+        return self.summary
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    @property
+    def data(self):
+        """Полная история (загружается при первом обращении)"""
+        return self.load()
+
+    def load_in_background(self):
+        """Начать загрузку полной истории в фоновом потоке
+
+        С архивом — нет: терминалу хватает сводки, индекса и iter_chunks,
+        а архив целиком в памяти — это вся история.
+        """
+        if self._data is None and self._loader is None and not self.archive.count:
+            # Ошибку фоновой загрузки повторит и покажет первый load()
+            def worker():
+                try:
+                    self.load()
+                except StorageError:
+                    pass
+
+            self._loader = threading.Thread(target=worker, daemon=True)
+            self._loader.start()
+
+    def load(self):
+        """Загрузить снапшот и дочитать хвост журнала"""
+        with self.transaction():
+            if self._data is not None:
+                return self._data
+
+            with PERF.timer("load"):
+                data = self._load_full(rebuild=self.summary is None)
+            if self.summary is None:
+                self.summary = self._build_summary(data)
+                self._write_summary()
+            else:
+                self._bind(data)
+            self._data = data
+            return data
+
+    def _bind(self, data):
+        """Сводка и история делят stats/market: правка видна обоим"""
+        data["stats"] = self.summary["stats"]
+        if "market" in data:
+            data["market"] = self.summary["market"]
+
+    def _load_full(self, rebuild, hot=False):
+        """История целиком (hot — только снапшот и журнал, без архива)"""
+        if self.data_file.exists():
+            data = self._read_snapshot(hot)
+        else:
+            data = self._empty_data()
+            self.archive.open(None)
+
+        base_seq = data.pop("journal_seq", 0)
+        states = data.pop("aggregates", {})
+        self.seq = base_seq
+        self.pending = 0
+
+        # Без свежей сводки агрегаторы восстанавливаются из снапшота
+        if rebuild:
+            for name, aggregator in self.aggregators.items():
+                if name not in states or aggregator.restore(states[name]) is False:
+                    aggregator.reset()
+                    for pred in data["predictions"].records():
+                        aggregator.update(pred)
+
+        for record in self._read_journal():
+            # Записи до снапшота уже в нём (падение между rename и truncate)
+            if record["seq"] <= base_seq:
+                continue
+            self._apply(data, record)
+            if rebuild:
+                for aggregator in self.aggregators.values():
+                    aggregator.update(record["prediction"])
+            self.seq = record["seq"]
+            self.pending += 1
+
+        return data
+
+    def _empty_data(self):
+        data = self._empty()
+        data["predictions"] = PredictionTable(data["predictions"])
+        return data
+
+    def _read_snapshot(self, hot=False):
+        """Архив (кроме hot) и снапшот → данные с PredictionTable
+
+        Свой формат (write_snapshot) читается построчно, и словари
+        прогнозов не живут все одновременно; чужой — целиком через json.
+        """
+        with open(self.data_file, 'rb') as f:
+            try:
+                parts = self._snapshot_parts(f)
+                data = next(parts)
+                table = self._archived(data, hot)
+                for chunk in parts:
+                    table.extend(chunk)
+            except ValueError:
+                f.seek(0)
+                try:
+                    data = json.load(f)
+                except ValueError as e:
+                    raise StorageError(f"{self.data_file} повреждён: {e}")
+                table = self._archived(data, hot)
+                table.extend(data["predictions"])
+        data["predictions"] = table
+        return data
+
+    def _archived(self, header, hot):
+        """Открыть архив по шапке снапшота → таблица с его прогнозами (пустая для hot)"""
+        self.archive.open(header.pop("archive", None))
+        table = PredictionTable()
+        if not hot:
+            for chunk in self.archive.chunks():
+                table.extend(chunk)
+        return table
+
+    @staticmethod
+    def _snapshot_parts(f, skip=0):
+        """Снапшот по строкам: шапка (без predictions), затем пачки прогнозов
+
+        Первые skip прогнозов пропускаются без разбора. ValueError, если
+        раскладка не наша — тогда снапшот читается json.load.
+        """
+        lines = iter(f)
+        if next(lines, b'') != b'{\n':
+            raise ValueError("снапшот не построчный")
+        header = {}
+        for line in lines:
+            if line == b'  "predictions": [\n':
+                break
+            if not line.endswith(b',\n'):
+                raise ValueError("снапшот не построчный")
+            header.update(json.loads(b'{' + line[:-2] + b'}'))
+        else:
+            raise ValueError("нет predictions")
+        yield header
+
+        chunk = []
+        for line in lines:
+            if line == b'  ]\n':
+                break
+            if skip:
+                skip -= 1
+                continue
+            chunk.append(line)
+            if len(chunk) == PARSE_CHUNK:
+                yield json.loads(b'[' + b''.join(chunk).rstrip(b',\n') + b']')
+                chunk = []
+        else:
+            raise ValueError("снапшот оборван")
+        if chunk:
+            yield json.loads(b'[' + b''.join(chunk).rstrip(b',\n') + b']')
+        if next(lines, b'') != b'}\n':
+            raise ValueError("снапшот оборван")
+
+    def iter_records(self):
+        """(op, прогноз) всей истории по порядку: архив и снапшот пачками, затем журнал
+
+        Для потоковой миграции — история целиком в памяти не собирается.
+        op — "append" или "resolve" (заменить прогноз с тем же id).
+        """
+        with self.transaction():
+            base_seq = 0
+            for chunk in self.archive.chunks():
+                for pred in chunk:
+                    yield "append", pred
+            if self.data_file.exists():
+                with open(self.data_file, 'rb') as f:
+                    header, parts = self._open_snapshot(f)
+                    base_seq = header.get("journal_seq", 0)
+                    for chunk in parts:
+                        for pred in chunk:
+                            yield "append", pred
+
+            for record in self._read_journal():
+                if record["seq"] > base_seq:
+                    yield record.get("op", "append"), record["prediction"]
+
+    def _open_snapshot(self, f, skip=0):
+        """(шапка, пачки прогнозов с позиции skip) открытого снапшота
+
+        Архив не переоткрывается: он уже открыт по сводке под блокировкой.
+        """
+        try:
+            parts = self._snapshot_parts(f, skip)
+            header = next(parts)
+        except ValueError:
+            f.seek(0)
+            try:
+                header = json.load(f)
+            except ValueError as e:
+                raise StorageError(f"{self.data_file} повреждён: {e}")
+            parts = iter([header.pop("predictions")[skip:]])
+        header.pop("archive", None)
+
+        def chunks():
+            try:
+                yield from parts
+            except ValueError as e:
+                raise StorageError(f"{self.data_file} повреждён: {e}")
+        return header, chunks()
+
+    def iter_chunks(self, start=0):
+        """Прогнозы с позиции start пачками, в текущем виде (с разрешениями)
+
+        Под блокировкой только открывается снапшот и читается журнал (он
+        короткий — до свёртки), дальше архив и снапшот читаются потоком:
+        запись не ждёт выгрузки, а память не зависит от длины истории.
+        """
+        snapshot = None
+        with self.transaction():
+            if self._journal is not None:
+                self._journal.flush()
+            if self.data_file.exists():
+                snapshot = open(self.data_file, 'rb')
+            journal = self._read_journal()
+            count = self.summary["count"]
+            # Сегменты неизменны: свёртка после блокировки добавит новые, но не тронет эти
+            segments, archived = list(self.archive.segments), self.archive.count
+
+        try:
+            hot_start = max(start, archived)
+            header, parts = {}, iter(())
+            if snapshot is not None:
+                header, parts = self._open_snapshot(snapshot, hot_start - archived)
+            base_seq = header.get("journal_seq", 0)
+            appended, resolved = [], {}
+            for record in journal:
+                if record["seq"] <= base_seq:
+                    continue
+                pred = record["prediction"]
+                if record.get("op") == "resolve":
+                    resolved[pred["id"]] = pred
+                else:
+                    appended.append(pred)
+
+            # Разрешение заменяет прогноз с тем же id, где бы он ни был
+            def current(chunk):
+                if resolved:
+                    chunk = [resolved.get(p.get("id"), p) for p in chunk]
+                return chunk
+
+            for chunk in self.archive.chunks(start, segments):
+                yield current(chunk)
+
+            in_snapshot = count - len(appended)
+            streamed = 0
+            if hot_start < in_snapshot:
+                for chunk in parts:
+                    streamed += len(chunk)
+                    yield current(chunk)
+            if streamed != max(in_snapshot - hot_start, 0):
+                raise StorageError(f"{self.data_file}: в снапшоте {hot_start - archived + streamed:,} "
+                                   f"прогнозов, по сводке {in_snapshot - archived:,}")
+            tail = appended[max(start - in_snapshot, 0):]
+            for i in range(0, len(tail), PARSE_CHUNK):
+                yield current(tail[i:i + PARSE_CHUNK])
+        finally:
+            if snapshot is not None:
+                snapshot.close()
+
+    def _read_journal(self, start=0):
+        """Прочитать записи журнала с offset start, отрезав оборванный хвост"""
+        if not self.journal_file.exists():
+            return []
+
+        records = []
+        good_offset = start
+        with open(self.journal_file, 'rb') as f:
+            f.seek(start)
+            for lineno, raw in enumerate(f, 1):
+                if not raw.endswith(b"\n"):
+                    break  # запись прервана на середине — её не было
+                try:
+                    records.append(json.loads(raw.decode('utf-8')))
+                except ValueError as e:
+                    raise StorageError(f"{self.journal_file}:{lineno} повреждён: {e}")
+                good_offset += len(raw)
+            size = f.seek(0, os.SEEK_END)
+
+        if size > good_offset:
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(good_offset)
+                f.flush()
+                os.fsync(f.fileno())
+
+        return records
+
+    @staticmethod
+    def _apply(data, record):
+        """Применить запись журнала к данным"""
+        if record.get("op") == "resolve":
+            data["predictions"].replace(record["prediction"])
+        else:
+            data["predictions"].append(record["prediction"])
+        data["stats"] = record["stats"]
+        if "market" in record:
+            data["market"] = record["market"]
+
+    def _fingerprint(self):
+        """Размеры/mtime файлов, по которым проверяется свежесть сводки"""
+        result = {}
+        for key, path in (("snapshot", self.data_file), ("journal", self.journal_file)):
+            try:
+                st = path.stat()
+                result[key] = [st.st_size, st.st_mtime_ns]
+            except FileNotFoundError:
+                result[key] = None
+        return result
+
+    def _read_summary(self):
+        fingerprint = self._fingerprint()
+        if fingerprint["snapshot"] is None and fingerprint["journal"] is None:
+            for aggregator in self.aggregators.values():
+                aggregator.reset()
+            self.archive.open(None)
+            self._known = fingerprint
+            return self._build_summary(self._empty_data())
+        try:
+            with open(self.summary_file, 'r', encoding='utf-8') as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if summary.pop("fingerprint", None) != fingerprint:
+            return None
+        self.archive.open(summary.pop("archive", None))
+
+        states = summary.pop("aggregates", {})
+        if any(name not in states for name in self.aggregators):
+            return None
+        for name, aggregator in self.aggregators.items():
+            if aggregator.restore(states[name]) is False:
+                return None
+        self._known = fingerprint
+        return summary
+
+    def _build_summary(self, data):
+        preds = data["predictions"]
+        return {
+            "count": len(preds),
+            # У прогнозов без id (azimuth_trader) id — позиция + 1
+            "last_id": max(max(preds.ids, default=0), len(preds)),
+            "seq": self.seq,
+            "pending": self.pending,
+            "stats": data["stats"],
+            "market": data.get("market"),
+            "recent": [dict(p) for p in preds[-RECENT_SIZE:]],
+        }
+
+    def _write_summary(self):
+        with PERF.timer("summary"):
+            self.index.flush()
+            aggregates = self._aggregate_states()  # сбрасывает файлы агрегаторов
+            self._known = self._fingerprint()
+            summary = dict(self.summary, seq=self.seq, pending=self.pending,
+                           fingerprint=self._known, archive=self.archive.state(),
+                           aggregates=aggregates)
+            # Сводка — кэш: потерянная или отставшая пересобирается по fingerprint
+            atomic_write_json(self.summary_file, summary, sync=False, indent=None)
+
+    # --- несколько писателей ---
+
+    @contextmanager
+    def transaction(self):
+        """Эксклюзивный доступ к файлам хранилища (потоки и процессы)
+
+        На входе подхватываются записи других процессов, поэтому
+        read-modify-write внутри (next_id, stats) не теряет чужих
+        обновлений. fsync журнала — групповой, после снятия блокировки.
+        """
+        unsynced = None
+        try:
+            with self._lock, self._flock:
+                outer = self._depth == 0
+                if outer:
+                    self._catch_up()
+                self._depth += 1
+                try:
+                    yield self
+                finally:
+                    self._depth -= 1
+                    if outer:
+                        unsynced, self._unsynced = self._unsynced, None
+        finally:
+            if unsynced is not None:
+                with PERF.timer("fsync"):
+                    self._group.sync(*unsynced)
+
+    def _catch_up(self):
+        """Подхватить то, что записали другие процессы (под блокировкой)"""
+        if self.summary is None or self._known is None:
+            return
+        fingerprint = self._fingerprint()
+        if fingerprint == self._known:
+            return
+
+        known = self._known
+        # Индекс мог быть заменён чужой свёрткой, журнал — обрезан
+        self.index.close()
+        if self._journal is not None:
+            self._journal.seek(0, os.SEEK_END)
+
+        tail = None
+        if self._data is not None and fingerprint["snapshot"] == known["snapshot"]:
+            start = known["journal"][0] if known["journal"] else 0
+            if fingerprint["journal"] and fingerprint["journal"][0] >= start:
+                tail = self._read_journal(start)
+
+        summary = self._read_summary()
+        if summary is None:
+            # Другой процесс упал, не дописав сводку — пересобираем по файлам
+            data = self._load_full(rebuild=True)
+            self._adopt(self._build_summary(data))
+            self._bind(data)
+            self._data = data
+            self._write_summary()
+            return
+
+        self._adopt(summary)
+        if self._data is not None:
+            if tail is None:
+                # Чужая свёртка — перечитываем историю на месте (на неё держат ссылки)
+                data = self._load_full(rebuild=False)
+                self._data.clear()
+                self._data.update(data)
+            else:
+                for record in tail:
+                    self._apply(self._data, record)
+            self._bind(self._data)
+
+    def _adopt(self, summary):
+        """Принять сводку на месте: терминал держит ссылки на summary/stats/market"""
+        current = self.summary
+        for key in ("stats", "market"):
+            old, new = current.get(key), summary.get(key)
+            if isinstance(old, dict) and isinstance(new, dict):
+                old.clear()
+                old.update(new)
+                summary[key] = old
+        current.clear()
+        current.update(summary)
+        self.seq = current["seq"]
+        self.pending = current["pending"]
+
+    def next_id(self):
+        """Следующий id прогноза: монотонный, не зависит от длины списка
+
+        Вызывать внутри transaction(), вместе с append.
+        """
+        summary = self.summary
+        return max(summary.get("last_id", 0), summary["count"]) + 1
+
+    def _aggregate_states(self):
+        return {name: aggregator.state() for name, aggregator in self.aggregators.items()}
+
+    def _open_journal(self):
+        if self._journal is None:
+            self._journal = open(self.journal_file, 'ab')
+        return self._journal
+
+    def _write_record(self, prediction, op=None):
+        """Строка журнала с прогнозом и текущими stats/market → (offset, length)"""
+        summary = self.summary
+        self.seq += 1
+        record = {"seq": self.seq, "prediction": prediction, "stats": summary["stats"]}
+        if op:
+            record["op"] = op
+        if summary.get("market") is not None:
+            record["market"] = summary["market"]
+
+        f = self._open_journal()
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+        offset = f.tell()
+        f.write(line)
+        self.pending += 1
+        return offset, len(line)
+
+    def _commit(self):
+        """Сбросить журнал и обновить сводку (или свернуть журнал)"""
+        if self._batch:
+            return  # сброс, сводка и свёртка — в конце пакета
+
+        self._open_journal().flush()
+
+        # Незагруженная история сворачивается по горячему ярусу — он ограничен hot_size
+        if self.pending >= self.compact_every:
+            self.compact()
+        else:
+            self._write_summary()
+            self._mark_unsynced()
+
+    def _mark_unsynced(self):
+        """Запомнить конец журнала для группового fsync после блокировки"""
+        if self.sync and self._journal is not None:
+            generation = self._known["snapshot"] or (0, 0)
+            self._unsynced = (generation, self._journal.tell())
+
+    def append(self, prediction):
+        """Дописать прогноз и текущую статистику (stats/market из сводки)"""
+        with self.transaction():
+            summary = self.summary
+            offset, length = self._write_record(prediction)
+            self.index.append(make_entry(prediction, summary["count"], offset, length, JOURNAL))
+
+            if self._data is not None:
+                self._data["predictions"].append(prediction)
+            for aggregator in self.aggregators.values():
+                aggregator.update(prediction)
+            summary["count"] += 1
+            if prediction.get("id", 0) > summary.get("last_id", 0):
+                summary["last_id"] = prediction["id"]
+            summary["recent"].append(prediction)
+            del summary["recent"][:-RECENT_SIZE]
+
+            self._commit()
+
+    def resolve(self, prediction):
+        """Записать разрешение ранее добавленного прогноза (ищется по id)"""
+        self.resolve_many([prediction])
+
+    def resolve_many(self, predictions):
+        """Записать разрешения пачкой: один сброс журнала и одна сводка"""
+        with self.transaction():
+            summary = self.summary
+            index = self.ensure_index()
+            located = index.lookup(pred["id"] for pred in predictions)
+            recent = {pred.get("id"): i for i, pred in enumerate(summary["recent"])}
+
+            updates = []
+            for prediction in predictions:
+                pred_id = prediction["id"]
+                offset, length = self._write_record(prediction, op="resolve")
+
+                # Индекс указывает на последнюю версию записи
+                if pred_id in located:
+                    position, entry = located[pred_id]
+                    # id, время и горизонт не меняются — без повторного разбора даты
+                    updates.append((position, entry[:2] + (offset, length, entry[4],
+                                                           prediction_status(prediction), JOURNAL)))
+
+                if self._data is not None:
+                    self._data["predictions"].replace(prediction)
+                for aggregator in self.aggregators.values():
+                    aggregator.update(prediction)
+                if pred_id in recent:
+                    summary["recent"][recent[pred_id]] = prediction
+
+            index.update(updates)
+            self._commit()
+
+    @contextmanager
+    def batch(self):
+        """Пакетная запись: журнал буферизуется, один fsync и одна сводка в конце
+
+        Блокировка держится весь пакет — другие процессы ждут его конца.
+        """
+        with self.transaction():
+            self._batch = True
+            try:
+                yield self
+            finally:
+                self._batch = False
+                if self._journal is not None:
+                    self._journal.flush()
+                if self.pending >= self.compact_every:
+                    self.compact()
+                else:
+                    self._write_summary()
+                    self._mark_unsynced()
+
+    def flush(self):
+        """Сбросить буферизованные записи журнала на диск"""
+        with self._lock:
+            self.index.flush()
+            if self._journal is not None:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+
+    def compact(self):
+        """Свернуть журнал в новый снапшот (старую историю — в архив)
+
+        Не загруженная история целиком не читается: хватает снапшота и журнала.
+        """
+        with PERF.timer("save"), self.transaction():
+            if self._data is not None:
+                self._replace_snapshot(self._data)
+            else:
+                data = self._load_full(rebuild=False, hot=True)
+                self._bind(data)
+                self._replace_snapshot(data, self.archive.count)
+
+    def repack(self, codec):
+        """Пережать архив кодеком codec → сколько сегментов пережато
+
+        Как replay --write: новое поколение архива, снапшот с ним в шапке,
+        и только потом cleanup удаляет старое. Процессы на той же
+        директории замечают смену снапшота в _catch_up.
+        """
+        with PERF.timer("save"), self.transaction():
+            if all(segment["codec"] == codec for segment in self.archive.segments):
+                return 0
+            if self._data is not None:
+                data, base = self._data, 0
+            else:
+                # Шапка снапшота открывает архив — читаем её до нового поколения
+                data = self._load_full(rebuild=False, hot=True)
+                self._bind(data)
+                base = self.archive.count
+            count = self.archive.repack(codec)
+            self._replace_snapshot(data, base)
+            return count
+
+    def rewrite(self, data):
+        """Заменить историю целиком (пересчёт azimuth_replay)
+
+        Агрегаторы и сводка пересобираются по новой истории, журнал
+        сворачивается в снапшот.
+        """
+        if not isinstance(data["predictions"], PredictionTable):
+            data["predictions"] = PredictionTable(data["predictions"])
+        with self.transaction():
+            self.load()
+            for aggregator in self.aggregators.values():
+                aggregator.reset()
+                for pred in data["predictions"].records():
+                    aggregator.update(pred)
+            self.pending = 0
+            self.summary = self._build_summary(data)
+            self._data = data
+            self.archive.reset()
+            self._replace_snapshot(data)
+
+    def rewrite_stream(self, chunks, finish):
+        """Заменить историю потоком пачек прогнозов (миграция больших файлов)
+
+        Полные сегменты уходят в архив по ходу чтения, поэтому в памяти —
+        не больше hot_size + segment_size прогнозов (колонками). finish()
+        после последней пачки возвращает остальное содержимое снапшота
+        (stats, market, ...).
+        """
+        with self.transaction():
+            for aggregator in self.aggregators.values():
+                aggregator.reset()
+            self.archive.reset()
+            table = PredictionTable()
+            last_id = 0
+            rolling = True
+            for chunk in chunks:
+                table.extend(chunk)
+                for pred in chunk:
+                    last_id = max(last_id, pred.get("id", 0))
+                    for aggregator in self.aggregators.values():
+                        aggregator.update(pred)
+                # Сегмент с неразрешённым прогнозом остаётся в снапшоте, как при свёртке
+                while rolling and len(table) >= self.hot_size + self.segment_size:
+                    resolved = table.flags["resolved"][:self.segment_size]
+                    if resolved.count(1) != self.segment_size:
+                        rolling = False
+                        break
+                    self.archive.append(table.records(0, self.segment_size))
+                    rest = PredictionTable()
+                    rest.extend(table.records(self.segment_size))
+                    table = rest
+            if self.archive.count:
+                self.archive.commit()
+
+            data = finish()
+            data["predictions"] = table
+            count = self.archive.count + len(table)
+            self.seq = 0
+            self.pending = 0
+            self.summary = {
+                "count": count,
+                "last_id": max(last_id, count),
+                "seq": 0,
+                "pending": 0,
+                "stats": data["stats"],
+                "market": data.get("market"),
+                "recent": [dict(p) for p in table[-RECENT_SIZE:]],
+            }
+            # С архивом снапшот — не вся история: загрузится при обращении
+            self._data = None
+            if not self.archive.count:
+                self._bind(data)
+                self._data = data
+            self._replace_snapshot(data, self.archive.count)
+
+    def _replace_snapshot(self, data, base=0):
+        """data — история с позиции base; снапшот — всё, что не ушло в архив"""
+        preds = data["predictions"]
+        start = self.archive.count - base
+        rolled = 0
+        # Сегмент с неразрешённым прогнозом ждёт: архив неизменяем
+        while len(preds) - start - rolled >= self.hot_size + self.segment_size:
+            segment = list(preds.records(start + rolled, start + rolled + self.segment_size))
+            if not all(pred.get("resolved") for pred in segment):
+                break
+            self.archive.append(segment)
+            rolled += self.segment_size
+        if rolled:
+            self.archive.commit()
+        self.write_snapshot(data, base)
+
+        self._close_files()
+        with open(self.journal_file, 'wb') as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending = 0
+        self._unsynced = None  # всё уже в снапшоте на диске
+        self._write_summary()
+        self.archive.cleanup()
+
+    def write_snapshot(self, data, base=0):
+        """Атомарно записать снапшот, по одному прогнозу на строку, и индекс
+
+        data["predictions"] — история с позиции base; в снапшот идёт то,
+        что после архива.
+        """
+        tmp = self.data_file.with_name(self.data_file.name + '.tmp')
+        archived = self.archive.count
+        entries = []
+        with open(tmp, 'wb') as f:
+            def write(text):
+                f.write(text.encode('utf-8'))
+
+            write('{\n')
+            for key, value in data.items():
+                if key != "predictions":
+                    write(f'  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)},\n')
+            write(f'  "aggregates": {json.dumps(self._aggregate_states(), ensure_ascii=False)},\n')
+            write(f'  "archive": {json.dumps(self.archive.state())},\n')
+            write(f'  "journal_seq": {self.seq},\n')
+            write('  "predictions": [')
+            sep = '\n'
+            preds = data["predictions"]
+            if isinstance(preds, PredictionTable):
+                preds = preds.records(archived - base)
+            else:
+                preds = preds[archived - base:]
+            for position, pred in enumerate(preds, archived):
+                write(sep)
+                line = json.dumps(pred, ensure_ascii=False).encode('utf-8')
+                entries.append(make_entry(pred, position, f.tell(), len(line), SNAPSHOT))
+                f.write(line)
+                sep = ',\n'
+            write('\n  ]\n}\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(str(tmp), str(self.data_file))
+        fsync_dir(self.data_file.parent)
+        self.index.rewrite(entries, self._fingerprint()["snapshot"])
+
+    def ensure_index(self):
+        """Перестроить индекс свёрткой, если он не сходится с файлами"""
+        with self.transaction():
+            if not self.index.valid(self.summary["count"], self._fingerprint()["snapshot"]):
+                self.compact()
+            return self.index
+
+    def read_predictions(self, entries):
+        """Прочитать только указанные записи индекса из снапшота/журнала/архива"""
+        with self.transaction():
+            if self._journal is not None:
+                self._journal.flush()
+            files = {}
+            result = []
+            try:
+                for entry in entries:
+                    offset, length, source = entry[2], entry[3], entry[6]
+                    if source == ARCHIVE:
+                        result.append(self.archive.read(offset, length))
+                        continue
+                    if source not in files:
+                        path = self.journal_file if source == JOURNAL else self.data_file
+                        files[source] = open(path, 'rb')
+                    f = files[source]
+                    f.seek(offset)
+                    record = json.loads(f.read(length).decode('utf-8'))
+                    result.append(record["prediction"] if source == JOURNAL else record)
+            finally:
+                for f in files.values():
+                    f.close()
+            return result
+
+    def get(self, pred_id):
+        """Прогноз по id или None"""
+        return self.get_many([pred_id])[0]
+
+    def get_many(self, ids):
+        """Прогнозы по списку id (None для ненайденных)
+
+        Из памяти, если история загружена, иначе только нужные записи по индексу.
+        """
+        ids = list(ids)
+        with self.transaction():
+            if self._data is not None:
+                preds = self._data["predictions"]
+                positions = [preds.position(pred_id) for pred_id in ids]
+                return [preds.record(p) if p is not None else None for p in positions]
+
+            located = self.ensure_index().lookup(ids)
+            found = sorted(located.values())  # по позиции — чтение подряд
+            records = self.read_predictions([entry for _, entry in found])
+            by_id = {entry[0]: pred for (_, entry), pred in zip(found, records)}
+            return [by_id.get(pred_id) for pred_id in ids]
+
+    def query(self, search):
+        """(найдено, прогнозы) по фильтрам parse_search
+
+        Загруженная история сканируется в памяти, иначе — потоком, и
+        сегменты архива, которые по min/max под фильтры не попадают, не
+        распаковываются.
+        """
+        with self.transaction():
+            if self._data is not None:
+                return search_predictions(self._data["predictions"].records(), search)
+            segments, archived = self.archive.select(search), self.archive.count
+
+        match = search_filter(search)
+        found = []
+        for segment in segments:
+            position = segment["start"]
+            for chunk in self.archive.chunks(segments=[segment]):
+                for pred in chunk:
+                    if match(position, pred):
+                        found.append(pred)
+                    position += 1
+        position = archived
+        for chunk in self.iter_chunks(archived):
+            for pred in chunk:
+                if match(position, pred):
+                    found.append(pred)
+                position += 1
+        return search_result(found, search)
+
+    def checkpoint(self):
+        """Записать сводку с изменениями stats/market вне append/resolve"""
+        with self.transaction():
+            if not self._batch:
+                self._write_summary()
+
+    def _close_files(self):
+        self.index.close()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def close(self):
+        """Закрыть дескрипторы журнала, индекса и блокировок"""
+        with self._lock:
+            self._close_files()
+            self._group.close()
+            self._flock.close()
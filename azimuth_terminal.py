@@ -8,12 +8,28 @@ OGLM Azimuth Trading Terminal
 Зависимости: минимальные (только stdlib)
 """
 
+import argparse
+import csv
 import json
-import os
+import random
+import shutil
 import sys
+import threading
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
-import random
+
+# Фид, рынок, оракулы и экспорт (asyncio, NumPy) импортируются в своих
+# командах и флагах — на старт терминала они не влияют
+from azimuth_analytics import CalibrationStats, calibration_report, parse_buckets, report_lines
+from azimuth_chart import CandleIndex, PriceIndex, parse_candles, render_candles, render_chart
+from azimuth_history import HistoryPager, parse_query, parse_search, search_lines
+from azimuth_render import Screen
+from azimuth_scheduler import ResolutionScheduler
+from azimuth_montecarlo import new_seed, sample_outcome, score_outcome, seeded_outcome, simulate
+from azimuth_perf import ENV as PERF_ENV, PERF
+from azimuth_stats import StreamingStats
+from azimuth_storage import StorageError, atomic_write_json, create_store
 
 
 # ANSI цвета для терминала (работают везде, включая Termux)
@@ -24,14 +40,15 @@ class Colors:
     GREEN = '\033[92m'
     YELLOW = '\033[93m'
     RED = '\033[91m'
+    MAGENTA = '\033[35m'
     ENDC = '\033[0m'
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
 
 class OGLMAzimuthTerminal:
-    def __init__(self, data_dir=None):
-        """Инициализация терминала"""
+    def __init__(self, data_dir=None, seed=None):
+        """Инициализация терминала (seed — seed сессии для воспроизводимых исходов)"""
         # Определяем директорию данных
         if data_dir:
             self.data_dir = Path(data_dir)
@@ -43,21 +60,53 @@ class OGLMAzimuthTerminal:
         self.data_dir.mkdir(parents=True, exist_ok=True)
         self.data_file = self.data_dir / "azimuth_predictions.json"
         self.config_file = self.data_dir / "config.json"
-        
-        self.predictions = self.load_data()
+        self.perf_file = self.data_dir / "azimuth_perf.prom"
         self.config = self.load_config()
+        # "storage": "sqlite" в config.json — история в SQLite (azimuth_sqlite)
+        self.store = create_store(self.data_dir, self.config.get("storage", "json"))
+        self.streaming = self.store.register("streaming", StreamingStats())
+        self.price_index = self.store.register(
+            "prices", PriceIndex(self.data_file.with_suffix('.prices')))
+        self.candles = self.store.register(
+            "candles", CandleIndex(self.data_file.with_suffix('.candles')))
+        self.scheduler = self.store.register(
+            "pending", ResolutionScheduler(self.data_file.with_suffix('.pending')))
+        # "analytics" в config.json — свои границы корзин калибровки
+        self.calibration = self.store.register(
+            "calibration", CalibrationStats(self.config.get("analytics")))
+        
+        # Сводка для header/stats, полная история — лениво
+        self.summary = self.store.open(self.create_empty_data)
         self.current_price = self.config.get("current_price", 1.0)
         self.username = self.config.get("username", "@fractal_whale")
+        self._last_id = self.store.next_id() - 1  # последний прогноз, который мы видели
+        
+        self.screen = Screen()
+        self.last_result = []
         
+        # Seed каждого прогноза берётся из генератора сессии и пишется в прогноз
+        self.seed = new_seed() if seed is None else seed
+        self.rng = random.Random(self.seed)
+        
+        # Живой фид: прогнозы ждут цену на горизонте (self.scheduler)
+        self.feed = None
+        self.lock = threading.RLock()  # тики приходят из потока фида
+        
+        # Поставщик исходов вместо локальной модели, без seed: агентный
+        # рынок (--market) или ансамбль оракулов (--oracles). Интерфейс —
+        # outcome(азимут, горизонт), status(палитра), close(), errors — исключения
+        # «исход недоступен»
+        self.outcomes = None
+        
+    @property
+    def predictions(self):
+        """Полная история (загружается при первом обращении)"""
+        return self.load_data()
+    
     def load_data(self):
-        """Загрузить историю прогнозов"""
-        if self.data_file.exists():
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return self.create_empty_data()
-        return self.create_empty_data()
+        """Загрузить историю прогнозов (снапшот + журнал)"""
+        # Повреждённый файл — ошибка, а не молчаливый сброс истории
+        return self.store.load()
     
     def create_empty_data(self):
         """Создать пустую структуру данных"""
@@ -79,9 +128,8 @@ class OGLMAzimuthTerminal:
         }
     
     def save_data(self):
-        """Сохранить данные"""
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(self.predictions, f, indent=2, ensure_ascii=False)
+        """Сохранить данные (свернуть журнал в снапшот)"""
+        self.store.compact()
     
     def load_config(self):
         """Загрузить конфигурацию"""
@@ -94,32 +142,45 @@ class OGLMAzimuthTerminal:
         return {}
     
     def save_config(self):
-        """Сохранить конфигурацию"""
-        self.config["current_price"] = self.current_price
-        self.config["username"] = self.username
-        self.config["last_session"] = datetime.now().isoformat()
-        
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            json.dump(self.config, f, indent=2, ensure_ascii=False)
+        """Сохранить конфигурацию (поверх чужих правок, под блокировкой)"""
+        with PERF.timer("config"), self.store.transaction():
+            # Другой терминал мог поменять config — перечитываем и меняем только своё
+            self.config.update(self.load_config())
+            self.config["current_price"] = self.current_price
+            self.config["username"] = self.username
+            self.config["last_session"] = datetime.now().isoformat()
+            
+            atomic_write_json(self.config_file, self.config)
     
     def clear_screen(self):
-        """Очистить экран (кроссплатформенно)"""
-        os.system('clear' if os.name != 'nt' else 'cls')
+        """Очистить экран (ANSI, без subprocess)"""
+        with PERF.timer("clear"):
+            self.screen.clear()
     
-    def print_header(self):
-        """Красивый header терминала"""
+    def header_lines(self):
+        """Header терминала без строки цены (статичная часть)"""
+        c = Colors
+        top = [
+            "",
+            f"{c.CYAN}{'='*60}{c.ENDC}",
+            f"{c.BOLD}┌─────────────────────────────────────────────────────────┐{c.ENDC}",
+            f"{c.BOLD}│  {c.GREEN}{self.username} Terminal v1.0{c.ENDC}{'                           '[:27]}│",
+            f"{c.BOLD}│  {c.BLUE}OGLM Azimuth Trading Interface{c.ENDC}{'                      '[:25]}│",
+            f"{c.BOLD}├─────────────────────────────────────────────────────────┤{c.ENDC}",
+            f"{c.BOLD}│  {c.CYAN}Connected to Протон-А Semantic Grid{c.ENDC}{'                   '[:20]}│",
+        ]
+        bottom = [
+            f"{c.BOLD}└─────────────────────────────────────────────────────────┘{c.ENDC}",
+            f"{c.CYAN}{'='*60}{c.ENDC}",
+        ]
+        return top, bottom
+    
+    def price_line(self):
+        """Строка цены в header (цвет: у ATH / у ATL / между)"""
         c = Colors
-        print(f"\n{c.CYAN}{'='*60}{c.ENDC}")
-        print(f"{c.BOLD}┌─────────────────────────────────────────────────────────┐{c.ENDC}")
-        print(f"{c.BOLD}│  {c.GREEN}{self.username} Terminal v1.0{c.ENDC}{'                           '[:27]}│")
-        print(f"{c.BOLD}│  {c.BLUE}OGLM Azimuth Trading Interface{c.ENDC}{'                      '[:25]}│")
-        print(f"{c.BOLD}├─────────────────────────────────────────────────────────┤{c.ENDC}")
-        print(f"{c.BOLD}│  {c.CYAN}Connected to Протон-А Semantic Grid{c.ENDC}{'                   '[:20]}│")
-        
-        # Цена с цветом (вверх/вниз)
         price_str = f"{self.current_price:.4f}"
-        ath = self.predictions["market"]["all_time_high"]
-        atl = self.predictions["market"]["all_time_low"]
+        ath = self.summary["market"]["all_time_high"]
+        atl = self.summary["market"]["all_time_low"]
         
         if self.current_price >= ath * 0.9:
             price_color = c.GREEN
@@ -128,31 +189,51 @@ class OGLMAzimuthTerminal:
         else:
             price_color = c.YELLOW
         
-        print(f"{c.BOLD}│  Current OGLM: {price_color}{price_str}{c.ENDC}{'                                    '[:36-len(price_str)]}│")
-        print(f"{c.BOLD}└─────────────────────────────────────────────────────────┘{c.ENDC}")
-        print(f"{c.CYAN}{'='*60}{c.ENDC}\n")
+        return f"{c.BOLD}│  Current OGLM: {price_color}{price_str}{c.ENDC}{'                                    '[:36-len(price_str)]}│"
+    
+    def print_header(self):
+        """Красивый header терминала"""
+        top, bottom = self.header_lines()
+        print("\n".join(top + [self.price_line()] + bottom) + "\n")
     
     def print_stats(self):
         """Показать статистику"""
+        print("\n".join(self.stats_lines()))
+    
+    def stats_lines(self):
+        """Полная статистика для команды stats"""
         c = Colors
-        stats = self.predictions["stats"]
+        stats = self.summary["stats"]
+        lines = []
         
-        print(f"\n{c.BOLD}📊 Статистика {self.username}:{c.ENDC}")
-        print(f"  Всего прогнозов: {c.CYAN}{stats['total']}{c.ENDC}")
+        lines.append("")
+        lines.append(f"{c.BOLD}📊 Статистика {self.username}:{c.ENDC}")
+        lines.append(f"  Всего прогнозов: {c.CYAN}{stats['total']}{c.ENDC}")
         
         if stats['total'] > 0:
             acc_color = c.GREEN if stats['accuracy'] >= 70 else c.YELLOW if stats['accuracy'] >= 50 else c.RED
-            print(f"  Правильных: {c.GREEN}{stats['correct']}{c.ENDC}/{stats['total']}")
-            print(f"  Точность: {acc_color}{stats['accuracy']:.1f}%{c.ENDC}")
+            lines.append(f"  Правильных: {c.GREEN}{stats['correct']}{c.ENDC}/{stats['total']}")
+            lines.append(f"  Точность: {acc_color}{stats['accuracy']:.1f}%{c.ENDC}")
             
             if stats.get('total_pnl'):
                 pnl_color = c.GREEN if stats['total_pnl'] > 0 else c.RED
-                print(f"  Total P&L: {pnl_color}{stats['total_pnl']:+.2f}%{c.ENDC}")
+                lines.append(f"  Total P&L: {pnl_color}{stats['total_pnl']:+.2f}%{c.ENDC}")
+        
+        # Расширенная статистика (инкрементальная, без скана истории)
+        s = self.streaming
+        if s.count > 0:
+            lines.append(f"  Ошибка: {c.CYAN}{s.error.mean:.1f}%{c.ENDC} ± {s.error.std:.1f}%"
+                         f"  (p50 {s.quantile(0.5):.1f}% · p90 {s.quantile(0.9):.1f}% · p99 {s.quantile(0.99):.1f}%)")
+            windows = " · ".join(f"{w}: {s.accuracy(w):.1f}%" for w in s.windows if s.count >= w or w == s.windows[0])
+            lines.append(f"  Точность в окне: {windows}")
+            dd_color = c.RED if s.max_drawdown < -50 else c.YELLOW
+            lines.append(f"  Max drawdown: {dd_color}{s.max_drawdown:.1f}%{c.ENDC}")
         
-        # Показать последние прогнозы
-        preds = self.predictions["predictions"]
+        # Показать последние прогнозы (хранятся в сводке)
+        preds = self.summary["recent"]
         if preds:
-            print(f"\n{c.BOLD}📈 Последние 5 прогнозов:{c.ENDC}")
+            lines.append("")
+            lines.append(f"{c.BOLD}📈 Последние 5 прогнозов:{c.ENDC}")
             for pred in preds[-5:]:
                 if pred.get("resolved"):
                     status = f"{c.GREEN}✅{c.ENDC}" if pred.get("correct") else f"{c.RED}❌{c.ENDC}"
@@ -160,58 +241,173 @@ class OGLMAzimuthTerminal:
                     actual = pred.get('actual_movement', 0)
                     error = pred.get('error', 0)
                     
-                    print(f"  {status} {pred['timestamp'][:16]}: {az:+6.1f}% → {actual:+6.1f}% (err: {error:.1f}%)")
+                    lines.append(f"  {status} {pred['timestamp'][:16]}: {az:+6.1f}% → {actual:+6.1f}% (err: {error:.1f}%)")
                 else:
-                    print(f"  {c.YELLOW}⏳{c.ENDC} {pred['timestamp'][:16]}: {pred['azimuth']:+6.1f}% (pending)")
+                    lines.append(f"  {c.YELLOW}⏳{c.ENDC} {pred['timestamp'][:16]}: {pred['azimuth']:+6.1f}% (pending)")
+        
+        return lines
     
-    def draw_price_chart(self, width=50, height=10):
-        """ASCII график цены"""
+    def brief_stats_lines(self):
+        """Статистика одной строкой для главного экрана"""
         c = Colors
-        preds = self.predictions["predictions"]
+        stats = self.summary["stats"]
+        if stats['total'] == 0:
+            return ["  📊 Прогнозов пока нет — введите первый азимут"]
         
-        if len(preds) < 2:
-            return
+        acc_color = c.GREEN if stats['accuracy'] >= 70 else c.YELLOW if stats['accuracy'] >= 50 else c.RED
+        pnl = stats.get('total_pnl', 0)
+        pnl_color = c.GREEN if pnl > 0 else c.RED
+        lines = [
+            f"  📊 Прогнозов: {c.CYAN}{stats['total']}{c.ENDC} · "
+            f"Точность: {acc_color}{stats['accuracy']:.1f}%{c.ENDC} · "
+            f"P&L: {pnl_color}{pnl:+.2f}%{c.ENDC}"
+        ]
+        if self.feed is not None:
+            lines.append(self.feed_line())
+        if self.outcomes is not None:
+            lines.append(self.outcomes.status(c))
+        return lines
+    
+    def feed_line(self):
+        """Состояние живого фида"""
+        c = Colors
+        feed = self.feed
+        line = (f"  📡 Фид: {c.CYAN}{feed.ticks:,}{c.ENDC} тиков · "
+                f"ожидают горизонта: {c.YELLOW}{len(self.scheduler)}{c.ENDC}")
+        if feed.rejected:
+            line += f" · отброшено строк: {c.YELLOW}{feed.rejected:,}{c.ENDC}"
+        if feed.error is not None:
+            state = "фид остановлен" if not feed.alive else "ошибка"
+            line += f" · {c.RED}{state}: {feed.error}{c.ENDC}"
+        return line
+    
+    def result_lines(self, prediction):
+        """Итог последнего прогноза для главного экрана"""
+        c = Colors
+        azimuth = prediction["azimuth"]
+        if not prediction.get("resolved"):
+            due = datetime.now() + timedelta(days=prediction["horizon_days"])
+            return [
+                f"  {c.YELLOW}⏳ #{prediction['id']} принят{c.ENDC}: азимут {c.CYAN}{azimuth:+.1f}%{c.ENDC}"
+                f" от {prediction['entry_price']:.4f}",
+                f"     Разрешится по цене фида ~{due.strftime('%Y-%m-%d %H:%M')}",
+            ]
+        actual = prediction["actual_movement"]
+        error = prediction["error"]
+        dark_matter = prediction["dark_matter_signal"]
         
-        print(f"\n{c.BOLD}📊 Price Chart (last {min(len(preds), width)} predictions):{c.ENDC}\n")
+        if prediction["correct"]:
+            verdict = f"{c.GREEN}{c.BOLD}✅ ТОЧНЫЙ ПРОГНОЗ!{c.ENDC}"
+        else:
+            verdict = f"{c.RED}{c.BOLD}❌ Рынок пошёл иначе{c.ENDC}"
+        actual_color = c.GREEN if actual > 0 else c.RED
         
-        # Собираем цены
-        prices = [1.0]  # Начальная цена
-        for pred in preds[-width:]:
-            if pred.get("resolved"):
-                last_price = prices[-1]
-                actual = pred.get("actual_movement", 0)
-                new_price = last_price * (1 + actual/100)
-                prices.append(new_price)
+        lines = [
+            f"  🔮 #{prediction['id']} {verdict}",
+            f"     Азимут {c.CYAN}{azimuth:+.1f}%{c.ENDC} → факт {actual_color}{actual:+.1f}%{c.ENDC}"
+            f" (ошибка {c.YELLOW}{error:.1f}%{c.ENDC})",
+            f"     💰 {prediction['entry_price']:.4f} → {prediction['exit_price']:.4f}",
+        ]
         
-        if len(prices) < 2:
-            return
+        # Анализ темной материи
+        if abs(dark_matter) > 5:
+            force = f"{c.GREEN}толкают вверх" if dark_matter > 0 else f"{c.RED}давят вниз"
+            lines.append(f"     {c.MAGENTA}🌑 Темная материя {dark_matter:+.1f}%{c.ENDC}: скрытые силы {force}{c.ENDC}")
+        return lines
+    
+    def menu_lines(self):
+        """Подсказки ввода"""
+        c = Colors
+        return [
+            "",
+            f"{c.BOLD}🎯 Введите азимут (направление движения OGLM):{c.ENDC}",
+            f"   {c.CYAN}Примеры:{c.ENDC} +50 → рост 50% · -99 → зловещая долина · +1000 → 10x · 0 → стагнация",
+            f"   {c.YELLOW}Команды:{c.ENDC} stats · chart [500 | 100-200] · perf · clear · exit",
+            "            candles [1h | 1d | 1w] [--since 2026-01-01] [--until ДАТА]",
+            "            history [500-550] [--since 2026-10-01] [--correct] [--horizon 30]",
+            "            query [--azimuth -99] [--horizon 30] [--sort -error] [--limit 20]",
+            "            export history.csv | .jsonl | .oglc [--incremental]",
+            "            analytics [--azimuth -90,-50,0,50] [--horizon 1,7,30] [--dark-matter 5,20]",
+        ]
+    
+    def draw_price_chart(self, width=None, height=10, first=None, last=None):
+        """ASCII график цены (прогнозы first..last, по умолчанию вся история)"""
+        c = Colors
+        index = self.price_index
         
-        # Масштабирование
-        min_price = min(prices)
-        max_price = max(prices)
-        price_range = max_price - min_price
+        if index.length < 2:
+            return
         
-        if price_range == 0:
-            price_range = 1
+        # Точка i — цена после прогноза #i, точка 0 — стартовая цена
+        start = max(first - 1, 0) if first else 0
+        stop = last + 1 if last else None
+        if width is None:
+            width = shutil.get_terminal_size((60, 20)).columns - 12
         
-        # Рисуем
-        for i in range(height, -1, -1):
-            level = min_price + (price_range * i / height)
-            line = f"{level:6.2f} │"
+        with PERF.timer("chart"):
+            buckets = index.downsample(max(width, 10), start, stop)
+            if len(buckets) < 2:
+                return
             
-            for price in prices:
-                if abs(price - level) < price_range / height:
-                    line += "●"
-                else:
-                    line += " "
+            lines = render_chart(buckets, height)
+            if not lines:
+                return
             
-            print(line)
+            shown = (stop or index.length) - start - 1
+            print(f"\n{c.BOLD}📊 Price Chart ({shown} predictions, {len(buckets)} columns):{c.ENDC}\n")
+            for line in lines:
+                print(line)
+            indent = " " * (lines[-1].index("└") + 1)
+            print(f"{indent}{c.CYAN}Time →{c.ENDC}")
+    
+    def candles_command(self, args, height=10):
+        """candles [1h|1d|1w] [--since ДАТА] [--until ДАТА] — свечи из пирамиды"""
+        c = Colors
+        try:
+            resolution, since, until = parse_candles(args)
+        except ValueError as e:
+            print(f"{c.RED}❌ candles: {e}{c.ENDC}")
+            return
+        width = max(shutil.get_terminal_size((60, 20)).columns - 12, 10)
+        store = self.store
+
+        def chunks():
+            # Пересчёт после потерянного хвоста журнала — как у analytics
+            return [store.data["predictions"]] if store.loaded else store.iter_chunks()
+
+        with PERF.timer("candles"), self.lock:
+            level, candles = self.candles.select(resolution, since, until, width, chunks)
+        if not candles:
+            print(f"{c.YELLOW}   Свечей {level.name} за этот период нет{c.ENDC}")
+            return
         
-        # Ось X
-        print("       └" + "─" * len(prices))
-        print(f"        {c.CYAN}Time →{c.ENDC}")
+        first = self.candles.label(level, candles[0][0])
+        last = self.candles.label(level, candles[-1][0])
+        print(f"\n{c.BOLD}🕯️  Свечи {level.name}: {len(candles)} шт., {first} → {last}{c.ENDC}\n")
+        lines = render_candles(candles, height)
+        for line in lines:
+            print(line)
+        _, open_, high, low, close, ticks = candles[-1]
+        color = c.GREEN if close >= open_ else c.RED
+        indent = " " * (lines[-1].index("└") + 1)
+        print(f"{indent}{c.CYAN}Time →{c.ENDC}  последняя: O {open_:.4f} H {high:.4f} "
+              f"L {low:.4f} {color}C {close:.4f}{c.ENDC} ({ticks} тиков)")
     
-    def calculate_outcome(self, azimuth, days=7):
+    def parse_chart_range(self, command):
+        """'chart', 'chart 500' (последние 500), 'chart 100-200' → first/last"""
+        args = command.split()[1:]
+        if not args:
+            return {}
+        try:
+            if '-' in args[0]:
+                first, last = args[0].split('-', 1)
+                return {"first": int(first), "last": int(last)}
+            count = int(args[0])
+        except ValueError:
+            return {}
+        return {"first": max(self.price_index.length - count, 1)}
+    
+    def calculate_outcome(self, azimuth, days=7, seed=None):
         """
         Симуляция рыночного движения
         
@@ -220,47 +416,144 @@ class OGLMAzimuthTerminal:
         - Темная материя (скрытые силы)
         - Фрактальная волатильность
         - Временной горизонт
-        """
-        # Базовый шум рынка
-        market_noise = random.uniform(-15, 15)
         
-        # Темная материя (коллективное бессознательное)
-        dark_matter = random.gauss(0, 8)
-        
-        # Фрактальная сложность (большие движения сложнее)
-        difficulty = min(abs(azimuth) / 100, 1.0)
-        accuracy_modifier = 1.0 - (difficulty * 0.4)
-        
-        # Временной фактор (чем дальше, тем больше неопределённость)
-        time_factor = 1.0 + (days / 30) * 0.2
-        
-        # Итоговое движение
-        actual = (azimuth * accuracy_modifier + market_noise + dark_matter) * time_factor
-        
-        # Ограничиваем экстремальные движения
-        actual = max(min(actual, 1000), -99.9)
+        Модель и её параметры — в azimuth_montecarlo. С seed исход
+        воспроизводим (azimuth_replay пересчитывает его по записанному seed).
+        """
+        if seed is None:
+            return sample_outcome(azimuth, days)
+        return seeded_outcome(azimuth, days, seed)
+    
+    def print_forecast(self, azimuth, days):
+        """Распределение исходов по Монте-Карло до отправки прогноза"""
+        c = Colors
+        with PERF.timer("simulate"):
+            dist = simulate(azimuth, days)
+        q = dist.quantiles
         
-        return actual, dark_matter
+        hit = dist.hit_probability * 100
+        hit_color = c.GREEN if hit >= 50 else c.YELLOW if hit >= 20 else c.RED
+        print(f"\n{c.BOLD}🎲 Прогноз Протон-А ({dist.samples:,} траекторий):{c.ENDC}")
+        print(f"   Вероятность точного прогноза: {hit_color}{hit:.1f}%{c.ENDC}")
+        print(f"   Медиана движения: {q[0.5]:+.1f}% (50%: {q[0.25]:+.1f}..{q[0.75]:+.1f}, 90%: {q[0.05]:+.1f}..{q[0.95]:+.1f})")
+        print(f"   Ожидаемый P&L: {dist.expected_pnl:+.2f}%")
+    
+    def ask(self, prompt):
+        """input() с замером ожидания пользователя"""
+        with PERF.timer("input"):
+            return input(prompt)
+    
+    def pause(self):
+        """Ждать Enter после вывода команды; следующий кадр — целиком"""
+        try:
+            self.ask(f"\n{Colors.YELLOW}[Enter для продолжения]{Colors.ENDC}")
+        except (EOFError, KeyboardInterrupt):
+            pass
+        self.screen.invalidate()
+    
+    def query_command(self, args):
+        """query [фильтры history] [--azimuth A | A:B] [--sort [-]поле] [--limit N]"""
+        c = Colors
+        try:
+            search = parse_search(args)
+        except ValueError as e:
+            print(f"{c.RED}❌ query: {e}{c.ENDC}")
+            return
+        with PERF.timer("query"):
+            total, preds = self.store.query(search)
+        print(f"\n{c.BOLD}🔎 Запрос:{c.ENDC} {' '.join(args) or 'вся история'}\n")
+        print("\n".join(search_lines(total, preds)))
+    
+    def export_command(self, args):
+        """export FILE [--incremental] — формат по расширению: csv, jsonl, oglc"""
+        c = Colors
+        incremental = "--incremental" in args
+        paths = [arg for arg in args if arg != "--incremental"]
+        fmt = Path(paths[0]).suffix.lstrip('.').lower() if len(paths) == 1 else None
+        from azimuth_export import FORMATS, export_history
+        if fmt not in FORMATS:
+            print(f"{c.RED}❌ export: FILE.csv | FILE.jsonl | FILE.oglc [--incremental]{c.ENDC}")
+            return
+        path = Path(paths[0]).expanduser()
+        try:
+            with PERF.timer("export"):
+                start, count, restarted = export_history(self.store, self.data_dir, fmt,
+                                                         path, incremental)
+        except (OSError, StorageError) as e:
+            print(f"{c.RED}❌ export: {e}{c.ENDC}")
+            return
+        since = f" с #{start + 1:,}" if start else ""
+        if restarted:
+            since = " (история переписана после прошлой выгрузки — целиком)"
+        print(f"{c.GREEN}   💾 Выгружено {count:,} прогнозов{since} → {path}{c.ENDC}")
+    
+    def analytics_command(self, args):
+        """analytics [--azimuth | --horizon | --dark-matter | --reliability ГРАНИЦЫ]"""
+        c = Colors
+        try:
+            buckets = parse_buckets(args)
+        except ValueError as e:
+            print(f"{c.RED}❌ analytics: {e}{c.ENDC}")
+            return
+        store = self.store
+
+        def chunks():
+            # Загруженная история — из памяти, иначе потоком (архив целиком не грузится)
+            return [store.data["predictions"]] if store.loaded else store.iter_chunks()
+
+        with PERF.timer("analytics"), self.lock:
+            tables = calibration_report(self.calibration, chunks, buckets)
+        count = tables["azimuth"].count
+        if not count:
+            print(f"{c.YELLOW}   Разрешённых прогнозов пока нет{c.ENDC}")
+            return
+        print(f"\n{c.BOLD}📐 Калибровка по {count:,} разрешённым прогнозам{c.ENDC}")
+        print("   ошибка± — средняя (факт − азимут): плюс — рынок шёл выше прогноза")
+        print("\n".join(report_lines(tables)))
+    
+    def perf_command(self, args):
+        """perf [on | off | reset | dump [FILE]] — замеры горячих участков"""
+        c = Colors
+        action = args[0].lower() if args else ""
+        if action in ("on", "off"):
+            PERF.enabled = action == "on"
+            print(f"{c.CYAN}   Замеры {'включены' if PERF.enabled else 'выключены'}{c.ENDC}")
+        elif action == "reset":
+            PERF.reset()
+            print(f"{c.CYAN}   Замеры сброшены{c.ENDC}")
+        elif action == "dump":
+            path = PERF.dump(args[1] if len(args) > 1 else self.perf_file)
+            print(f"{c.GREEN}   Prometheus → {path}{c.ENDC}")
+        elif action:
+            print(f"{c.RED}❌ perf: on | off | reset | dump [FILE]{c.ENDC}")
+        elif not PERF.histograms:
+            print(f"{c.YELLOW}   Замеров нет. Включите: perf on, флаг --perf или {PERF_ENV}=1{c.ENDC}")
+        else:
+            uptime = time.time() - PERF.started
+            state = "" if PERF.enabled else " (выключено)"
+            print(f"\n{c.BOLD}⏱️  Perf за {uptime:.0f}s{state}:{c.ENDC}\n")
+            print("\n".join(PERF.report_lines()))
+    
+    def render_frame(self):
+        """Главный экран одним кадром: перерисовываются только изменения"""
+        with PERF.timer("render"):
+            top, bottom = self.header_lines()
+            self.screen.region("header", top)
+            self.screen.region("price", [self.price_line()])
+            self.screen.region("header_bottom", bottom)
+            self.screen.region("stats", self.brief_stats_lines())
+            # Регион результата фиксированной высоты, чтобы геометрия не прыгала
+            result = self.last_result + [""] * (4 - len(self.last_result))
+            self.screen.region("result", result)
+            self.screen.region("menu", self.menu_lines())
+            self.screen.render()
     
     def enter_prediction(self):
         """Ввод нового прогноза"""
         c = Colors
         
-        print(f"\n{c.BOLD}🎯 Введите азимут (направление движения OGLM):{c.ENDC}")
-        print(f"\n   {c.CYAN}Примеры:{c.ENDC}")
-        print("   • +50    → рост на 50%")
-        print("   • -99    → падение на 99% (зловещая долина)")
-        print("   • +1000  → 10x рост")
-        print("   • 0      → стагнация")
-        print(f"\n   {c.YELLOW}Команды:{c.ENDC}")
-        print("   • 'stats'   → статистика")
-        print("   • 'chart'   → график цены")
-        print("   • 'history' → полная история")
-        print("   • 'clear'   → очистить экран")
-        print("   • 'exit'    → выход")
-        
         try:
-            azimuth_input = input(f"\n{c.BOLD}Азимут: {c.ENDC}").strip()
+            azimuth_input = self.ask(f"{c.BOLD}Азимут: {c.ENDC}").strip()
         except (EOFError, KeyboardInterrupt):
             return False
         
@@ -269,15 +562,35 @@ class OGLMAzimuthTerminal:
             return False
         elif azimuth_input.lower() == 'stats':
             self.print_stats()
-            input(f"\n{c.YELLOW}[Enter для продолжения]{c.ENDC}")
+            self.pause()
             return True
-        elif azimuth_input.lower() == 'chart':
-            self.draw_price_chart()
-            input(f"\n{c.YELLOW}[Enter для продолжения]{c.ENDC}")
+        elif azimuth_input.lower().split()[:1] == ['chart']:
+            self.draw_price_chart(**self.parse_chart_range(azimuth_input))
+            self.pause()
             return True
-        elif azimuth_input.lower() == 'history':
-            self.show_full_history()
-            input(f"\n{c.YELLOW}[Enter для продолжения]{c.ENDC}")
+        elif azimuth_input.lower().split()[:1] == ['candles']:
+            self.candles_command(azimuth_input.split()[1:])
+            self.pause()
+            return True
+        elif azimuth_input.lower().split()[:1] == ['history']:
+            self.show_full_history(azimuth_input.split()[1:])
+            self.screen.invalidate()
+            return True
+        elif azimuth_input.lower().split()[:1] == ['query']:
+            self.query_command(azimuth_input.split()[1:])
+            self.pause()
+            return True
+        elif azimuth_input.lower().split()[:1] == ['export']:
+            self.export_command(azimuth_input.split()[1:])
+            self.pause()
+            return True
+        elif azimuth_input.lower().split()[:1] == ['analytics']:
+            self.analytics_command(azimuth_input.split()[1:])
+            self.pause()
+            return True
+        elif azimuth_input.lower().split()[:1] == ['perf']:
+            self.perf_command(azimuth_input.split()[1:])
+            self.pause()
             return True
         elif azimuth_input.lower() == 'clear':
             self.clear_screen()
@@ -288,14 +601,14 @@ class OGLMAzimuthTerminal:
             azimuth = float(azimuth_input)
         except ValueError:
             print(f"{c.RED}❌ Ошибка: Введите число{c.ENDC}")
-            input(f"\n{c.YELLOW}[Enter для продолжения]{c.ENDC}")
+            self.pause()
             return True
         
         # Валидация
         if abs(azimuth) > 10000:
             print(f"{c.YELLOW}⚠️  Азимут > 10000% экстремален{c.ENDC}")
             try:
-                confirm = input("   Продолжить? (y/n): ")
+                confirm = self.ask("   Продолжить? (y/n): ")
                 if confirm.lower() != 'y':
                     return True
             except (EOFError, KeyboardInterrupt):
@@ -303,155 +616,279 @@ class OGLMAzimuthTerminal:
         
         # Reasoning
         try:
-            note = input(f"\n{c.CYAN}💭 Reasoning (опционально): {c.ENDC}").strip()
+            note = self.ask(f"\n{c.CYAN}💭 Reasoning (опционально): {c.ENDC}").strip()
         except (EOFError, KeyboardInterrupt):
             note = ""
         
         # Временной горизонт
         try:
-            horizon_input = input(f"{c.CYAN}⏱️  Горизонт в днях (default: 7): {c.ENDC}").strip()
+            horizon_input = self.ask(f"{c.CYAN}⏱️  Горизонт в днях (default: 7): {c.ENDC}").strip()
             horizon = int(horizon_input) if horizon_input else 7
         except (ValueError, EOFError, KeyboardInterrupt):
             horizon = 7
         
-        # Создаём прогноз
-        prediction = {
-            "id": len(self.predictions["predictions"]) + 1,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "azimuth": azimuth,
-            "note": note,
-            "horizon_days": horizon,
-            "entry_price": self.current_price,
-            "target_price": self.current_price * (1 + azimuth/100),
-            "resolved": False,
-            "correct": None
-        }
+        # Вероятность успеха до отправки
+        self.print_forecast(azimuth, horizon)
+        try:
+            confirm = self.ask(f"\n{c.CYAN}   Отправить прогноз? (Y/n): {c.ENDC}").strip()
+            if confirm.lower() == 'n':
+                return True
+        except (EOFError, KeyboardInterrupt):
+            return True
         
-        # Симуляция
-        print(f"\n{c.CYAN}🔮 Протон-А анализирует...{c.ENDC}")
-        print("   • Фрактальная декомпозиция...")
-        print("   • Детекция темной материи...")
-        print("   • Квантовый расчёт...")
-        
-        actual, dark_matter = self.calculate_outcome(azimuth, horizon)
-        prediction["actual_movement"] = actual
-        prediction["dark_matter_signal"] = dark_matter
-        
-        # Обновляем цену
-        new_price = self.current_price * (1 + actual/100)
-        prediction["exit_price"] = new_price
-        
-        # Оценка точности
-        tolerance = 20  # ±20%
-        error = abs(actual - azimuth)
-        correct = error <= tolerance
-        
-        prediction["resolved"] = True
-        prediction["correct"] = correct
-        prediction["error"] = error
-        prediction["pnl"] = actual  # Упрощённо: P&L = движение цены
-        
-        # Обновляем статистику
-        self.predictions["predictions"].append(prediction)
-        stats = self.predictions["stats"]
-        stats["total"] += 1
-        if correct:
-            stats["correct"] += 1
+        # Симуляция; результат покажет следующий кадр
+        prediction = self.record_prediction(azimuth, note, horizon)
+        self.save_config()
+        self.last_result = self.result_lines(prediction)
+        return True
+    
+    def record_prediction(self, azimuth, note="", horizon=7, outcome=None, seed=None):
+        """Создать прогноз и записать; без фида — сразу разрешить симуляцией
+
+        outcome — готовый исход (движение, темная материя), например от
+        общего рынка сервера, seed — из чего он получен; по умолчанию —
+        calculate_outcome с новым seed из генератора сессии, с поставщиком
+        исходов (--market, --oracles) — его исход (seed тогда не пишется:
+        replay берёт исход как записанный). Ошибки outcomes.errors
+        (OracleError — кворум оракулов не собран) — прогноз не создан.
+        """
+        if outcome is None and self.outcomes is not None and self.feed is None:
+            # Симуляция рынка или запрос оракулам — вне транзакции, хранилище не ждёт
+            outcome = self.outcomes.outcome(azimuth, horizon)
+        with self.lock, self.store.transaction():
+            if self.feed is None:
+                self.follow_price()
+            
+            # Создаём прогноз (id — из хранилища, уникален между терминалами)
+            prediction = {
+                "id": self.store.next_id(),
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "azimuth": azimuth,
+                "note": note,
+                "horizon_days": horizon,
+                "entry_price": self.current_price,
+                "target_price": self.current_price * (1 + azimuth/100),
+                "resolved": False,
+                "correct": None
+            }
+            
+            self._last_id = prediction["id"]
+            PERF.count("predictions")
+            if self.feed is not None:
+                # Живой рынок: прогноз ждёт цену на горизонте в планировщике
+                self.store.append(prediction)
+                return prediction
+            
+            # Симуляция (seed — в прогноз, чтобы replay мог её повторить)
+            if outcome is None:
+                if seed is None:
+                    seed = new_seed(self.rng)
+                outcome = self.calculate_outcome(azimuth, horizon, seed)
+            if seed is not None:
+                prediction["seed"] = seed
+            actual, dark_matter = outcome
+            new_price = self.current_price * (1 + actual/100)
+            self.score_prediction(prediction, new_price, actual, dark_matter)
+            self.update_stats([prediction])
+            self.update_market(new_price, new_price)
+            
+            self.current_price = new_price
+            self.store.append(prediction)
+            
+            # Новая цена — разрешаем наступившие сроки прошлых прогнозов
+            self.resolve_due([(time.time(), new_price)])
+            return prediction
+    
+    def follow_price(self):
+        """Подхватить цену после прогнозов другого терминала на той же директории"""
+        last_id = self.store.next_id() - 1
+        if last_id != self._last_id and self.summary["recent"]:
+            latest = self.summary["recent"][-1]
+            self.current_price = latest.get("exit_price") or latest.get("entry_price", self.current_price)
+        self._last_id = last_id
+    
+    def score_prediction(self, prediction, exit_price, actual, dark_matter):
+        """Разрешить прогноз по цене выхода (статистика — в update_stats)"""
+        # Оценка точности ±20% — общая с azimuth_replay
+        score_outcome(prediction, exit_price, actual, dark_matter)
+    
+    def update_stats(self, predictions):
+        """Учесть пачку разрешённых прогнозов в stats (один раз на пачку)"""
+        stats = self.summary["stats"]
+        stats["total"] += len(predictions)
+        stats["correct"] += sum(1 for p in predictions if p["correct"])
         stats["accuracy"] = (stats["correct"] / stats["total"]) * 100
-        stats["total_pnl"] = stats.get("total_pnl", 0) + actual
+        stats["total_pnl"] = stats.get("total_pnl", 0) + sum(p["pnl"] for p in predictions)
         
         # Обновляем best/worst
-        if not stats.get("best_prediction") or error < stats["best_prediction"]["error"]:
-            stats["best_prediction"] = {"id": prediction["id"], "error": error}
-        if not stats.get("worst_prediction") or error > stats["worst_prediction"]["error"]:
-            stats["worst_prediction"] = {"id": prediction["id"], "error": error}
-        
-        # Обновляем рынок
-        market = self.predictions["market"]
-        if new_price > market["all_time_high"]:
-            market["all_time_high"] = new_price
-        if new_price < market["all_time_low"]:
-            market["all_time_low"] = new_price
+        best = min(predictions, key=lambda p: p["error"])
+        worst = max(predictions, key=lambda p: p["error"])
+        if not stats.get("best_prediction") or best["error"] < stats["best_prediction"]["error"]:
+            stats["best_prediction"] = {"id": best["id"], "error": best["error"]}
+        if not stats.get("worst_prediction") or worst["error"] > stats["worst_prediction"]["error"]:
+            stats["worst_prediction"] = {"id": worst["id"], "error": worst["error"]}
+    
+    def update_market(self, low, high):
+        """Обновить ATH/ATL рынка"""
+        market = self.summary["market"]
+        if high > market["all_time_high"]:
+            market["all_time_high"] = high
+        if low < market["all_time_low"]:
+            market["all_time_low"] = low
         market["last_updated"] = datetime.now().isoformat()
-        
-        self.current_price = new_price
-        self.save_data()
-        self.save_config()
-        
-        # Показываем результат
-        print(f"\n{c.CYAN}{'='*60}{c.ENDC}")
-        
-        if correct:
-            print(f"{c.GREEN}{c.BOLD}✅ ТОЧНЫЙ ПРОГНОЗ!{c.ENDC}")
-        else:
-            print(f"{c.RED}{c.BOLD}❌ Рынок пошёл иначе{c.ENDC}")
-        
-        print(f"\n{c.BOLD}📊 Результат:{c.ENDC}")
-        print(f"   Ваш азимут: {c.CYAN}{azimuth:+.1f}%{c.ENDC}")
-        
-        actual_color = c.GREEN if actual > 0 else c.RED
-        print(f"   Фактически: {actual_color}{actual:+.1f}%{c.ENDC}")
-        print(f"   Ошибка: {c.YELLOW}{error:.1f}%{c.ENDC}")
-        
-        print(f"\n{c.BOLD}💰 Цена:{c.ENDC}")
-        print(f"   {self.current_price / (1 + actual/100):.4f} → {self.current_price:.4f}")
-        
-        # Анализ темной материи
-        if abs(dark_matter) > 5:
-            print(f"\n{c.MAGENTA}🌑 Темная материя детектирована: {dark_matter:+.1f}%{c.ENDC}")
-            if dark_matter > 0:
-                print(f"   {c.GREEN}→ Скрытые силы толкают вверх{c.ENDC}")
-            else:
-                print(f"   {c.RED}→ Скрытые силы давят вниз{c.ENDC}")
-        
-        print(f"{c.CYAN}{'='*60}{c.ENDC}")
-        
-        input(f"\n{c.YELLOW}[Enter для следующего прогноза]{c.ENDC}")
-        return True
     
-    def show_full_history(self):
-        """Показать полную историю"""
+    # --- живой фид ---
+    
+    def start_feed(self, spec):
+        """Подключить фид цены; ValueError, если источник не разобрать"""
+        from azimuth_feed import PriceFeed, parse_source
+        self.feed = PriceFeed(parse_source(spec), self.on_ticks).start()
+    
+    def stop_feed(self):
+        if self.feed is not None:
+            self.feed.stop()
+            with self.lock:
+                self.save_config()
+                self.store.checkpoint()  # ATH/ATL от тиков — в сводку
+    
+    def on_ticks(self, ticks):
+        """Пачка тиков (поток фида): цена, ATH/ATL, наступившие сроки"""
+        PERF.count("ticks", len(ticks))
+        with self.lock, self.store.transaction():
+            prices = [price for _, price in ticks]
+            self.current_price = prices[-1]
+            self.update_market(min(prices), max(prices))
+            self.resolve_due(ticks)
+    
+    def resolve_due(self, ticks):
+        """Разрешить все прогнозы, чей срок наступил, одной пачкой
+
+        Прогноз получает цену первого тика после своего срока.
+        """
+        next_due = self.scheduler.next_due()
+        if next_due is None or next_due > ticks[-1][0]:
+            return
+        with PERF.timer("resolve"):
+            due = []
+            for ts, price in ticks:
+                due.extend((pred_id, price) for pred_id in self.scheduler.pop_due(ts))
+            try:
+                resolved = self.resolve_popped(due)
+            except BaseException:
+                # Снятые с кучи сроки не должны пропасть до перезапуска
+                self.scheduler.requeue()
+                raise
+            if not resolved:
+                return
+        PERF.count("resolved", len(resolved))
+        self.last_result = self.result_lines(resolved[-1])
+    
+    def resolve_popped(self, due):
+        """Разрешить снятые с очереди [(id, цена выхода)] → разрешённые прогнозы"""
+        predictions = self.store.get_many(pred_id for pred_id, _ in due)
+        resolved = []
+        for (pred_id, exit_price), prediction in zip(due, predictions):
+            if prediction is None or prediction.get("resolved"):
+                self.scheduler.discard(pred_id)
+                continue
+            prediction = dict(prediction)
+            actual = (exit_price / prediction["entry_price"] - 1) * 100
+            # Темная материя живого рынка — всё, что азимут не объяснил
+            self.score_prediction(prediction, exit_price, actual, actual - prediction["azimuth"])
+            resolved.append(prediction)
+        if resolved:
+            self.update_stats(resolved)
+            self.store.resolve_many(resolved)
+        return resolved
+    
+    def show_full_history(self, args=()):
+        """Постраничная история: history [500-550] [--since ДАТА] [--correct] ..."""
         c = Colors
-        print(f"\n{c.BOLD}📜 Полная история прогнозов:{c.ENDC}\n")
         
-        if not self.predictions["predictions"]:
+        if self.summary["count"] == 0:
             print(f"{c.YELLOW}  История пуста. Сделайте первый прогноз!{c.ENDC}")
             return
         
-        for pred in self.predictions["predictions"]:
-            status = f"{c.GREEN}✅{c.ENDC}" if pred.get("correct") else f"{c.YELLOW}⏳{c.ENDC}" if not pred.get("resolved") else f"{c.RED}❌{c.ENDC}"
-            
-            print(f"{status} #{pred['id']} {c.CYAN}{pred['timestamp']}{c.ENDC}")
-            print(f"   Азимут: {c.BOLD}{pred['azimuth']:+.1f}%{c.ENDC}")
-            
-            if pred.get("resolved"):
-                actual_color = c.GREEN if pred.get('actual_movement', 0) > 0 else c.RED
-                print(f"   Факт: {actual_color}{pred.get('actual_movement', 0):+.1f}%{c.ENDC}")
-                print(f"   Ошибка: {c.YELLOW}{pred.get('error', 0):.1f}%{c.ENDC}")
-                print(f"   Цена: {pred.get('entry_price', 1):.4f} → {pred.get('exit_price', 1):.4f}")
+        try:
+            pager = HistoryPager(self.store, parse_query(args))
+        except ValueError as e:
+            print(f"{c.RED}❌ history: {e}{c.ENDC}")
+            return
+        
+        with PERF.timer("history"):
+            records = pager.first()
+        while True:
+            print(f"\n{c.BOLD}📜 История прогнозов ({pager.position()}):{c.ENDC}\n")
+            if not records:
+                print(f"{c.YELLOW}  Нет прогнозов под этот фильтр{c.ENDC}")
+                return
             
-            if pred.get("note"):
-                print(f"   {c.CYAN}💭 {pred['note']}{c.ENDC}")
+            for pred in records:
+                self.print_prediction(pred)
             
-            print()
+            try:
+                key = self.ask(f"{c.YELLOW}[p — раньше, n — позже, Enter — выход]{c.ENDC} ").strip().lower()
+            except (EOFError, KeyboardInterrupt):
+                return
+            if key not in ('p', 'n'):
+                return
+            with PERF.timer("history"):
+                records = pager.older() if key == 'p' else pager.newer()
     
-    def run(self):
-        """Главный цикл терминала"""
-        self.clear_screen()
-        self.print_header()
-        self.print_stats()
+    def print_prediction(self, pred):
+        """Один прогноз в истории"""
+        c = Colors
+        status = f"{c.GREEN}✅{c.ENDC}" if pred.get("correct") else f"{c.YELLOW}⏳{c.ENDC}" if not pred.get("resolved") else f"{c.RED}❌{c.ENDC}"
+        
+        print(f"{status} #{pred['id']} {c.CYAN}{pred['timestamp']}{c.ENDC}")
+        print(f"   Азимут: {c.BOLD}{pred['azimuth']:+.1f}%{c.ENDC}")
+        
+        if pred.get("resolved"):
+            actual_color = c.GREEN if pred.get('actual_movement', 0) > 0 else c.RED
+            print(f"   Факт: {actual_color}{pred.get('actual_movement', 0):+.1f}%{c.ENDC}")
+            print(f"   Ошибка: {c.YELLOW}{pred.get('error', 0):.1f}%{c.ENDC}")
+            print(f"   Цена: {pred.get('entry_price', 1):.4f} → {pred.get('exit_price', 1):.4f}")
+        
+        if pred.get("note"):
+            print(f"   {c.CYAN}💭 {pred['note']}{c.ENDC}")
         
+        print()
+    
+    def run(self, feed=None):
+        """Главный цикл терминала (feed — источник живой цены)"""
         c = Colors
-        print(f"\n{c.GREEN}🌊 Добро пожаловать, {self.username}!{c.ENDC}")
-        print(f"{c.CYAN}   Вы единственный трейдер на этой паре.{c.ENDC}")
-        print(f"{c.CYAN}   Введите азимут для прогноза траектории OGLM.{c.ENDC}\n")
+        if feed:
+            try:
+                self.start_feed(feed)
+            except ValueError as e:
+                print(f"{c.RED}❌ Фид: {e}{c.ENDC}")
+                return
+        top, bottom = self.header_lines()
+        
+        # Приветствие — тоже один кадр
+        self.screen.region("header", top)
+        self.screen.region("price", [self.price_line()])
+        self.screen.region("header_bottom", bottom)
+        self.screen.region("stats", self.stats_lines())
+        self.screen.region("result", [
+            "",
+            f"{c.GREEN}🌊 Добро пожаловать, {self.username}!{c.ENDC}",
+            f"{c.CYAN}   Вы единственный трейдер на этой паре.{c.ENDC}",
+            f"{c.CYAN}   Введите азимут для прогноза траектории OGLM.{c.ENDC}",
+            "",
+        ])
+        self.screen.invalidate()
+        self.screen.render()
         
-        input(f"{c.YELLOW}[Enter для начала]{c.ENDC}")
+        # Полная история нужна только для history/chart — грузим в фоне
+        self.store.load_in_background()
+        
+        self.ask(f"{c.YELLOW}[Enter для начала]{c.ENDC}")
+        self.screen.invalidate()
         
         while True:
             try:
-                self.clear_screen()
-                self.print_header()
+                self.render_frame()
                 
                 if not self.enter_prediction():
                     break
@@ -463,22 +900,138 @@ class OGLMAzimuthTerminal:
             except Exception as e:
                 print(f"\n{c.RED}❌ Ошибка: {e}{c.ENDC}")
                 print(f"{c.YELLOW}   Попробуйте снова.{c.ENDC}")
-                input(f"\n{c.YELLOW}[Enter для продолжения]{c.ENDC}")
+                self.pause()
+        
+        self.stop_feed()
+        self.store.close()
+
+
+def parse_batch_line(line):
+    """Строка пакета → (азимут, горизонт, заметка); JSONL или CSV"""
+    line = line.strip()
+    if line.startswith('{'):
+        record = json.loads(line)
+        azimuth = record["azimuth"]
+        horizon = record.get("horizon", record.get("horizon_days"))
+        note = record.get("note", "")
+    else:
+        fields = next(csv.reader([line]))
+        azimuth = fields[0]
+        horizon = fields[1] if len(fields) > 1 else None
+        note = ",".join(fields[2:])
+    
+    horizon = int(horizon) if horizon not in (None, "") else 7
+    return float(azimuth), horizon, (note or "").strip()
+
+
+def run_batch(terminal, stream, out=sys.stdout):
+    """Прогнать поток прогнозов без промптов и ANSI, итог — одной сводкой"""
+    started = time.perf_counter()
+    processed = skipped = correct = 0
+    pnl = 0.0
+    start_price = terminal.current_price
+    # Исход недоступен (кворум оракулов не собран) — строка пропускается
+    unavailable = terminal.outcomes.errors if terminal.outcomes is not None else ()
+    
+    with terminal.store.batch():
+        for lineno, line in enumerate(stream, 1):
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            try:
+                azimuth, horizon, note = parse_batch_line(line)
+            except (ValueError, KeyError, IndexError, StopIteration) as e:
+                # Строку заголовка CSV пропускаем молча
+                if lineno > 1 or not line.lower().startswith("azimuth"):
+                    print(f"  строка {lineno}: пропущена ({e})", file=sys.stderr)
+                    skipped += 1
+                continue
+            
+            try:
+                prediction = terminal.record_prediction(azimuth, note, horizon)
+            except unavailable as e:
+                print(f"  строка {lineno}: пропущена ({e})", file=sys.stderr)
+                skipped += 1
+                continue
+            processed += 1
+            correct += prediction["correct"]
+            pnl += prediction["pnl"]
+    
+    terminal.save_config()
+    elapsed = time.perf_counter() - started
+    
+    stats = terminal.summary["stats"]
+    accuracy = correct / processed * 100 if processed else 0.0
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"Batch: {processed} прогнозов, пропущено {skipped}, {elapsed:.2f}s ({rate:,.0f}/s)", file=out)
+    print(f"  Точность пакета: {correct}/{processed} ({accuracy:.1f}%)", file=out)
+    print(f"  P&L пакета: {pnl:+.2f}%", file=out)
+    print(f"  Цена: {start_price:.4f} → {terminal.current_price:.4f}", file=out)
+    print(f"  Всего в истории: {stats['total']}, точность {stats['accuracy']:.1f}%", file=out)
 
 
 def main():
     """Entry point"""
     # Проверяем аргументы командной строки
-    data_dir = None
-    if len(sys.argv) > 1:
-        data_dir = sys.argv[1]
+    parser = argparse.ArgumentParser(description="OGLM Azimuth Trading Terminal")
+    parser.add_argument("data_dir", nargs="?", help="директория данных (default: ~/.oglm)")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="прогнать прогнозы из CSV/JSONL без интерфейса ('-' = stdin)")
+    parser.add_argument("--feed", metavar="SOURCE",
+                        help="живая цена: file:PATH, unix:PATH или tcp:HOST:PORT")
+    parser.add_argument("--market", metavar="SCENARIO",
+                        help="исходы по агентной симуляции рынка: stress, calm или JSON-файл")
+    parser.add_argument("--oracles", metavar="NODES",
+                        help="исходы — консенсус оракулов: local:N,tcp:HOST:PORT,unix:PATH")
+    parser.add_argument("--quorum", type=int,
+                        help="ответов оракулов для консенсуса (default: большинство)")
+    parser.add_argument("--seed", type=int,
+                        help="seed сессии: те же азимуты дают те же исходы (по умолчанию случайный)")
+    parser.add_argument("--perf", action="store_true",
+                        help=f"замеры горячих участков (или {PERF_ENV}=1), отчёт — команда perf")
+    args = parser.parse_args()
+    if args.perf:
+        PERF.enabled = True
+    if sum(map(bool, (args.market, args.feed, args.oracles))) > 1:
+        parser.error("--market, --feed, --oracles: исходы — из одного источника")
     
     try:
-        terminal = OGLMAzimuthTerminal(data_dir=data_dir)
-        terminal.run()
+        terminal = OGLMAzimuthTerminal(data_dir=args.data_dir, seed=args.seed)
+        if args.market:
+            from azimuth_market import MarketClock, load_scenario
+            try:
+                terminal.outcomes = MarketClock.for_scenario(load_scenario(args.market), terminal.seed)
+            except (KeyError, ValueError) as e:
+                parser.error(f"--market: {e}")
+        oracles = args.oracles or (None if args.market or args.feed else terminal.config.get("oracles"))
+        if oracles:
+            from azimuth_oracle import STATE_FILE as ORACLE_STATE, OracleEnsemble, parse_oracles
+            try:
+                terminal.outcomes = OracleEnsemble(parse_oracles(oracles), args.quorum,
+                                                   seed=terminal.seed,
+                                                   state_file=terminal.data_dir / ORACLE_STATE).start()
+            except ValueError as e:
+                parser.error(f"--oracles: {e}")
+        try:
+            if args.batch == '-':
+                run_batch(terminal, sys.stdin)
+            elif args.batch:
+                with open(args.batch, 'r', encoding='utf-8') as f:
+                    run_batch(terminal, f)
+            else:
+                terminal.run(args.feed or terminal.config.get("feed"))
+        finally:
+            if terminal.outcomes is not None:
+                terminal.outcomes.close()
+        if PERF.enabled:
+            # Для сборщика (node_exporter textfile) — последний отчёт сессии
+            PERF.dump(terminal.perf_file)
+    except StorageError as e:
+        print(f"\n❌ Данные повреждены: {e}")
+        print("   Файлы не изменены, восстановите их из backup")
+        sys.exit(1)
     except Exception as e:
         print(f"\n❌ Критическая ошибка: {e}")
-        print("   Проверьте, что Python 3.6+ установлен")
+        print("   Проверьте, что Python 3.7+ установлен")
         sys.exit(1)
 
 
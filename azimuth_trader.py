@@ -6,23 +6,49 @@ OGLM Azimuth Trading Terminal
 Простой интерфейс для прогнозирования траектории OGLM через азимут (цифру).
 """
 
-import json
 import os
+import random
 from datetime import datetime
 from pathlib import Path
 
+from azimuth_history import HistoryPager, parse_query
+from azimuth_montecarlo import new_seed
+from azimuth_storage import JournalStore
+
+MODEL = "trader"  # метка модели в прогнозе: azimuth_replay пересчитывает ей
+
+
+def trader_outcome(azimuth, days, seed):
+    """Движение цены модели v0.1 — воспроизводимо по seed"""
+    rng = random.Random(seed)
+    
+    # Темная материя - добавляем случайность, но с корреляцией к азимуту
+    market_noise = rng.uniform(-10, 10)
+    dark_matter = rng.uniform(-5, 5)
+    
+    # Фрактальная корреляция: большие движения сложнее предсказать
+    difficulty = abs(azimuth) / 100
+    accuracy_modifier = 1.0 - (difficulty * 0.3)
+    
+    # Базовое движение с шумом
+    return azimuth * accuracy_modifier + market_noise + dark_matter
+
 
 class AzimuthTrader:
     def __init__(self, data_file="azimuth_predictions.json"):
         self.data_file = Path(__file__).parent / data_file
+        self.store = JournalStore(self.data_file)
         self.predictions = self.load_predictions()
         self.current_price = 1.0  # Базовая цена OGLM
+        self.rng = random.Random(new_seed())  # seed прогнозов сессии
         
     def load_predictions(self):
-        """Загрузить историю прогнозов"""
-        if self.data_file.exists():
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+        """Загрузить историю прогнозов (снапшот + журнал)"""
+        self.store.open(self.create_empty_predictions)
+        return self.store.load()
+    
+    def create_empty_predictions(self):
+        """Пустая история"""
         return {
             "predictions": [],
             "stats": {
@@ -33,9 +59,8 @@ class AzimuthTrader:
         }
     
     def save_predictions(self):
-        """Сохранить историю"""
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(self.predictions, f, indent=2, ensure_ascii=False)
+        """Сохранить историю (свернуть журнал в снапшот)"""
+        self.store.compact()
     
     def print_header(self):
         """Красивый header"""
@@ -65,25 +90,12 @@ class AzimuthTrader:
                 status = "✅" if pred.get("correct") else "⏳" if not pred.get("resolved") else "❌"
                 print(f"  {status} {pred['timestamp']}: {pred['azimuth']:+.1f}% | {pred.get('note', '')}")
     
-    def calculate_outcome(self, azimuth, days=7):
+    def calculate_outcome(self, azimuth, days=7, seed=None):
         """
         Симуляция результата на основе азимута
         В реальности это будет подключено к рынку
         """
-        import random
-        
-        # Темная материя - добавляем случайность, но с корреляцией к азимуту
-        market_noise = random.uniform(-10, 10)
-        dark_matter = random.uniform(-5, 5)
-        
-        # Фрактальная корреляция: большие движения сложнее предсказать
-        difficulty = abs(azimuth) / 100
-        accuracy_modifier = 1.0 - (difficulty * 0.3)
-        
-        # Базовое движение с шумом
-        actual = azimuth * accuracy_modifier + market_noise + dark_matter
-        
-        return actual
+        return trader_outcome(azimuth, days, new_seed(self.rng) if seed is None else seed)
     
     def enter_prediction(self):
         """Основной цикл ввода прогноза"""
@@ -95,7 +107,7 @@ class AzimuthTrader:
         print("   • 0    → стагнация")
         print("\n   Или команды:")
         print("   • 'stats' → показать статистику")
-        print("   • 'history' → полная история")
+        print("   • 'history' → история ('history 10-20', '--since 2026-10-01', '--correct')")
         print("   • 'exit' → выход\n")
         
         azimuth_input = input("Азимут: ").strip()
@@ -106,8 +118,8 @@ class AzimuthTrader:
         elif azimuth_input.lower() == 'stats':
             self.print_stats()
             return True
-        elif azimuth_input.lower() == 'history':
-            self.show_full_history()
+        elif azimuth_input.lower().split()[:1] == ['history']:
+            self.show_full_history(azimuth_input.split()[1:])
             return True
         
         # Парсинг азимута
@@ -152,7 +164,10 @@ class AzimuthTrader:
         print("   • Детекция темной материи...")
         print("   • Квантовый расчёт вероятности...")
         
-        actual = self.calculate_outcome(azimuth, horizon)
+        seed = new_seed(self.rng)
+        actual = self.calculate_outcome(azimuth, horizon, seed)
+        prediction["seed"] = seed
+        prediction["model"] = MODEL
         prediction["actual_movement"] = actual
         
         # Оценка точности (±20% tolerance)
@@ -164,17 +179,17 @@ class AzimuthTrader:
         prediction["correct"] = correct
         prediction["error"] = error
         
-        # Сохраняем
-        self.predictions["predictions"].append(prediction)
-        self.predictions["stats"]["total"] += 1
-        if correct:
-            self.predictions["stats"]["correct"] += 1
-        self.predictions["stats"]["accuracy"] = (
-            self.predictions["stats"]["correct"] / 
-            self.predictions["stats"]["total"] * 100
-        )
-        
-        self.save_predictions()
+        # Сохраняем (под блокировкой: другой терминал мог писать в ту же директорию)
+        with self.store.transaction():
+            self.predictions["stats"]["total"] += 1
+            if correct:
+                self.predictions["stats"]["correct"] += 1
+            self.predictions["stats"]["accuracy"] = (
+                self.predictions["stats"]["correct"] / 
+                self.predictions["stats"]["total"] * 100
+            )
+            
+            self.store.append(prediction)
         
         # Результат
         print("\n" + "="*60)
@@ -205,19 +220,37 @@ class AzimuthTrader:
         
         return True
     
-    def show_full_history(self):
-        """Показать полную историю"""
-        print("\n📜 Полная история прогнозов:\n")
-        for i, pred in enumerate(self.predictions["predictions"], 1):
-            status = "✅" if pred.get("correct") else "⏳" if not pred.get("resolved") else "❌"
-            print(f"{i}. {status} {pred['timestamp']}")
-            print(f"   Азимут: {pred['azimuth']:+.1f}%")
-            if pred.get("resolved"):
-                print(f"   Факт: {pred.get('actual_movement', 0):+.1f}%")
-                print(f"   Ошибка: {pred.get('error', 0):.1f}%")
-            if pred.get("note"):
-                print(f"   💭 {pred['note']}")
-            print()
+    def show_full_history(self, args=()):
+        """Постраничная история: history [500-550] [--since ДАТА] [--correct] ..."""
+        try:
+            pager = HistoryPager(self.store, parse_query(args))
+        except ValueError as e:
+            print(f"❌ history: {e}")
+            return
+        
+        records = pager.first()
+        while True:
+            print(f"\n📜 История прогнозов ({pager.position()}):\n")
+            for pos, pred in zip(pager.page, records):
+                status = "✅" if pred.get("correct") else "⏳" if not pred.get("resolved") else "❌"
+                print(f"{pos + 1}. {status} {pred['timestamp']}")
+                print(f"   Азимут: {pred['azimuth']:+.1f}%")
+                if pred.get("resolved"):
+                    print(f"   Факт: {pred.get('actual_movement', 0):+.1f}%")
+                    print(f"   Ошибка: {pred.get('error', 0):.1f}%")
+                if pred.get("note"):
+                    print(f"   💭 {pred['note']}")
+                print()
+            
+            if not records:
+                return
+            key = input("[p — раньше, n — позже, Enter — выход] ").strip().lower()
+            if key == 'p':
+                records = pager.older()
+            elif key == 'n':
+                records = pager.newer()
+            else:
+                return
     
     def run(self):
         """Главный цикл"""
@@ -8,13 +8,13 @@ echo ""
 # Проверка Python
 if ! command -v python3 &> /dev/null; then
     echo "❌ Python 3 не найден"
-    echo "   Установите Python 3.6+ и попробуйте снова"
+    echo "   Установите Python 3.7+ и попробуйте снова"
     exit 1
 fi
 
 # Проверка версии Python
 PYTHON_VERSION=$(python3 -c 'import sys; print(".".join(map(str, sys.version_info[:2])))')
-REQUIRED_VERSION="3.6"
+REQUIRED_VERSION="3.7"
 
 if [ "$(printf '%s\n' "$REQUIRED_VERSION" "$PYTHON_VERSION" | sort -V | head -n1)" != "$REQUIRED_VERSION" ]; then 
     echo "❌ Python $PYTHON_VERSION слишком старый"
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Проверки архива: свёртка старой истории в сегменты, смена поколения
+
+    python -m unittest test_azimuth_archive
+"""
+
+import unittest
+
+from test_azimuth_storage import StoreTest
+
+
+class ArchiveTest(StoreTest):
+
+    def options(self):
+        return {"compact_every": 50, "segment_size": 100, "hot_size": 50}
+
+    def test_compaction_moves_history_into_archive(self):
+        store = self.store(**self.options())
+        preds = self.add(store, 400)
+        store.compact()
+        self.assertEqual(store.archive.count, 300)
+        store.close()
+
+        store = self.store(**self.options())
+        self.assertFalse(store.loaded)
+        self.assertEqual(self.history(store), preds)
+        self.assertEqual(list(store.iter_chunks(250))[0][0], preds[250])
+        self.assertEqual(store.get_many([1, 150, 400]), [preds[0], preds[149], preds[399]])
+
+    def test_unresolved_prediction_stays_hot(self):
+        store = self.store(**self.options())
+        preds = self.add(store, 120)
+        preds += self.add(store, 1, resolved=False)
+        preds += self.add(store, 280)
+        store.compact()
+        # Сегмент с неразрешённым прогнозом (#121) ждёт в снапшоте
+        self.assertEqual(store.archive.count, 100)
+
+        pending = dict(preds[120], resolved=True)
+        store.resolve(pending)
+        preds[120] = pending
+        store.compact()
+        self.assertEqual(store.archive.count, 300)
+        self.assertEqual(self.history(store), preds)
+
+    def test_generation_switch_is_seen_by_other_store(self):
+        first = self.store(**self.options())
+        preds = self.add(first, 400)
+        first.compact()
+        second = self.store(**self.options())
+        self.assertEqual(second.get_many([5]), [preds[4]])
+
+        self.assertEqual(first.repack("xz"), 3)
+        names = {p.name for p in first.archive.path.iterdir()}
+        self.assertFalse(any(name.startswith(f"{second.archive.generation}-") for name in names))
+        self.assertEqual(second.get_many([5, 250]), [preds[4], preds[249]])
+        self.assertEqual(second.archive.generation, first.archive.generation)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Проверки графика: min/max пирамиды PriceIndex против перебора массива,
+свечи OHLC CandleIndex против группировки тиков
+
+    python -m unittest test_azimuth_chart
+"""
+
+import random
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from azimuth_chart import BLOCK, RESOLUTIONS, CandleIndex, PriceIndex, render_chart
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class PriceIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "azimuth_predictions.prices"
+        self.rng = random.Random(6)
+
+    def index(self):
+        index = PriceIndex(self.path)
+        self.addCleanup(index._close)
+        return index
+
+    def fill(self, index, count, price=1.0):
+        prices = [price]
+        for _ in range(count):
+            prices.append(prices[-1] * (1 + self.rng.uniform(-0.2, 0.2)))
+            index.update({"resolved": True, "entry_price": prices[-2], "exit_price": prices[-1]})
+        return prices
+
+    def assertRanges(self, index, prices):
+        self.assertEqual(index.load().tolist(), prices)
+        n = len(prices)
+        ranges = [(0, n), (0, 1), (n - 1, n), (BLOCK - 1, BLOCK + 1), (BLOCK ** 2, BLOCK ** 3 + 5)]
+        ranges += sorted((self.rng.randrange(n), self.rng.randrange(n)) for _ in range(300))
+        for start, stop in ranges:
+            stop = max(stop, start + 1)
+            chunk = prices[start:stop]
+            self.assertEqual(index.minmax(start, stop), (min(chunk), max(chunk)), (start, stop))
+
+    def test_minmax_matches_brute_force(self):
+        # Пирамида растёт, пока массив в памяти (_extend_levels)
+        index = self.index()
+        index.reset()
+        index.load()
+        prices = self.fill(index, BLOCK ** 3 + 100)
+        self.assertRanges(index, prices)
+
+        # И строится заново из файла (load)
+        state = index.state()
+        index = self.index()
+        self.assertTrue(index.restore(state))
+        self.assertRanges(index, prices)
+
+    def test_downsample_buckets(self):
+        index = self.index()
+        index.reset()
+        prices = self.fill(index, 1000)
+        for width, start, stop in ((60, 0, None), (7, 100, 900), (5000, 10, 20), (3, 0, 2)):
+            buckets = index.downsample(width, start, stop)
+            stop = len(prices) if stop is None else stop
+            count = stop - start
+            self.assertEqual(len(buckets), min(width, count))
+            for col, bucket in enumerate(buckets):
+                chunk = prices[start + count * col // len(buckets):start + count * (col + 1) // len(buckets)]
+                self.assertEqual(bucket, (min(chunk), max(chunk)))
+        self.assertEqual(index.downsample(10, 2000, 3000), [])
+
+    def test_restore_drops_tail_after_state(self):
+        index = self.index()
+        index.reset()
+        prices = self.fill(index, 50)
+        state = index.state()
+        self.fill(index, 10, prices[-1])
+        index._close()
+
+        index = self.index()
+        self.assertTrue(index.restore(state))
+        self.assertEqual(index.load().tolist(), prices)
+        self.assertFalse(self.index().restore({"length": 500}))
+
+
+class CandleIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "azimuth_predictions.candles"
+        self.rng = random.Random(7)
+
+    def history(self, count):
+        """Прогнозы по времени; каждый десятый разрешён позже соседей,
+        каждый седьмой — в ту же секунду, что и предыдущий"""
+        preds, price, start = [], 1.0, datetime(2026, 3, 1, 9, 30)
+        moment = start
+        for i in range(count):
+            if i % 7 != 3:
+                moment = start + timedelta(seconds=i * 1051)
+            if i % 10 == 9:
+                moment -= timedelta(days=self.rng.randint(1, 20))
+            exit_price = price * (1 + self.rng.uniform(-0.05, 0.05))
+            preds.append({"timestamp": moment.strftime("%Y-%m-%d %H:%M:%S"), "resolved": True,
+                          "horizon_days": self.rng.choice((1, 7, 30)),
+                          "entry_price": price, "exit_price": exit_price})
+            price = exit_price
+        return preds
+
+    def brute_force(self, preds, seconds, offset):
+        """Свечи перебором: тики (время, цена) в порядке разрешения"""
+        candles = {}
+        for pred in preds:
+            moment = datetime.strptime(pred["timestamp"], "%Y-%m-%d %H:%M:%S")
+            entry = int((moment - EPOCH).total_seconds())
+            for at, price in ((entry, pred["entry_price"]),
+                              (entry + pred["horizon_days"] * 86400, pred["exit_price"])):
+                start = (at - offset) // seconds * seconds + offset
+                candle = candles.setdefault(start, {"ticks": []})
+                candle["ticks"].append((at, price))
+        result = []
+        for start in sorted(candles):
+            ticks = candles[start]["ticks"]
+            first = min(at for at, _ in ticks)
+            last = max(at for at, _ in ticks)
+            prices = [price for _, price in ticks]
+            result.append((start, [p for at, p in ticks if at == first][0], max(prices), min(prices),
+                           [p for at, p in ticks if at == last][-1], len(ticks)))
+        return result
+
+    def index(self):
+        index = CandleIndex(self.path)
+        index.reset()
+        return index
+
+    def test_ohlc_matches_brute_force(self):
+        preds = self.history(3000)
+        index = self.index()
+        for pred in preds:
+            index.update(pred)
+        state = index.state()
+
+        restored = CandleIndex(self.path)
+        self.assertTrue(restored.restore(state))
+        for name, seconds, offset in RESOLUTIONS:
+            expected = self.brute_force(preds, seconds, offset)
+            for candles in (index, restored):
+                self.assertEqual(candles.levels[name].candles(), expected, name)
+
+            # Диапазон [since, until) и последние limit свечей
+            level = restored.levels[name]
+            since, until = sorted(self.rng.choice(expected)[0] for _ in range(2))
+            inside = [c for c in expected if since <= c[0] < until]
+            self.assertEqual(level.candles(since, until), inside)
+            self.assertEqual(level.count(since, until), len(inside))
+            self.assertEqual(level.candles(since, until, limit=3), inside[-3:])
+
+    def test_select_picks_finest_resolution_that_fits(self):
+        index = self.index()
+        for pred in self.history(3000):
+            index.update(pred)
+        counts = {name: level.count() for name, level in index.levels.items()}
+        self.assertTrue(counts["1h"] > counts["1d"] > counts["1w"])
+
+        level, candles = index.select(width=counts["1d"])
+        self.assertEqual(level.name, "1d")
+        self.assertEqual(len(candles), counts["1d"])
+        level, candles = index.select(width=counts["1w"] - 1)
+        self.assertEqual(level.name, "1w")
+        self.assertEqual(candles, index.levels["1w"].candles()[1:])
+
+    def test_files_behind_state_need_rebuild(self):
+        index = self.index()
+        preds = self.history(200)
+        for pred in preds[:100]:
+            index.update(pred)
+        behind = index.state()
+        for pred in preds[100:]:
+            index.update(pred)
+        ahead = index.state()
+
+        # Файлы впереди состояния: лишние тики журнала пропускаются
+        restored = CandleIndex(self.path)
+        self.assertTrue(restored.restore(behind))
+        for pred in preds[100:]:
+            restored.update(pred)
+        self.assertEqual(restored.state(), ahead)
+        for name, level in restored.levels.items():
+            self.assertEqual(level.candles(), index.levels[name].candles())
+
+        # Файлы позади состояния — пересборка
+        self.assertFalse(CandleIndex(self.path).restore(dict(ahead, ticks=ahead["ticks"] + 2)))
+
+
+class RenderTest(unittest.TestCase):
+
+    def test_axis_labels_share_width(self):
+        lines = render_chart([(-123456.0, -100000.0), (0.5, 2.0), (3.0, 5.0)], height=4)
+        self.assertEqual(len({line.index("│") for line in lines[:-1]}), 1)
+        self.assertEqual(lines[-1].index("└"), lines[0].index("│"))
+
+
+if __name__ == "__main__":
+    unittest.main()
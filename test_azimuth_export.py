@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Проверки выгрузки: .oglc читается обратно в ту же историю,
+--incremental продолжает с первого неразрешённого и после переписи
+истории выгружает её целиком
+
+    python -m unittest test_azimuth_export
+"""
+
+import json
+import math
+import unittest
+
+from azimuth_export import ALIGN, export_history, open_columns, read_state
+from azimuth_model import FLAG_VALUES, FLAGS, FLOATS, INTS, KEYS, NO_INT, STRINGS, TimestampCodec
+from test_azimuth_storage import StoreTest
+
+
+def decode(header, columns):
+    """Прогнозы из колонок .oglc — обратное к ColumnarWriter"""
+    codec = TimestampCodec()
+
+    def strings(name, i):
+        length = columns[name + ".lengths"][i]
+        if length < 0:
+            return None
+        offset = columns[name + ".offsets"][i]
+        return bytes(columns[name + ".data"][offset:offset + length]).decode('utf-8')
+
+    times = columns["timestamp"]
+    times = times.view('<i8') if hasattr(times, 'view') else times
+    preds = []
+    for i in range(header["rows"]):
+        pred = {}
+        for key in KEYS:
+            if key == "timestamp":
+                value = None if times[i] == NO_INT['q'] else codec.decode(int(times[i]))
+            elif key in INTS:
+                value = int(columns[key][i])
+                value = None if value == NO_INT[INTS[key]] else value
+            elif key in FLOATS:
+                value = float(columns[key][i])
+                value = None if math.isnan(value) else value
+            elif key in FLAGS:
+                code = int(columns[key][i])
+                if code >= 0:  # -1 — ключа нет, 2 — null
+                    pred[key] = FLAG_VALUES[code]
+                continue
+            elif key in STRINGS:
+                value = strings(key, i)
+            if value is not None:
+                pred[key] = value
+        extras = strings("extras", i)
+        if extras is not None:
+            pred.update(json.loads(extras))
+        preds.append(pred)
+    return preds
+
+
+class ExportTest(StoreTest):
+
+    def setUp(self):
+        super().setUp()
+        self.out = self.dir / "export"
+        self.out.mkdir()
+
+    def history_with_oddities(self, store):
+        preds = self.add(store, 5)
+        with store.transaction():
+            for pred in ({"id": store.next_id(), "timestamp": "2026-10-01T10:00:00",
+                          "azimuth": -99.0, "note": "тёмная материя ✨", "horizon_days": 30,
+                          "resolved": True, "correct": None, "custom": [1, {"a": 2}]},
+                         {"id": store.next_id(), "timestamp": "2026-10-02 11:00:00",
+                          "azimuth": 12.5, "note": "", "model": "v2", "horizon_days": 1,
+                          "seed": 2 ** 62, "entry_price": 1.25, "resolved": False}):
+                store.summary["stats"]["total"] += 1
+                store.append(pred)
+                preds.append(pred)
+        return preds + self.add(store, 70)
+
+    def test_columns_round_trip(self):
+        store = self.store()
+        preds = self.history_with_oddities(store)
+        path = self.out / "history.oglc"
+        self.assertEqual(export_history(store, self.dir, "oglc", path), (0, len(preds), False))
+
+        header, columns = open_columns(path)
+        self.assertEqual((header["rows"], header["start"]), (len(preds), 0))
+        for column in header["columns"]:
+            self.assertEqual(column["offset"] % ALIGN, 0)
+            self.assertEqual(len(columns[column["name"]]), column["count"])
+        self.assertEqual(decode(header, columns), preds)
+        self.assertEqual(list(self.out.iterdir()), [path])  # временный файл убран
+
+        other = self.out / "history.csv"
+        export_history(store, self.dir, "csv", other)
+        with self.assertRaises(ValueError):
+            open_columns(other)
+
+    def jsonl(self, store, incremental=True):
+        path = self.out / "history.jsonl"
+        result = export_history(store, self.dir, "jsonl", path, incremental)
+        with open(path, encoding='utf-8') as f:
+            return result, [json.loads(line) for line in f]
+
+    def merged(self, exports):
+        """Выгрузки по порядку: строка с тем же id заменяет прежнюю"""
+        rows = {}
+        for lines in exports:
+            for pred in lines:
+                rows.pop(pred["id"], None)
+                rows[pred["id"]] = pred
+        return sorted(rows.values(), key=lambda pred: pred["id"])
+
+    def test_incremental_resumes_at_first_pending(self):
+        store = self.store()
+        preds = self.add(store, 30)
+        preds += self.add(store, 1, resolved=False)
+        preds += self.add(store, 19)
+        (start, count, restarted), first = self.jsonl(store)
+        self.assertEqual((start, count, restarted), (0, 50, False))
+        self.assertEqual(read_state(self.dir)["jsonl"]["position"], 30)
+
+        preds += self.add(store, 10)
+        pending = dict(preds[30], resolved=True)
+        store.resolve(pending)
+        preds[30] = pending
+        (start, count, restarted), second = self.jsonl(store)
+        self.assertEqual((start, count, restarted), (30, 30, False))
+        self.assertEqual(second[0], pending)
+        self.assertEqual(self.merged([first, second]), preds)
+
+        # Без новых прогнозов — пустая выгрузка с конца
+        (start, count, restarted), third = self.jsonl(store)
+        self.assertEqual((start, count, restarted, third), (60, 0, False, []))
+
+    def test_incremental_after_rewrite_exports_everything(self):
+        store = self.store()
+        preds = self.add(store, 40)
+        self.jsonl(store)
+
+        # replay --write: история та же длины, id другие
+        rewritten = [dict(pred, id=pred["id"] + 1000) for pred in preds]
+        store.rewrite({"predictions": rewritten, "stats": {"total": len(rewritten)}})
+        (start, count, restarted), lines = self.jsonl(store)
+        self.assertEqual((start, count, restarted), (0, 40, True))
+        self.assertEqual(lines, rewritten)
+
+        # Та же история после rewrite — продолжение с конца
+        more = self.add(store, 5)
+        (start, count, restarted), lines = self.jsonl(store)
+        self.assertEqual((start, count, restarted, lines), (40, 5, False, more))
+
+
+if __name__ == "__main__":
+    unittest.main()
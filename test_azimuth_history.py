@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Проверки истории: разбор аргументов history/query и страницы HistoryPager
+против фильтра по списку
+
+    python -m unittest test_azimuth_history
+"""
+
+import unittest
+from datetime import datetime, timedelta
+
+from azimuth_history import (CORRECT, INCORRECT, PENDING, HistoryPager, parse_query,
+                             parse_search, parse_timestamp)
+from test_azimuth_storage import StoreTest
+
+
+class ParseQueryTest(unittest.TestCase):
+
+    def test_filters(self):
+        query = parse_query(["500-550", "--since", "2026-10-01", "--until", "2026-10-05",
+                             "--horizon", "30", "--incorrect"])
+        self.assertEqual((query["first"], query["last"]), (500, 550))
+        self.assertEqual(query["since"], parse_timestamp("2026-10-01"))
+        self.assertEqual(query["until"], parse_timestamp("2026-10-05"))
+        self.assertEqual((query["horizon"], query["status"]), (30, INCORRECT))
+        self.assertEqual(parse_query(["--pending"])["status"], PENDING)
+        self.assertEqual(parse_query([])["status"], None)
+
+    def test_errors(self):
+        for args in (["--since"], ["--since", "вчера"], ["--until", "2026-13-01"],
+                     ["--horizon", "неделя"], ["--foo"], ["500"], ["5-x"]):
+            with self.assertRaises(ValueError, msg=args):
+                parse_query(args)
+        for args in (["--azimuth", "много"], ["--limit", "-1"], ["--sort", "price"],
+                     ["--sort"], ["--correct", "--bar"]):
+            with self.assertRaises(ValueError, msg=args):
+                parse_search(args)
+
+    def test_search_options(self):
+        search = parse_search(["--azimuth", "-100:-90", "--sort", "-error", "--limit", "0",
+                               "--correct"])
+        self.assertEqual(search["azimuth"], (-100.0, -90.0))
+        self.assertEqual((search["sort"], search["descending"], search["limit"]), ("error", True, 0))
+        self.assertEqual(search["status"], CORRECT)
+        self.assertEqual(parse_search(["--azimuth", "5"])["azimuth"], (5.0, 5.0))
+
+
+class HistoryPagerTest(StoreTest):
+
+    def setUp(self):
+        super().setUp()
+        self.start = datetime(2026, 1, 1, 12, 0)
+        self.storage = self.store()
+        self.preds = []
+        for i in range(120):
+            with self.storage.transaction():
+                pred = {"id": self.storage.next_id(),
+                        "timestamp": (self.start + timedelta(hours=i * 7)).strftime("%Y-%m-%d %H:%M:%S"),
+                        "azimuth": self.rng.uniform(-99, 99), "horizon_days": (1, 7, 30)[i % 3],
+                        "resolved": i % 5 != 0, "correct": i % 2 == 0}
+                self.storage.append(pred)
+            self.preds.append(pred)
+
+    def pager(self, *args):
+        return HistoryPager(self.storage, parse_query(args))
+
+    def walk(self, pager, step):
+        """Все страницы от текущей до упора: [[id, ...], ...]"""
+        pages = [[p["id"] for p in pager.records()]]
+        while True:
+            page = [p["id"] for p in step()]
+            if page == pages[-1]:
+                return pages
+            pages.append(page)
+
+    def test_without_filters_starts_at_the_end(self):
+        pager = self.pager()
+        self.assertEqual([p["id"] for p in pager.first()], list(range(101, 121)))
+        pages = self.walk(pager, pager.older)
+        self.assertEqual(len(pages), 6)
+        self.assertEqual(pages[-1], list(range(1, 21)))
+        self.assertEqual(pager.position(), "#1–#20 из 120")
+        # С первой страницы — обратно до последней
+        self.assertEqual(self.walk(pager, pager.newer)[-1], list(range(101, 121)))
+
+    def test_id_range_is_inclusive(self):
+        pager = self.pager("30-45")
+        self.assertEqual([p["id"] for p in pager.first()], list(range(30, 46)))
+        self.assertEqual([p["id"] for p in pager.newer()], list(range(30, 46)))
+        self.assertEqual(self.pager("200-300").first(), [])
+        self.assertEqual(self.pager("200-300").position(), "0 из 0")
+
+    def test_status_and_horizon_pages_cover_filtered_history(self):
+        for args, keep in ((("--pending",), lambda p: not p["resolved"]),
+                           (("--correct", "--horizon", "7"),
+                            lambda p: p["resolved"] and p["correct"] and p["horizon_days"] == 7)):
+            pager = self.pager("1-120", *args)
+            pager.first()
+            pages = self.walk(pager, pager.newer)
+            self.assertEqual([i for page in pages for i in page],
+                             [p["id"] for p in self.preds if keep(p)], args)
+
+    def test_since_until_boundaries(self):
+        day = self.start + timedelta(days=10)
+        pager = self.pager("--since", day.strftime("%Y-%m-%d"), "--until", day.strftime("%Y-%m-%d"))
+        # --until включительно: весь день, ни секундой больше
+        expected = [p["id"] for p in self.preds if p["timestamp"].startswith(day.strftime("%Y-%m-%d"))]
+        self.assertTrue(expected)
+        self.assertEqual([p["id"] for p in pager.first()], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
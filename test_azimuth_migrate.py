@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Проверки миграции старого файла в журнал и replay исходов бит в бит
+
+    python -m unittest test_azimuth_migrate
+"""
+
+import json
+import unittest
+
+from azimuth_migrate import Migration
+from azimuth_montecarlo import score_outcome, seeded_outcome
+from azimuth_replay import Replay
+from azimuth_storage import StorageError
+from test_azimuth_storage import StoreTest
+
+
+class MigrateReplayTest(StoreTest):
+
+    def legacy(self, count):
+        """Снапшот терминала до журнала: исходы по seed, цена цепочкой"""
+        preds, price, correct = [], 1.0, 0
+        for i in range(count):
+            azimuth, seed = self.rng.uniform(-99, 99), self.rng.getrandbits(63)
+            pred = {"id": i + 1, "timestamp": "2025-06-01 10:00:00", "azimuth": azimuth,
+                    "note": "", "horizon_days": 7, "entry_price": price,
+                    "target_price": price * (1 + azimuth / 100), "seed": seed}
+            actual, dark_matter = seeded_outcome(azimuth, 7, seed)
+            price = price * (1 + actual / 100)
+            score_outcome(pred, price, actual, dark_matter)
+            correct += pred["correct"]
+            preds.append(pred)
+        return {"predictions": preds,
+                "stats": {"total": count, "correct": correct,
+                          "accuracy": correct / count * 100 if count else 0.0}}
+
+    def test_migrate_in_place_then_replay_matches(self):
+        legacy = self.legacy(300)
+        self.file.write_text(json.dumps(legacy), encoding='utf-8')
+        migration = Migration(self.file, self.dir)
+        migration.run()
+        self.assertEqual(migration.count, 300)
+        self.assertTrue(migration.backup.exists())
+
+        store = self.store()
+        self.assertEqual(self.history(store), legacy["predictions"])
+        replay = Replay(store.load())
+        self.assertEqual(replay.divergences, [])
+        self.assertEqual(replay.seeded, 300)
+
+        store.rewrite(replay.data())
+        self.assertEqual(self.history(store), legacy["predictions"])
+
+    def test_migration_refuses_store_with_history(self):
+        self.add(self.store(), 1)
+        source = self.dir / "old.json"
+        source.write_text(json.dumps(self.legacy(3)), encoding='utf-8')
+        with self.assertRaises(StorageError):
+            Migration(source, self.dir).run()
+        self.assertEqual(self.store().summary["count"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
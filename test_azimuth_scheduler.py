@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Проверки очереди разрешения: журнал .pending переживает перезапуск,
+обрыв и сжатие; снятые сроки возвращаются, если разрешить не удалось
+
+    python -m unittest test_azimuth_scheduler
+"""
+
+import unittest
+from datetime import datetime, timedelta
+
+from azimuth_scheduler import COMPACT_MIN, RECORD, ResolutionScheduler, due_time
+from azimuth_storage import JournalStore
+from test_azimuth_storage import StoreTest, empty
+
+
+class SchedulerTest(StoreTest):
+
+    def setUp(self):
+        super().setUp()
+        self.path = self.dir / "azimuth_predictions.pending"
+        self.start = datetime(2026, 10, 1, 10, 0)
+
+    def scheduler(self):
+        scheduler = ResolutionScheduler(self.path)
+        self.addCleanup(scheduler._close)
+        return scheduler
+
+    def pred(self, pred_id, resolved=False):
+        moment = self.start + timedelta(minutes=self.rng.randrange(10000))
+        return {"id": pred_id, "timestamp": moment.strftime("%Y-%m-%d %H:%M:%S"),
+                "horizon_days": self.rng.choice((1, 7, 30)), "resolved": resolved}
+
+    def queue(self, scheduler):
+        """Все ожидающие (срок, id) по возрастанию"""
+        return sorted((due, pred_id) for pred_id, due in scheduler.load().items())
+
+    def test_log_survives_restart(self):
+        scheduler = self.scheduler()
+        scheduler.reset()
+        preds = [self.pred(i) for i in range(1, 51)]
+        for pred in preds:
+            scheduler.update(pred)
+        for pred in preds[::3]:
+            scheduler.update(dict(pred, resolved=True))
+        state = scheduler.state()
+
+        restored = self.scheduler()
+        self.assertTrue(restored.restore(state))
+        expected = sorted((due_time(p), p["id"]) for p in preds if p not in preds[::3])
+        self.assertEqual(self.queue(restored), expected)
+        self.assertEqual(restored.next_due(), expected[0][0])
+        self.assertEqual(restored.pop_due(expected[9][0]), [i for _, i in expected[:10]])
+
+    def test_tail_after_state_is_dropped_and_short_log_is_rejected(self):
+        scheduler = self.scheduler()
+        scheduler.reset()
+        for i in range(1, 11):
+            scheduler.update(self.pred(i))
+        state = scheduler.state()
+        scheduler.update(self.pred(11))
+        scheduler.state()
+
+        # Запись #11 придёт из журнала истории повторно
+        restored = self.scheduler()
+        self.assertTrue(restored.restore(state))
+        self.assertEqual(self.path.stat().st_size, 10 * RECORD.size)
+        self.assertEqual(len(restored), 10)
+
+        with open(self.path, 'r+b') as f:
+            f.truncate(5 * RECORD.size)
+        self.assertFalse(self.scheduler().restore(state))
+
+    def test_compaction_keeps_open_predictions(self):
+        scheduler = self.scheduler()
+        scheduler.reset()
+        preds = [self.pred(i) for i in range(1, COMPACT_MIN + 11)]
+        for pred in preds:
+            scheduler.update(pred)
+        for pred in preds[:-10]:
+            scheduler.update(dict(pred, resolved=True))
+        state = scheduler.state()
+        self.assertEqual(state["length"], 10)
+
+        restored = self.scheduler()
+        self.assertTrue(restored.restore(state))
+        self.assertEqual(self.queue(restored), sorted((due_time(p), p["id"]) for p in preds[-10:]))
+
+    def test_popped_ids_return_after_failed_resolution(self):
+        scheduler = self.scheduler()
+        scheduler.reset()
+        preds = [self.pred(i) for i in range(1, 21)]
+        for pred in preds:
+            scheduler.update(pred)
+        ts = max(due_time(p) for p in preds)
+        popped = scheduler.pop_due(ts)
+        self.assertEqual(len(popped), 20)
+        self.assertEqual(scheduler.pop_due(ts), [])
+
+        scheduler.requeue()
+        self.assertEqual(scheduler.pop_due(ts), popped)
+
+        # Разрешённый другим процессом — убран из очереди и журнала
+        scheduler.discard(popped[0])
+        state = scheduler.state()
+        restored = self.scheduler()
+        self.assertTrue(restored.restore(state))
+        self.assertEqual(restored.pop_due(ts), popped[1:])
+
+    def open_store(self, scheduler):
+        store = JournalStore(self.file, compact_every=10 ** 6)
+        store.register("scheduler", scheduler)
+        store.open(empty)
+        self.addCleanup(store.close)
+        return store
+
+    def test_store_rebuilds_short_log_from_history(self):
+        store = self.open_store(self.scheduler())
+        preds = self.add(store, 5, resolved=False) + self.add(store, 5)
+        store.close()
+        # Журнал очереди оборван (диск, перенос данных) — короче сводки
+        with open(self.path, 'r+b') as f:
+            f.truncate(2 * RECORD.size)
+
+        scheduler = self.scheduler()
+        self.open_store(scheduler)
+        self.assertEqual(sorted(scheduler.load()), [p["id"] for p in preds[:5]])
+
+
+if __name__ == "__main__":
+    unittest.main()
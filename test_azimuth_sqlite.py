@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Проверки SQLite: после migrate и при одинаковой записи статистика и
+ответы query совпадают с JSON-хранилищем
+
+    python -m unittest test_azimuth_sqlite
+"""
+
+import io
+import random
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from azimuth_history import parse_search
+from azimuth_sqlite import SQLiteStore, migrate
+from azimuth_terminal import OGLMAzimuthTerminal, run_batch
+
+SEARCHES = (
+    [],
+    ["--limit", "0"],
+    ["--correct", "--limit", "0"],
+    ["--incorrect", "--horizon", "30", "--sort", "-error"],
+    ["--pending", "--limit", "0"],
+    ["--azimuth", "-50:10", "--sort", "azimuth", "--limit", "15"],
+    ["--azimuth", "-99"],
+    ["--sort", "-azimuth", "--limit", "0"],  # -99 повторяется: равные — по порядку записи
+    ["40-160", "--sort", "-pnl", "--limit", "0"],
+    ["--sort", "-time", "--limit", "7"],
+    ["--sort", "error", "--limit", "0"],
+    ["--since", "2020-01-01", "--until", "2999-12-31", "--horizon", "1", "--limit", "0"],
+    ["--since", "2999-01-01"],
+)
+
+
+class ParityTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.json_dir = Path(tmp.name) / "json"
+        self.sqlite_dir = Path(tmp.name) / "sqlite"
+        rng = random.Random(8)
+        lines = [f"{rng.choice((-99, rng.uniform(-99, 99))):.1f},{rng.choice((1, 7, 30))}"
+                 for _ in range(300)]
+        terminal = self.terminal(self.json_dir)
+        run_batch(terminal, io.StringIO("\n".join(lines)), out=io.StringIO())
+        terminal.store.close()
+
+        shutil.copytree(str(self.json_dir), str(self.sqlite_dir))
+        self.assertEqual(migrate(self.sqlite_dir), 300)
+
+    def terminal(self, data_dir):
+        terminal = OGLMAzimuthTerminal(data_dir, seed=1)
+        self.addCleanup(terminal.store.close)
+        return terminal
+
+    def both(self):
+        first, second = self.terminal(self.json_dir), self.terminal(self.sqlite_dir)
+        self.assertIsInstance(second.store, SQLiteStore)
+        self.assertNotIsInstance(first.store, SQLiteStore)
+        return first, second
+
+    def stats_output(self, terminal):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            terminal.print_stats()
+        return output.getvalue()
+
+    def assertParity(self, first, second):
+        for key in ("count", "last_id", "stats", "recent"):
+            self.assertEqual(first.summary[key], second.summary[key], key)
+        for name in ("streaming", "calibration"):
+            self.assertEqual(first.store.aggregators[name].state(),
+                             second.store.aggregators[name].state(), name)
+        self.assertEqual(self.stats_output(first), self.stats_output(second))
+
+        for args in SEARCHES:
+            search = parse_search(args)
+            self.assertEqual(first.store.query(search), second.store.query(search), args)
+        ids = [1, 150, 300, 301, 10 ** 6]
+        self.assertEqual(first.store.get_many(ids), second.store.get_many(ids))
+
+    def test_migrated_history_matches(self):
+        self.assertParity(*self.both())
+
+    def test_same_writes_keep_parity(self):
+        first, second = self.both()
+        rng = random.Random(9)
+        pending = []
+        for i in range(40):
+            resolved = i % 4 != 0
+            pred = {"id": first.store.next_id(), "timestamp": f"2026-10-{1 + i % 28:02d} 12:00:00",
+                    "azimuth": rng.uniform(-99, 99), "horizon_days": rng.choice((1, 7, 30)),
+                    "entry_price": 1.0, "resolved": resolved}
+            if resolved:
+                pred.update(exit_price=rng.uniform(0.5, 1.5), actual_movement=rng.uniform(-50, 50),
+                            error=rng.uniform(0, 60), correct=rng.random() < 0.5,
+                            pnl=rng.uniform(-5, 5))
+            else:
+                pending.append(pred)
+            for terminal in (first, second):
+                with terminal.store.transaction():
+                    self.assertEqual(terminal.store.next_id(), pred["id"])
+                    terminal.store.append(dict(pred))
+        self.assertParity(first, second)
+
+        resolved = [dict(pred, resolved=True, exit_price=1.1, actual_movement=10.0, error=5.0,
+                         correct=True, pnl=1.0) for pred in pending]
+        for terminal in (first, second):
+            terminal.store.resolve_many([dict(pred) for pred in resolved])
+        self.assertParity(first, second)
+
+        # И после перезапуска — из сводки и meta
+        first.store.close()
+        second.store.close()
+        self.assertParity(*self.both())
+
+
+if __name__ == "__main__":
+    unittest.main()
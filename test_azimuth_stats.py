@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Проверки потоковой статистики: квантили t-digest против сортировки,
+скользящие окна точности против честного подсчёта
+
+    python -m unittest test_azimuth_stats
+"""
+
+import bisect
+import random
+import statistics
+import unittest
+from collections import deque
+
+from azimuth_stats import StreamingStats, TDigest, Welford
+
+
+class TDigestTest(unittest.TestCase):
+
+    def sample(self, draw, count=50000):
+        rng = random.Random(2)
+        digest, values = TDigest(), []
+        for _ in range(count):
+            x = draw(rng)
+            digest.add(x)
+            values.append(x)
+        values.sort()
+        return digest, values
+
+    def assertRankError(self, digest, values):
+        """Ранг оценки квантиля отличается от q не больше допуска (на хвостах — строже)"""
+        for q in (0.001, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999):
+            rank = bisect.bisect_left(values, digest.quantile(q)) / len(values)
+            bound = 0.002 if q <= 0.01 or q >= 0.99 else 0.005
+            self.assertLessEqual(abs(rank - q), bound, f"q={q}")
+
+    def test_quantiles_within_rank_error(self):
+        for draw in (lambda rng: rng.random(),
+                     lambda rng: rng.expovariate(1.0),
+                     lambda rng: rng.gauss(0, 25)):
+            digest, values = self.sample(draw)
+            self.assertRankError(digest, values)
+            self.assertEqual(digest.quantile(0), values[0])
+            self.assertEqual(digest.quantile(1), values[-1])
+            self.assertLessEqual(len(digest.centroids), digest.compression)
+
+    def test_state_round_trip(self):
+        digest, values = self.sample(lambda rng: rng.expovariate(1.0), 5000)
+        restored = TDigest.from_state(digest.state())
+        for q in (0.01, 0.5, 0.99):
+            self.assertEqual(restored.quantile(q), digest.quantile(q))
+
+    def test_small_and_empty(self):
+        digest = TDigest()
+        self.assertEqual(digest.quantile(0.5), 0.0)
+        digest.add(7.0)
+        self.assertEqual(digest.quantile(0.9), 7.0)
+
+
+class RollingAccuracyTest(unittest.TestCase):
+
+    def test_windows_match_brute_force_across_roll_over(self):
+        rng = random.Random(3)
+        stats = StreamingStats(windows=(3, 50, 64, 65))
+        outcomes = deque(maxlen=65)
+        # Окна переполняются много раз, в том числе на границе 64 бит
+        for i in range(1000):
+            correct = rng.random() < 0.3 + 0.4 * (i // 100 % 2)
+            stats.update({"resolved": True, "correct": correct, "error": 1.0})
+            outcomes.append(correct)
+            for window in stats.windows:
+                last = list(outcomes)[-window:]
+                self.assertAlmostEqual(stats.accuracy(window), sum(last) / len(last) * 100)
+
+    def test_restore_continues_the_same_windows(self):
+        rng = random.Random(4)
+        preds = [{"resolved": True, "correct": rng.random() < 0.5, "error": rng.uniform(0, 40),
+                  "exit_price": rng.uniform(0.5, 2.0)} for _ in range(700)]
+        full = StreamingStats()
+        for pred in preds:
+            full.update(pred)
+
+        head = StreamingStats()
+        for pred in preds[:300]:
+            head.update(pred)
+        resumed = StreamingStats()
+        resumed.restore(head.state())
+        for pred in preds[300:]:
+            resumed.update(pred)
+
+        self.assertEqual(resumed.state()["rolling"], full.state()["rolling"])
+        for window in resumed.windows:
+            self.assertEqual(resumed.accuracy(window), full.accuracy(window))
+        self.assertEqual(resumed.max_drawdown, full.max_drawdown)
+        self.assertAlmostEqual(resumed.error.mean, full.error.mean)
+
+
+class WelfordTest(unittest.TestCase):
+
+    def test_matches_statistics(self):
+        rng = random.Random(5)
+        values = [rng.gauss(1e6, 3) for _ in range(1000)]
+        welford = Welford()
+        for x in values:
+            welford.add(x)
+        self.assertAlmostEqual(welford.mean, statistics.mean(values), places=6)
+        self.assertAlmostEqual(welford.variance, statistics.variance(values), places=6)
+
+
+if __name__ == "__main__":
+    unittest.main()
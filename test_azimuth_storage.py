@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Проверки хранилища: журнал переживает падение процесса, сводка —
+отставание и потерю, два процесса видят записи друг друга
+
+    python -m unittest test_azimuth_storage
+"""
+
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+from azimuth_storage import JournalStore
+
+
+def empty():
+    return {"predictions": [], "stats": {"total": 0}}
+
+
+class Counter:
+    """Агрегатор-счётчик: видно, восстановлен он из сводки или пересобран"""
+
+    def __init__(self):
+        self.count = 0
+        self.rebuilt = False
+
+    def reset(self):
+        self.count = 0
+        self.rebuilt = True
+
+    def update(self, pred):
+        self.count += 1
+
+    def state(self):
+        return {"count": self.count}
+
+    def restore(self, state):
+        self.count = state["count"]
+
+
+class StoreTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.file = self.dir / "azimuth_predictions.json"
+        self.rng = random.Random(1)
+
+    def store(self, counter=None, **options):
+        options.setdefault("compact_every", 10 ** 6)
+        store = JournalStore(self.file, **options)
+        if counter is not None:
+            store.register("counter", counter)
+        store.open(empty)
+        self.addCleanup(store.close)
+        return store
+
+    def add(self, store, count, resolved=True):
+        added = []
+        for _ in range(count):
+            with store.transaction():
+                pred = {"id": store.next_id(), "timestamp": "2026-10-01 10:00:00",
+                        "azimuth": self.rng.uniform(-99, 99), "horizon_days": 7,
+                        "resolved": resolved}
+                store.summary["stats"]["total"] += 1
+                store.append(pred)
+            added.append(pred)
+        return added
+
+    def history(self, store):
+        return [pred for chunk in store.iter_chunks() for pred in chunk]
+
+
+class JournalTest(StoreTest):
+
+    def test_torn_tail_is_dropped(self):
+        store = self.store()
+        preds = self.add(store, 5)
+        store.close()
+        with open(store.journal_file, 'ab') as f:
+            f.write(b'{"seq": 6, "prediction": {"id": 6, "azim')
+
+        store = self.store()
+        self.assertEqual(store.summary["count"], 5)
+        self.assertEqual(self.history(store), preds)
+        # Обрывок отрезан: новая запись не склеивается с ним
+        preds += self.add(store, 1)
+        store.close()
+        self.assertEqual(self.history(self.store()), preds)
+
+    def test_replayed_records_before_snapshot_are_skipped(self):
+        store = self.store()
+        preds = self.add(store, 4)
+        journal = store.journal_file.read_bytes()
+        store.compact()
+        store.close()
+        # Падение между записью снапшота и обрезкой журнала
+        store.journal_file.write_bytes(journal)
+        self.assertEqual(self.history(self.store()), preds)
+
+
+class SummaryTest(StoreTest):
+
+    def test_fresh_summary_restores_aggregates(self):
+        store = self.store(Counter())
+        self.add(store, 3)
+        store.close()
+
+        counter = Counter()
+        store = self.store(counter)
+        self.assertFalse(store.loaded)
+        self.assertFalse(counter.rebuilt)
+        self.assertEqual(counter.count, 3)
+
+    def test_stale_summary_is_rebuilt(self):
+        store = self.store(Counter())
+        self.add(store, 3)
+        stale = store.summary_file.read_bytes()
+        preds = self.add(store, 2)
+        store.close()
+        store.summary_file.write_bytes(stale)
+
+        counter = Counter()
+        store = self.store(counter)
+        self.assertEqual(store.summary["count"], 5)
+        self.assertEqual(store.summary["recent"][-1], preds[-1])
+        self.assertEqual(counter.count, 5)
+
+    def test_lost_summary_is_rebuilt(self):
+        store = self.store()
+        self.add(store, 3)
+        store.close()
+        store.summary_file.unlink()
+        self.assertEqual(self.store().summary["count"], 3)
+
+
+class CatchUpTest(StoreTest):
+
+    def test_two_stores_share_history(self):
+        first, second = self.store(), self.store()
+        preds = self.add(first, 3)
+        second.load()
+        preds += self.add(second, 2)
+        self.assertEqual([p["id"] for p in preds], [1, 2, 3, 4, 5])
+
+        preds += self.add(first, 1)
+        self.assertEqual(first.summary["count"], 6)
+        with second.transaction():
+            self.assertEqual(second.summary["count"], 6)
+            self.assertEqual(list(second.data["predictions"].records()), preds)
+
+    def test_catch_up_after_foreign_compaction(self):
+        first, second = self.store(), self.store()
+        second.load()
+        preds = self.add(first, 4)
+        first.compact()
+        preds += self.add(first, 1)
+        with second.transaction():
+            self.assertEqual(list(second.data["predictions"].records()), preds)
+
+
+if __name__ == "__main__":
+    unittest.main()